@@ -59,4 +59,11 @@ class EngineError(SPSError):
 
 class ConfigError(SPSError):
     """配置异常"""
-    pass
\ No newline at end of file
+    pass
+
+class TaskInterrupted(EngineError):
+    """任务被中断监视器终止"""
+    
+    def __init__(self, watcher: str):
+        super().__init__(f"Task interrupted by watcher: {watcher}")
+        self.watcher = watcher
\ No newline at end of file
@@ -3,11 +3,14 @@
 """
 
 import json
-import yaml
 from pathlib import Path
 from typing import Dict, Any, Optional
 from loguru import logger
 
+from core.utils import lazy_import
+
+yaml = lazy_import("yaml")
+
 
 class Config:
     """简单的配置管理器"""
@@ -2,8 +2,21 @@
 驱动层模块 - 提供底层设备控制能力
 """
 
-from .adb_driver import ADBDriver
+from .adb_driver import ADBDriver, ShellOutput
 from .capture_driver import CaptureDriver
 from .input_driver import InputDriver
+from .pacing import InputPacer
+from .gesture import Gesture, TouchDevice
+from .frame_grabber import FrameGrabber
+from .session import SessionProfile, SessionStore
+from .health import ConnectionMonitor, ConnectionState
+from .device_info import DeviceSnapshot
+from .decoders import FrameDecoder, get_decoder
+from .scrcpy import ScrcpyClient, ScrcpyStream, quality_settings
+from .benchmark import BenchResult, benchmark_capture, benchmark_input, pick_winner, scrcpy_available
 
-__all__ = ['ADBDriver', 'CaptureDriver', 'InputDriver']
\ No newline at end of file
+__all__ = ['ADBDriver', 'ShellOutput', 'CaptureDriver', 'InputDriver', 'InputPacer', 'Gesture', 'TouchDevice', 'FrameGrabber',
+           'SessionProfile', 'SessionStore',
+           'ConnectionMonitor', 'ConnectionState', 'DeviceSnapshot',
+           'FrameDecoder', 'get_decoder', 'ScrcpyClient', 'ScrcpyStream', 'quality_settings',
+           'BenchResult', 'benchmark_capture', 'benchmark_input', 'pick_winner', 'scrcpy_available']
\ No newline at end of file
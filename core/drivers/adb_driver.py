@@ -3,12 +3,25 @@ ADB驱动 - 基于官方文档的正确实现
 """
 
 import subprocess
+import signal
+import threading
 import time
 import os
-from typing import Optional, Tuple, List
+import uuid
+from dataclasses import dataclass
+from typing import Optional, Tuple, List, Set, Union
 from loguru import logger
 
 from core import Result
+from .device_info import DeviceSnapshot, SNAPSHOT_COMMANDS
+
+
+@dataclass
+class ShellOutput:
+    """单条shell命令的执行结果"""
+    command: str
+    stdout: str
+    exit_code: int
 
 
 class ADBDriver:
@@ -21,10 +34,46 @@ class ADBDriver:
     - 端口递增规律：MuMu12多开时每个实例+32
     """
     
+    # adb server由同一进程内的所有设备共享：重启串行化，冷却期内不重复重启
+    SERVER_RESTART_COOLDOWN = 60.0
+    _server_lock = threading.Lock()
+    _server_restarted = 0.0
+    
     def __init__(self):
         self.device_id = None
         self.connected = False
-        self.adb_cmd = self._find_adb()
+        self._adb_cmd: Optional[str] = None
+        self._snapshot: Optional[DeviceSnapshot] = None
+        # 正在执行的adb子进程，供看门狗终止
+        self._inflight: Set[subprocess.Popen] = set()
+        self._killed: Set[int] = set()
+        self._inflight_lock = threading.Lock()
+    
+    @property
+    def adb_cmd(self) -> str:
+        """ADB命令（首次使用时查找）"""
+        if self._adb_cmd is None:
+            self._adb_cmd = self._find_adb()
+        return self._adb_cmd
+    
+    @adb_cmd.setter
+    def adb_cmd(self, value: str) -> None:
+        self._adb_cmd = value
+    
+    def attach(self, serial: str, adb_cmd: Optional[str] = None) -> None:
+        """
+        直接使用已知的设备序列号，不做任何探测
+        
+        用于从会话缓存恢复连接，调用方负责随后验证设备可用。
+        
+        Args:
+            serial: 设备序列号
+            adb_cmd: 已解析的adb命令
+        """
+        if adb_cmd:
+            self._adb_cmd = adb_cmd
+        self.device_id = serial
+        self.connected = True
         
     def _find_adb(self) -> str:
         """查找ADB命令"""
@@ -51,6 +100,156 @@ class ADBDriver:
         logger.warning("ADB not found in common locations, trying PATH...")
         return "adb"
     
+    def _run(self, cmd: str, timeout: float, text: bool = True,
+             input: Optional[Union[str, bytes]] = None) -> subprocess.CompletedProcess:
+        """
+        执行adb命令
+        
+        子进程放在独立进程组中，超时或被看门狗终止时整组杀掉，
+        避免shell包装下的adb子进程残留。
+        
+        Raises:
+            subprocess.TimeoutExpired: 超时或被看门狗终止
+        """
+        kwargs = {
+            'shell': True,
+            'stdout': subprocess.PIPE,
+            'stderr': subprocess.PIPE,
+            'stdin': subprocess.PIPE if input is not None else None,
+        }
+        if text:
+            kwargs.update(encoding='utf-8', errors='ignore')
+        if os.name == 'nt':
+            kwargs['creationflags'] = subprocess.CREATE_NEW_PROCESS_GROUP
+        else:
+            kwargs['start_new_session'] = True
+        
+        proc = subprocess.Popen(cmd, **kwargs)
+        with self._inflight_lock:
+            self._inflight.add(proc)
+        
+        try:
+            stdout, stderr = proc.communicate(input, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            self._kill_tree(proc)
+            proc.communicate()
+            raise
+        finally:
+            with self._inflight_lock:
+                self._inflight.discard(proc)
+                killed = proc.pid in self._killed
+                self._killed.discard(proc.pid)
+        
+        if killed:
+            raise subprocess.TimeoutExpired(cmd, timeout)
+        return subprocess.CompletedProcess(cmd, proc.returncode, stdout, stderr)
+    
+    @staticmethod
+    def _kill_tree(proc: subprocess.Popen) -> None:
+        """终止进程及其子进程"""
+        try:
+            if os.name == 'nt':
+                subprocess.run(f"taskkill /F /T /PID {proc.pid}",
+                               shell=True, capture_output=True, timeout=5)
+            else:
+                os.killpg(proc.pid, signal.SIGKILL)
+        except Exception:
+            proc.kill()
+    
+    def kill_inflight(self) -> int:
+        """
+        终止所有正在执行的adb命令（设备卡死时由看门狗调用）
+        
+        Returns:
+            终止的进程数
+        """
+        with self._inflight_lock:
+            procs = [p for p in self._inflight if p.poll() is None]
+            for proc in procs:
+                self._killed.add(proc.pid)
+        
+        for proc in procs:
+            self._kill_tree(proc)
+        
+        if procs:
+            logger.warning(f"Watchdog killed {len(procs)} stalled adb command(s)")
+        return len(procs)
+    
+    def ping(self, timeout: float = 2.0) -> bool:
+        """
+        轻量心跳：不检查connected标志，直接验证设备响应
+        
+        Args:
+            timeout: 超时时间
+            
+        Returns:
+            设备是否响应
+        """
+        if not self.device_id:
+            return False
+        
+        try:
+            cmd = f"{self.adb_cmd} -s {self.device_id} shell echo ok"
+            result = self._run(cmd, timeout)
+            return result.returncode == 0 and "ok" in result.stdout
+        except Exception:
+            return False
+    
+    def reconnect(self, restart_server: bool = False, timeout: float = 10.0) -> Result[bool]:
+        """
+        使用已知序列号快速重连，不重新扫描端口
+        
+        Args:
+            restart_server: 是否先重启adb server（会断开本机所有设备；
+                            其他设备刚重启过时跳过，见SERVER_RESTART_COOLDOWN）
+            timeout: 每步超时
+            
+        Returns:
+            Result[bool]: 重连结果
+        """
+        if not self.device_id:
+            return Result.fail("No known device to reconnect")
+        
+        serial = self.device_id
+        try:
+            self.kill_inflight()
+            
+            if restart_server:
+                self._restart_server(timeout)
+            
+            if ":" in serial:
+                # 网络设备：断开后重新connect
+                self._run(f"{self.adb_cmd} disconnect {serial}", timeout)
+                self._run(f"{self.adb_cmd} connect {serial}", timeout)
+            else:
+                self._run(f"{self.adb_cmd} -s {serial} reconnect", timeout)
+            
+            # 等待设备重新上线
+            self._run(f"{self.adb_cmd} -s {serial} wait-for-device", timeout)
+            
+            if self.ping(timeout):
+                self.connected = True
+                logger.info(f"Reconnected to {serial}")
+                return Result.ok(True)
+            return Result.fail(f"Device {serial} not responding after reconnect")
+            
+        except subprocess.TimeoutExpired:
+            return Result.fail(f"Reconnect timeout: {serial}")
+        except Exception as e:
+            return Result.fail(f"Reconnect error: {e}")
+    
+    def _restart_server(self, timeout: float) -> None:
+        """重启adb server（进程内串行，冷却期内跳过）"""
+        with ADBDriver._server_lock:
+            elapsed = time.monotonic() - ADBDriver._server_restarted
+            if ADBDriver._server_restarted and elapsed < self.SERVER_RESTART_COOLDOWN:
+                logger.info(f"adb server restarted {elapsed:.0f}s ago, skipping restart")
+                return
+            logger.warning("Restarting adb server")
+            self._run(f"{self.adb_cmd} kill-server", timeout)
+            self._run(f"{self.adb_cmd} start-server", timeout)
+            ADBDriver._server_restarted = time.monotonic()
+    
     def list_devices(self) -> Result[List[str]]:
         """
         列出所有连接的设备
@@ -280,14 +479,7 @@ class ADBDriver:
         
         try:
             cmd = f"{self.adb_cmd} -s {self.device_id} shell {command}"
-            result = subprocess.run(
-                cmd, 
-                shell=True, 
-                capture_output=True, 
-                encoding='utf-8', 
-                errors='ignore', 
-                timeout=timeout
-            )
+            result = self._run(cmd, timeout)
             
             # 某些命令返回非0也是正常的
             if result.returncode != 0 and result.stderr and "error" in result.stderr.lower():
@@ -300,36 +492,196 @@ class ADBDriver:
         except Exception as e:
             return Result.fail(f"Shell error: {e}")
     
-    def screenshot(self) -> Result[bytes]:
+    def shell_many(self, commands: List[str],
+                   timeout: float = 10) -> Result[List[Result[ShellOutput]]]:
         """
-        截图
+        在一次adb调用中执行多条shell命令
         
+        脚本以UTF-8字节通过stdin传给设备端sh（文本模式在Windows上会把换行转成CRLF，
+        设备端sh会把回车符当作命令的一部分），每条命令后输出带随机令牌的分隔行和退出码。
+        令牌每批随机生成，命令输出中即使含有分隔符格式的文本也不会误判。
+        每条命令的stdin重定向到/dev/null，防止其读走后续脚本；stderr合并到输出中。
+        
+        Args:
+            commands: 命令列表
+            timeout: 整批命令的超时时间
+            
         Returns:
-            Result[bytes]: PNG图片数据
+            Result[List[Result[ShellOutput]]]: 每条命令的结果，退出码非0时为失败结果
         """
         if not self.connected or not self.device_id:
             return Result.fail("Device not connected")
+        if not commands:
+            return Result.ok([])
+        
+        token = f"SPS{uuid.uuid4().hex}"
+        lines = []
+        for i, command in enumerate(commands):
+            lines.append(f"( {command}\n) </dev/null 2>&1")
+            lines.append(f"rc=$?; echo; echo {token}:{i}:$rc")
+        lines.append("exit 0")
+        script = "\n".join(lines) + "\n"
         
         try:
-            # 使用screencap（更兼容）
-            cmd = f"{self.adb_cmd} -s {self.device_id} exec-out screencap -p"
-            result = subprocess.run(
-                cmd, 
-                shell=True, 
-                capture_output=True, 
-                timeout=10  # 增加超时时间
-            )
+            cmd = f"{self.adb_cmd} -s {self.device_id} shell sh"
+            result = self._run(cmd, timeout, text=False, input=script.encode("utf-8"))
+        except subprocess.TimeoutExpired:
+            return Result.fail(f"Batch timeout ({len(commands)} commands)")
+        except Exception as e:
+            return Result.fail(f"Shell error: {e}")
+        
+        output = result.stdout.decode("utf-8", errors="ignore").replace("\r\n", "\n")
+        results: List[Result[ShellOutput]] = []
+        pos = 0
+        for i, command in enumerate(commands):
+            marker = f"\n{token}:{i}:"
+            index = output.find(marker, pos)
+            if index < 0:
+                # 批处理中断（设备断开等），后续命令都没有结果
+                results.append(Result.fail(f"No result for command: {command}"))
+                continue
             
-            if result.returncode != 0:
-                return Result.fail("Screenshot failed")
+            code_start = index + len(marker)
+            code_end = output.find("\n", code_start)
+            if code_end < 0:
+                code_end = len(output)
+            try:
+                exit_code = int(output[code_start:code_end])
+            except ValueError:
+                exit_code = -1
+            
+            # 分隔标记以echo输出的换行开头，两个标记之间即为命令的原样输出
+            stdout = output[pos:index]
+            item = ShellOutput(command, stdout, exit_code)
+            error = None if exit_code == 0 else f"Exit code {exit_code}: {stdout.strip()[-200:]}"
+            results.append(Result(exit_code == 0, item, error))
+            pos = code_end + 1
+        
+        return Result.ok(results)
+    
+    def exec_out(self, command: str, timeout: float = 10) -> Result[bytes]:
+        """
+        执行命令并返回原始字节（adb exec-out，不经过文本解码）
+        
+        Args:
+            command: 设备端命令
+            timeout: 超时时间
+            
+        Returns:
+            Result[bytes]: 命令的原始输出
+        """
+        if not self.connected or not self.device_id:
+            return Result.fail("Device not connected")
+        
+        try:
+            cmd = f"{self.adb_cmd} -s {self.device_id} exec-out {command}"
+            result = self._run(cmd, timeout, text=False)
+            
+            if result.returncode != 0 or not result.stdout:
+                stderr = result.stderr.decode('utf-8', errors='ignore').strip()
+                return Result.fail(f"exec-out failed: {stderr or command}")
             
-            # 返回PNG数据
             return Result.ok(result.stdout)
             
         except subprocess.TimeoutExpired:
-            return Result.fail("Screenshot timeout")
+            return Result.fail(f"Command timeout: {command}")
+        except Exception as e:
+            return Result.fail(f"exec-out error: {e}")
+    
+    def push(self, local: str, remote: str, timeout: float = 30) -> Result[bool]:
+        """
+        推送文件到设备
+        
+        Args:
+            local: 本地路径
+            remote: 设备路径
+            timeout: 超时时间
+        """
+        if not self.connected or not self.device_id:
+            return Result.fail("Device not connected")
+        
+        try:
+            cmd = f'{self.adb_cmd} -s {self.device_id} push "{local}" {remote}'
+            result = self._run(cmd, timeout)
+            if result.returncode != 0:
+                return Result.fail(f"Push failed: {result.stderr.strip() or result.stdout.strip()}")
+            return Result.ok(True)
+        except subprocess.TimeoutExpired:
+            return Result.fail(f"Push timeout: {local}")
+        except Exception as e:
+            return Result.fail(f"Push error: {e}")
+    
+    def forward(self, local: str, remote: str = "", remove: bool = False) -> Result[str]:
+        """
+        设置或移除端口转发
+        
+        Args:
+            local: 本地端点，如 tcp:27183；tcp:0 由adb分配空闲端口
+            remote: 设备端点，如 localabstract:scrcpy
+            remove: 为True时移除local上的转发（忽略remote）
+            
+        Returns:
+            Result[str]: adb的输出（tcp:0时为分配的端口号）
+        """
+        if not self.device_id:
+            return Result.fail("Device not connected")
+        
+        try:
+            if remove:
+                cmd = f"{self.adb_cmd} -s {self.device_id} forward --remove {local}"
+            else:
+                cmd = f"{self.adb_cmd} -s {self.device_id} forward {local} {remote}"
+            result = self._run(cmd, 5)
+            if result.returncode != 0:
+                return Result.fail(f"Forward failed: {result.stderr.strip()}")
+            return Result.ok(result.stdout.strip())
+        except subprocess.TimeoutExpired:
+            return Result.fail(f"Forward timeout: {local}")
+        except Exception as e:
+            return Result.fail(f"Forward error: {e}")
+    
+    def spawn(self, command: str) -> Result[subprocess.Popen]:
+        """
+        启动长时间运行的shell命令（如投屏服务端），不等待结束
+        
+        进程不计入看门狗的执行中列表，由调用方负责终止。
+        
+        Args:
+            command: 设备端命令
+            
+        Returns:
+            Result[subprocess.Popen]: 本地adb进程
+        """
+        if not self.connected or not self.device_id:
+            return Result.fail("Device not connected")
+        
+        try:
+            kwargs = {
+                'shell': True,
+                'stdin': subprocess.DEVNULL,
+                'stdout': subprocess.DEVNULL,
+                'stderr': subprocess.DEVNULL,
+            }
+            if os.name == 'nt':
+                kwargs['creationflags'] = subprocess.CREATE_NEW_PROCESS_GROUP
+            else:
+                kwargs['start_new_session'] = True
+            cmd = f"{self.adb_cmd} -s {self.device_id} shell {command}"
+            return Result.ok(subprocess.Popen(cmd, **kwargs))
         except Exception as e:
-            return Result.fail(f"Screenshot error: {e}")
+            return Result.fail(f"Spawn error: {e}")
+    
+    def screenshot(self) -> Result[bytes]:
+        """
+        截图
+        
+        Returns:
+            Result[bytes]: PNG图片数据
+        """
+        result = self.exec_out("screencap -p", timeout=10)
+        if result.is_fail():
+            return Result.fail(f"Screenshot failed: {result.error}")
+        return result
     
     def get_screen_size(self) -> Result[Tuple[int, int]]:
         """
@@ -359,14 +711,54 @@ class ADBDriver:
         except Exception as e:
             return Result.fail(f"Parse size error: {e}")
     
+    def get_screen_density(self) -> Result[int]:
+        """
+        获取屏幕密度
+        
+        Returns:
+            Result[int]: dpi
+        """
+        result = self.shell("wm density")
+        if result.is_fail():
+            return Result.fail("Failed to get screen density")
+        
+        try:
+            # 解析输出: "Physical density: 320"，有覆盖值时取最后一行
+            line = result.unwrap().strip().splitlines()[-1]
+            return Result.ok(int(line.split(":")[-1].strip()))
+        except Exception as e:
+            return Result.fail(f"Parse density error: {e}")
+    
+    def snapshot(self, refresh: bool = False) -> Result[DeviceSnapshot]:
+        """
+        获取设备状态快照（属性、分辨率、密度、方向、亮屏状态）
+        
+        所有查询在一次shell调用中完成，结果缓存到下次refresh。
+        
+        Args:
+            refresh: 是否强制刷新
+            
+        Returns:
+            Result[DeviceSnapshot]: 设备快照
+        """
+        if self._snapshot is not None and not refresh:
+            return Result.ok(self._snapshot)
+        
+        result = self.shell_many(SNAPSHOT_COMMANDS)
+        if result.is_fail():
+            return Result.fail(f"Failed to get device snapshot: {result.error}")
+        
+        try:
+            # grep无匹配时退出码非0，仍然取其输出
+            outputs = [r.data.stdout if r.data else "" for r in result.unwrap()]
+            self._snapshot = DeviceSnapshot.parse(outputs)
+            return Result.ok(self._snapshot)
+        except Exception as e:
+            return Result.fail(f"Parse snapshot error: {e}")
+    
     def is_screen_on(self) -> Result[bool]:
         """检查屏幕是否亮着"""
-        result = self.shell("dumpsys power | grep 'Display Power'")
+        result = self.snapshot(refresh=True)
         if result.is_fail():
-            # 尝试另一种方法
-            result = self.shell("dumpsys power | grep mScreenOn")
-            if result.is_fail():
-                return Result.fail("Failed to check screen state")
-        
-        output = result.unwrap()
-        return Result.ok("ON" in output.upper() or "true" in output.lower())
\ No newline at end of file
+            return Result.fail("Failed to check screen state")
+        return Result.ok(result.unwrap().screen_on)
\ No newline at end of file
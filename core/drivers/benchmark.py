@@ -0,0 +1,204 @@
+"""
+设备后端基准测试 - 测量各截图方式、截图格式与输入方式的延迟
+"""
+
+import importlib.util
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .capture_driver import CaptureDriver
+from .decoders import DECODERS, get_decoder
+from .gesture import Gesture, compile_sendevent
+from .input_driver import InputDriver
+
+
+@dataclass
+class BenchResult:
+    """单个后端的测试结果"""
+    kind: str                   # capture / input
+    backend: str
+    durations: List[float] = field(default_factory=list)  # 成功调用的耗时（毫秒）
+    failures: int = 0
+    error: Optional[str] = None
+    method: Optional[str] = None  # 截图方式（仅截图结果）：screencap / scrcpy
+
+    def percentile(self, p: float) -> float:
+        if not self.durations:
+            return float("inf")
+        ordered = sorted(self.durations)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+    @property
+    def ok(self) -> bool:
+        return bool(self.durations) and self.failures == 0
+
+    @property
+    def mean(self) -> float:
+        return sum(self.durations) / len(self.durations) if self.durations else float("inf")
+
+    @property
+    def rate(self) -> float:
+        """每秒次数（截图即FPS）"""
+        return 1000.0 / self.mean if self.durations else 0.0
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            'mean_ms': self.mean,
+            'p50_ms': self.percentile(50),
+            'p90_ms': self.percentile(90),
+            'p99_ms': self.percentile(99),
+            'per_second': self.rate,
+        }
+
+
+def _measure(kind: str, backend: str, call: Callable[[], bool],
+             iterations: int, warmup: int = 1) -> BenchResult:
+    result = BenchResult(kind, backend)
+    for i in range(warmup + iterations):
+        start = time.perf_counter()
+        try:
+            success = call()
+        except Exception as e:
+            success = False
+            result.error = str(e)
+        elapsed = (time.perf_counter() - start) * 1000
+        if i < warmup:
+            continue
+        if success:
+            result.durations.append(elapsed)
+        else:
+            result.failures += 1
+    return result
+
+
+def capture_backends() -> List[str]:
+    """可在设备端直接产生数据的截图格式"""
+    return [name for name, cls in DECODERS.items() if cls.command and cls.available()]
+
+
+def scrcpy_available() -> bool:
+    """本机能否解码scrcpy视频流（需要PyAV）"""
+    return importlib.util.find_spec("av") is not None
+
+
+def benchmark_capture(capture: CaptureDriver, iterations: int = 20,
+                      backends: Optional[List[str]] = None) -> List[BenchResult]:
+    """
+    测试各截图方式和格式（调用方拿到一帧的完整耗时）
+
+    screencap按每种格式分别测试（截图+传输+解码）；capture.scrcpy已创建且PyAV可用时
+    再测试scrcpy视频流（取最新帧），服务端启动失败记为不可用。minicap尚未实现，
+    不参与测试。结束后恢复原截图方法和解码器。
+
+    Args:
+        capture: 截图驱动
+        iterations: 每个后端的次数
+        backends: 参与测试的screencap格式，None为全部可用格式
+
+    Returns:
+        测试结果
+    """
+    original = capture.decoder
+    method = capture.capture_method
+    results = []
+
+    def measure(name: str, verify: Callable[[], bool] = lambda: True) -> BenchResult:
+        out = [None]
+
+        def grab() -> bool:
+            frame = capture.capture(out[0])
+            if frame.is_fail():
+                raise RuntimeError(frame.error)
+            out[0] = frame.unwrap()  # 复用输出缓冲区，与流水线模式一致
+            return verify()
+
+        try:
+            result = _measure("capture", name, grab, iterations)
+        finally:
+            if out[0] is not None:
+                capture.release_frame(out[0])
+        result.method = capture.capture_method
+        return result
+
+    try:
+        capture.set_capture_method("screencap")
+        for name in backends or capture_backends():
+            capture.set_decoder(get_decoder(name))
+            results.append(measure(name))
+        capture.set_decoder(original)
+
+        if capture.scrcpy is not None and scrcpy_available():
+            started = capture.scrcpy.start()
+            if started.is_ok():
+                capture.set_capture_method("scrcpy")
+                # 视频流中断时capture会回退到screencap，这类调用记为失败
+                results.append(measure("scrcpy", lambda: capture.scrcpy.running))
+            else:
+                results.append(BenchResult("capture", "scrcpy", error=started.error, method="scrcpy"))
+    finally:
+        capture.set_decoder(original)
+        capture.set_capture_method(method)
+        if method != "scrcpy" and capture.scrcpy is not None:
+            capture.scrcpy.close()
+    return results
+
+
+def benchmark_input(input_driver: InputDriver, iterations: int = 20,
+                    point: Optional[Tuple[int, int]] = None,
+                    duration: int = 50) -> List[BenchResult]:
+    """
+    测试各点击方式完成一次点击的耗时
+
+    两种方式执行与InputDriver.tap相同的工作：input tap，以及编译后的
+    Gesture.hold sendevent脚本（含按压时长）经shell_many发送。点击是真实的，
+    point应选在点击无副作用的位置。
+
+    Args:
+        input_driver: 输入驱动
+        iterations: 每个后端的次数
+        point: 点击位置（与tap相同的坐标），None为屏幕顶边中点
+        duration: 按压时长（毫秒），与tap的默认值一致
+
+    Returns:
+        测试结果
+    """
+    adb = input_driver.adb
+    device = input_driver.device
+    if point is None:
+        width = device.display_size[0] if device else 2
+        point = (width // 2, 1)
+    x, y = point
+
+    def run(call: Callable[[], Any]) -> Callable[[], bool]:
+        def wrapped() -> bool:
+            result = call()
+            if result.is_fail():
+                raise RuntimeError(result.error)
+            return True
+        return wrapped
+
+    tx, ty = input_driver.transform(x, y)
+    results = [_measure("input", "input", run(lambda: adb.shell(f"input tap {tx} {ty}")), iterations)]
+
+    touch = input_driver.touch_device
+    if touch and touch.writable and device:
+        script = compile_sendevent(Gesture.hold(x, y, duration), touch, input_driver.to_touch_panel,
+                                   (device.width, device.height))
+
+        def send() -> Any:
+            result = adb.shell_many([script], timeout=duration / 1000 + 10)
+            return result.unwrap()[0] if result.is_ok() else result
+
+        results.append(_measure("input", "sendevent", run(send), iterations))
+    else:
+        results.append(BenchResult("input", "sendevent", error="touch device not writable"))
+    return results
+
+
+def pick_winner(results: List[BenchResult]) -> Optional[BenchResult]:
+    """选择p50最低且没有失败的后端"""
+    candidates = [r for r in results if r.ok]
+    if not candidates:
+        return None
+    return min(candidates, key=lambda r: (r.percentile(50), r.percentile(90)))
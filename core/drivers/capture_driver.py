@@ -2,35 +2,76 @@
 截图驱动 - 屏幕捕获实现
 """
 
+from __future__ import annotations
+
 import time
-import numpy as np
-from io import BytesIO
+from pathlib import Path
 from typing import Optional, Tuple
-from PIL import Image
 from loguru import logger
 
 from core import Result, DriverError
+from core.monitoring.log import log_every
+from core.utils import FramePool, lazy_import
 from .adb_driver import ADBDriver
+from .decoders import FrameDecoder, get_decoder
+from .scrcpy import ScrcpyClient
+
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
 
 
 class CaptureDriver:
     """截图驱动，提供多种截图方式"""
     
-    def __init__(self, adb_driver: ADBDriver):
+    def __init__(self, adb_driver: ADBDriver, decoder: str = "png"):
         """
         初始化截图驱动
         
         Args:
             adb_driver: ADB驱动实例
+            decoder: 截图格式/解码器（png/raw）
         """
         self.adb = adb_driver
         self._resolution: Optional[Tuple[int, int]] = None
         self._capture_method = "screencap"  # screencap, minicap, scrcpy
+        self._decoder: FrameDecoder = get_decoder(decoder)
+        # scrcpy视频流，由调用方按配置创建；启动失败后暂时回退到screencap
+        self.scrcpy: Optional[ScrcpyClient] = None
+        self._scrcpy_retry_at = 0.0
+        # 帧缓冲池：解码器直接写入池中的缓冲区，避免每次截图分配整帧
+        self.pool: Optional[FramePool] = None
+        self._frame_shape: Optional[Tuple[int, ...]] = None
+    
+    @property
+    def decoder(self) -> FrameDecoder:
+        """当前解码器"""
+        return self._decoder
+    
+    @property
+    def frame_shape(self) -> Optional[Tuple[int, ...]]:
+        """最近一次截图解码出的帧形状（尚未截图时为None）"""
+        return self._frame_shape
+    
+    def set_decoder(self, decoder: FrameDecoder) -> None:
+        """
+        设置解码器
         
-    def capture(self) -> Result[np.ndarray]:
+        Args:
+            decoder: 解码器实例，其command为设备端截图命令
+        """
+        self._decoder = decoder
+        logger.info(f"Frame decoder set to: {decoder.name}")
+        
+    def capture(self, out: Optional[np.ndarray] = None) -> Result[np.ndarray]:
         """
         捕获屏幕截图
         
+        未指定out且使用帧缓冲池时，返回的帧可能是池中的缓冲区，由调用方持有，
+        用完后调用release_frame()归还。
+        
+        Args:
+            out: 可选的输出缓冲区
+            
         Returns:
             Result[np.ndarray]: BGR格式的numpy数组
         """
@@ -39,44 +80,113 @@ class CaptureDriver:
         
         # 根据方法选择截图方式
         if self._capture_method == "screencap":
-            return self._capture_screencap()
+            return self._capture_screencap(out)
         elif self._capture_method == "minicap":
             return self._capture_minicap()
+        elif self._capture_method == "scrcpy":
+            return self._capture_scrcpy(out)
         else:
-            return self._capture_screencap()
+            return self._capture_screencap(out)
+    
+    def retain_frame(self, frame: np.ndarray) -> bool:
+        """
+        为池中的帧增加一个持有者
+        
+        Returns:
+            帧是否来自帧缓冲池
+        """
+        return self.pool is not None and self.pool.retain(frame)
+    
+    def release_frame(self, frame: np.ndarray) -> bool:
+        """
+        释放capture()/capture_region()返回的帧，池中的缓冲区全部释放后复用
+        
+        Returns:
+            帧是否来自帧缓冲池
+        """
+        return self.pool is not None and self.pool.release(frame)
     
-    def _capture_screencap(self) -> Result[np.ndarray]:
-        """使用screencap截图（标准方法）"""
+    def _capture_screencap(self, out: Optional[np.ndarray] = None) -> Result[np.ndarray]:
+        """
+        使用screencap截图（标准方法）
+        
+        通过exec-out直接读取字节，不经过文本编解码。
+        
+        Args:
+            out: 可选的输出缓冲区，解码器会尽量写入其中；
+                 未指定时从帧缓冲池取（解码器支持直接写入时）
+        """
+        buffer = None
         try:
             start_time = time.time()
             
             # 执行截图命令
-            result = self.adb.shell("screencap -p", timeout=5)
+            command = self._decoder.command or "screencap -p"
+            result = self.adb.exec_out(command, timeout=5)
             if result.is_fail():
                 return Result.fail(f"Screencap failed: {result.error}")
             
-            # 获取原始数据
-            png_data = result.unwrap()
-            
-            # 转换为PIL Image
-            image = Image.open(BytesIO(png_data.encode('latin-1')))
+            pooled = out is None and self.pool is not None and self._decoder.in_place
+            if pooled and self._frame_shape:
+                out = buffer = self.pool.acquire(self._frame_shape)
             
-            # 转换为numpy数组 (RGB -> BGR for OpenCV)
-            img_array = np.array(image)
-            if len(img_array.shape) == 3 and img_array.shape[2] == 3:
-                img_array = img_array[:, :, ::-1]  # RGB to BGR
+            # 解码为BGR数组
+            img_array = self._decoder.decode(result.unwrap(), out)
+            if img_array is not out:
+                # 首帧或分辨率变化（旋转）：新分配的帧纳入池中，没用上的缓冲归还
+                self._frame_shape = img_array.shape
+                if pooled:
+                    if buffer is not None:
+                        self.pool.release(buffer)
+                    self.pool.adopt(img_array)
+            buffer = None
             
             # 更新分辨率信息
             self._resolution = (img_array.shape[1], img_array.shape[0])
             
             elapsed = time.time() - start_time
-            logger.debug(f"Screenshot captured in {elapsed:.3f}s, size: {self._resolution}")
+            logger.debug("Screenshot captured in {:.3f}s, size: {}", elapsed, self._resolution)
             
             return Result.ok(img_array)
             
         except Exception as e:
             logger.error(f"Screenshot failed: {e}")
             return Result.fail(str(e))
+        finally:
+            if buffer is not None:
+                self.pool.release(buffer)
+    
+    def _capture_scrcpy(self, out: Optional[np.ndarray] = None) -> Result[np.ndarray]:
+        """
+        从scrcpy视频流取最新帧（不等待设备）
+        
+        服务端不可用时回退到screencap，30秒后再尝试启动。
+        
+        Args:
+            out: 可选的输出缓冲区，形状一致时把帧复制进去
+        """
+        if self.scrcpy is None:
+            self.scrcpy = ScrcpyClient(self.adb)
+        
+        if not self.scrcpy.running:
+            if time.monotonic() < self._scrcpy_retry_at:
+                return self._capture_screencap(out)
+            result = self.scrcpy.start()
+            if result.is_fail():
+                self._scrcpy_retry_at = time.monotonic() + 30.0
+                log_every(60.0, "WARNING", "scrcpy unavailable, falling back to screencap: {}", result.error)
+                return self._capture_screencap(out)
+        
+        latest = self.scrcpy.latest()
+        if latest is None:
+            return self._capture_screencap(out)
+        
+        image = latest[0]
+        if out is not None and out.shape == image.shape and out.dtype == image.dtype:
+            np.copyto(out, image)
+            image = out
+        self._resolution = (image.shape[1], image.shape[0])
+        return Result.ok(image)
     
     def _capture_minicap(self) -> Result[np.ndarray]:
         """使用minicap截图（需要额外安装）"""
@@ -94,16 +204,15 @@ class CaptureDriver:
             height: 高度
             
         Returns:
-            Result[np.ndarray]: 裁剪后的图像
+            Result[np.ndarray]: 裁剪后的图像（来自帧缓冲池时用完后release_frame()）
         """
         # 先截全屏
         result = self.capture()
         if result.is_fail():
             return result
         
+        img = result.unwrap()
         try:
-            img = result.unwrap()
-            
             # 边界检查
             img_h, img_w = img.shape[:2]
             x = max(0, min(x, img_w - 1))
@@ -117,10 +226,18 @@ class CaptureDriver:
             if cropped.size == 0:
                 return Result.fail("Invalid region")
             
+            # 整帧缓冲马上归还，使用缓冲池时把区域复制到池中的小缓冲
+            if self.pool is not None:
+                dst = self.pool.acquire(cropped.shape)
+                np.copyto(dst, cropped)
+                cropped = dst
+            
             return Result.ok(cropped)
             
         except Exception as e:
             return Result.fail(str(e))
+        finally:
+            self.release_frame(img)
     
     def save_screenshot(self, filepath: str) -> Result[bool]:
         """
@@ -133,18 +250,20 @@ class CaptureDriver:
         if result.is_fail():
             return Result.fail(result.error)
         
+        img = result.unwrap()
         try:
-            img = result.unwrap()
-            # BGR to RGB for saving
-            if len(img.shape) == 3 and img.shape[2] == 3:
-                img = img[:, :, ::-1]
-            
-            Image.fromarray(img).save(filepath)
+            # 直接按BGR编码，不做RGB转换；用tofile写入以支持非ASCII路径
+            ok, encoded = cv2.imencode(Path(filepath).suffix or ".png", img)
+            if not ok:
+                return Result.fail(f"Unsupported image format: {filepath}")
+            encoded.tofile(filepath)
             logger.info(f"Screenshot saved to {filepath}")
             return Result.ok(True)
             
         except Exception as e:
             return Result.fail(str(e))
+        finally:
+            self.release_frame(img)
     
     def get_resolution(self) -> Result[Tuple[int, int]]:
         """
@@ -163,6 +282,11 @@ class CaptureDriver:
         
         return result
     
+    @property
+    def capture_method(self) -> str:
+        """当前截图方法"""
+        return self._capture_method
+    
     def set_capture_method(self, method: str) -> None:
         """
         设置截图方法
@@ -172,4 +296,11 @@ class CaptureDriver:
         """
         if method in ["screencap", "minicap", "scrcpy"]:
             self._capture_method = method
-            logger.info(f"Capture method set to: {method}")
\ No newline at end of file
+            logger.info(f"Capture method set to: {method}")
+    
+    def close(self) -> None:
+        """释放截图资源（停止scrcpy视频流与服务端，清空帧缓冲池）"""
+        if self.scrcpy:
+            self.scrcpy.close()
+        if self.pool:
+            self.pool.clear()
\ No newline at end of file
@@ -0,0 +1,192 @@
+"""
+帧解码器 - 截图数据到BGR数组的可插拔解码
+"""
+
+from __future__ import annotations
+
+import struct
+import time
+from typing import Dict, Optional, Type
+from loguru import logger
+
+from core.utils import lazy_import
+
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
+
+
+class FrameDecoder:
+    """
+    解码器基类
+
+    decode() 支持传入调用方预分配的out数组，形状匹配时结果写入其中。
+    """
+
+    name = "base"
+    command: Optional[str] = None  # 设备端产生该格式数据的命令
+    in_place = False               # 是否直接解码到out（否则先分配再复制，传out没有收益）
+
+    @classmethod
+    def available(cls) -> bool:
+        """依赖是否可用"""
+        return True
+
+    def decode(self, data: bytes, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        解码为BGR图像
+
+        Args:
+            data: 原始数据
+            out: 可选的输出缓冲区(h, w, 3) uint8
+
+        Returns:
+            BGR图像（传入out且形状匹配时即为out）
+        """
+        raise NotImplementedError
+
+    @staticmethod
+    def _into(image: np.ndarray, out: Optional[np.ndarray]) -> np.ndarray:
+        """把结果放入调用方缓冲区"""
+        if out is None or out.shape != image.shape:
+            return image
+        np.copyto(out, image)
+        return out
+
+
+class PngDecoder(FrameDecoder):
+    """PNG解码（screencap -p），使用cv2.imdecode"""
+
+    name = "png"
+    command = "screencap -p"
+
+    def decode(self, data: bytes, out: Optional[np.ndarray] = None) -> np.ndarray:
+        image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            raise ValueError("Invalid PNG data")
+        return self._into(image, out)
+
+
+class RawDecoder(FrameDecoder):
+    """
+    原始RGBA解码（screencap 不带 -p）
+
+    数据头为 width, height, format 三个uint32，Android 9起还有一个colorspace字段。
+    省去设备端PNG编码，转换直接写入out。
+    """
+
+    name = "raw"
+    command = "screencap"
+    in_place = True
+
+    def decode(self, data: bytes, out: Optional[np.ndarray] = None) -> np.ndarray:
+        if len(data) < 12:
+            raise ValueError("Invalid raw screencap data")
+
+        width, height, _ = struct.unpack_from("<III", data, 0)
+        pixel_bytes = width * height * 4
+        header = len(data) - pixel_bytes
+        if header not in (12, 16):
+            raise ValueError(f"Unexpected raw screencap size: {len(data)} for {width}x{height}")
+
+        rgba = np.frombuffer(data, np.uint8, pixel_bytes, header).reshape(height, width, 4)
+        if out is not None and out.shape == (height, width, 3):
+            return cv2.cvtColor(rgba, cv2.COLOR_RGBA2BGR, dst=out)
+        return cv2.cvtColor(rgba, cv2.COLOR_RGBA2BGR)
+
+
+class JpegDecoder(FrameDecoder):
+    """JPEG解码，优先使用libjpeg-turbo（PyTurboJPEG），否则回退到cv2"""
+
+    name = "jpeg"
+    command = None  # 由minicap等JPEG帧源提供数据
+
+    _turbo = None
+
+    @classmethod
+    def _turbojpeg(cls):
+        if cls._turbo is None:
+            try:
+                from turbojpeg import TurboJPEG
+                cls._turbo = TurboJPEG()
+            except Exception:
+                cls._turbo = False
+        return cls._turbo
+
+    def decode(self, data: bytes, out: Optional[np.ndarray] = None) -> np.ndarray:
+        turbo = self._turbojpeg()
+        if turbo:
+            image = turbo.decode(data)  # 默认输出BGR
+        else:
+            image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            raise ValueError("Invalid JPEG data")
+        return self._into(image, out)
+
+
+DECODERS: Dict[str, Type[FrameDecoder]] = {
+    PngDecoder.name: PngDecoder,
+    RawDecoder.name: RawDecoder,
+    JpegDecoder.name: JpegDecoder,
+}
+
+
+def get_decoder(name: str) -> FrameDecoder:
+    """
+    获取解码器实例
+
+    Args:
+        name: png/raw/jpeg
+
+    Returns:
+        解码器，未知名称时返回PNG解码器
+    """
+    decoder_cls = DECODERS.get(name)
+    if decoder_cls is None or not decoder_cls.available():
+        logger.warning(f"Decoder '{name}' unavailable, using png")
+        decoder_cls = PngDecoder
+    return decoder_cls()
+
+
+def benchmark(decoder: FrameDecoder, data: bytes, iterations: int = 50,
+              reuse_buffer: bool = True) -> Dict[str, float]:
+    """
+    解码基准测试
+
+    Args:
+        decoder: 解码器
+        data: 样本数据
+        iterations: 迭代次数
+        reuse_buffer: 是否复用输出缓冲区
+
+    Returns:
+        耗时统计（毫秒）
+    """
+    out = decoder.decode(data) if reuse_buffer else None
+    durations = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        decoder.decode(data, out)
+        durations.append((time.perf_counter() - start) * 1000)
+
+    durations.sort()
+    return {
+        'mean_ms': sum(durations) / len(durations),
+        'p50_ms': durations[len(durations) // 2],
+        'p95_ms': durations[min(len(durations) - 1, int(len(durations) * 0.95))],
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark frame decoders on a captured sample")
+    parser.add_argument("sample", help="sample file (screencap -p / screencap / jpeg output)")
+    parser.add_argument("--decoder", default="png", choices=sorted(DECODERS))
+    parser.add_argument("-n", "--iterations", type=int, default=50)
+    args = parser.parse_args()
+
+    with open(args.sample, 'rb') as f:
+        sample = f.read()
+
+    stats = benchmark(get_decoder(args.decoder), sample, args.iterations)
+    print(f"{args.decoder}: " + ", ".join(f"{k}={v:.2f}" for k, v in stats.items()))
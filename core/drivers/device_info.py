@@ -0,0 +1,155 @@
+"""
+设备信息快照 - 一次往返获取设备属性与屏幕状态
+"""
+
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+
+
+# 按顺序执行的查询命令（通过shell_many一次往返执行）
+SNAPSHOT_COMMANDS = [
+    "getprop",
+    "wm size",
+    "wm density",
+    "dumpsys input | grep -m 1 SurfaceOrientation",
+    "dumpsys power | grep -E 'Display Power|mScreenOn|mWakefulness='",
+]
+
+_PROP_PATTERN = re.compile(r"^\[(.+?)\]: \[(.*)\]$")
+_SIZE_PATTERN = re.compile(r"(\d+)x(\d+)")
+
+
+@dataclass
+class DeviceSnapshot:
+    """设备状态快照"""
+    width: int                      # 自然方向的物理宽度
+    height: int                     # 自然方向的物理高度
+    density: int = 0
+    rotation: int = 0               # 0/1/2/3 对应 0/90/180/270 度
+    screen_on: bool = True
+    properties: Dict[str, str] = field(default_factory=dict)
+    timestamp: float = field(default_factory=time.time)
+
+    @property
+    def display_size(self) -> Tuple[int, int]:
+        """当前方向下的显示尺寸"""
+        if self.rotation % 2:
+            return self.height, self.width
+        return self.width, self.height
+
+    @property
+    def sdk(self) -> int:
+        """Android SDK版本"""
+        try:
+            return int(self.properties.get('ro.build.version.sdk', 0))
+        except ValueError:
+            return 0
+
+    @classmethod
+    def parse(cls, outputs: List[str]) -> 'DeviceSnapshot':
+        """
+        解析快照命令输出
+
+        Args:
+            outputs: 与SNAPSHOT_COMMANDS一一对应的输出
+
+        Returns:
+            DeviceSnapshot
+        """
+        sections = [s.strip() for s in outputs]
+        sections += [""] * (len(SNAPSHOT_COMMANDS) - len(sections))
+        props_out, size_out, density_out, orientation_out, power_out = sections[:5]
+
+        properties = {}
+        for line in props_out.splitlines():
+            match = _PROP_PATTERN.match(line.strip())
+            if match:
+                properties[match.group(1)] = match.group(2)
+
+        # wm size 有覆盖值时最后一行为 Override size
+        sizes = _SIZE_PATTERN.findall(size_out)
+        if not sizes:
+            raise ValueError(f"Invalid size output: {size_out!r}")
+        width, height = map(int, sizes[-1])
+
+        densities = re.findall(r"(\d+)", density_out)
+        density = int(densities[-1]) if densities else 0
+
+        rotation_match = re.search(r"SurfaceOrientation:\s*(\d)", orientation_out)
+        rotation = int(rotation_match.group(1)) if rotation_match else 0
+
+        power = power_out.upper()
+        screen_on = ("=ON" in power or "MSCREENON=TRUE" in power or
+                     "AWAKE" in power or not power)
+
+        return cls(width, height, density, rotation, screen_on, properties)
+
+
+def to_natural(x: int, y: int, rotation: int,
+               width: int, height: int) -> Tuple[int, int]:
+    """
+    当前方向坐标转换为自然方向（触摸屏面板）坐标
+
+    像素坐标范围为0到尺寸-1，翻转时以尺寸-1为轴。
+
+    Args:
+        x, y: 当前方向下的坐标
+        rotation: 当前方向
+        width, height: 自然方向的物理尺寸
+
+    Returns:
+        自然方向坐标
+    """
+    rotation %= 4
+    if rotation == 1:
+        return width - 1 - y, x
+    if rotation == 2:
+        return width - 1 - x, height - 1 - y
+    if rotation == 3:
+        return y, height - 1 - x
+    return x, y
+
+
+def from_natural(x: int, y: int, rotation: int,
+                 width: int, height: int) -> Tuple[int, int]:
+    """
+    自然方向坐标转换为指定方向坐标（to_natural的逆变换）
+
+    Args:
+        x, y: 自然方向坐标
+        rotation: 目标方向
+        width, height: 自然方向的物理尺寸
+
+    Returns:
+        目标方向坐标
+    """
+    rotation %= 4
+    if rotation == 1:
+        return y, width - 1 - x
+    if rotation == 2:
+        return width - 1 - x, height - 1 - y
+    if rotation == 3:
+        return height - 1 - y, x
+    return x, y
+
+
+def rotate_point(x: int, y: int, from_rotation: int, to_rotation: int,
+                 width: int, height: int) -> Tuple[int, int]:
+    """
+    在两个方向之间转换坐标
+
+    Args:
+        x, y: 坐标
+        from_rotation: 坐标所在方向
+        to_rotation: 目标方向
+        width, height: 自然方向的物理尺寸
+
+    Returns:
+        目标方向坐标
+    """
+    if from_rotation % 4 == to_rotation % 4:
+        return x, y
+    nx, ny = to_natural(x, y, from_rotation, width, height)
+    return from_natural(nx, ny, to_rotation, width, height)
@@ -0,0 +1,159 @@
+"""
+后台截图线程 - 截图与识别流水线化
+"""
+
+from __future__ import annotations
+
+import time
+import threading
+from typing import Any, Callable, Optional, Tuple
+from loguru import logger
+
+from core.monitoring.log import log_every
+from core.utils import lazy_import
+
+np = lazy_import("numpy")
+
+
+class FrameGrabber:
+    """
+    后台截图线程
+
+    生产者线程持续截图并解码到双缓冲中，消费者取比指定时间戳更新的最新帧。
+    ADB往返与模板匹配因此可以重叠执行。
+
+    截图函数返回的帧归生产者持有，被新帧替换出双缓冲时release；latest()交出帧前
+    为消费者retain，消费者用完后自行release。
+    """
+
+    def __init__(self, capture_func: Callable[[], Optional[np.ndarray]],
+                 interval: float = 0.0, name: str = "frame-grabber",
+                 retain: Optional[Callable[[np.ndarray], Any]] = None,
+                 release: Optional[Callable[[np.ndarray], Any]] = None):
+        """
+        初始化
+
+        Args:
+            capture_func: 截图函数，返回BGR图像或None
+            interval: 两次截图之间的最小间隔（秒）
+            name: 线程名称
+            retain: 为帧增加持有者（帧来自缓冲池时）
+            release: 释放帧的一个持有者
+        """
+        self._capture_func = capture_func
+        self._interval = interval
+        self._name = name
+        self._retain = retain or (lambda frame: None)
+        self._release = release or (lambda frame: None)
+
+        # 双缓冲：前缓冲给消费者，后缓冲由生产者写入
+        self._front: Optional[np.ndarray] = None
+        self._front_time = 0.0
+        self._back: Optional[np.ndarray] = None
+        self._back_time = 0.0
+
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+        self._frame_count = 0
+
+    @property
+    def running(self) -> bool:
+        """是否在运行"""
+        return self._running
+
+    @property
+    def frame_count(self) -> int:
+        """已生产的帧数"""
+        return self._frame_count
+
+    @property
+    def thread_id(self) -> Optional[int]:
+        """生产者线程ID（未启动时为None）"""
+        return self._thread.ident if self._thread else None
+
+    def start(self) -> None:
+        """启动生产者线程"""
+        if self._running:
+            return
+
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name=self._name, daemon=True)
+        self._thread.start()
+        logger.info(f"Frame grabber started: {self._name}")
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """停止生产者线程"""
+        if not self._running:
+            return
+
+        self._running = False
+        with self._cond:
+            self._cond.notify_all()
+
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        with self._cond:
+            for frame in (self._front, self._back):
+                if frame is not None:
+                    self._release(frame)
+            self._front = self._back = None
+            self._front_time = self._back_time = 0.0
+        logger.info(f"Frame grabber stopped: {self._name}")
+
+    def latest(self, newer_than: float = 0.0,
+               timeout: float = 5.0) -> Optional[Tuple[np.ndarray, float]]:
+        """
+        获取最新帧
+
+        Args:
+            newer_than: 只接受截图开始时间晚于该时间戳的帧
+            timeout: 等待超时（秒）
+
+        Returns:
+            (图像, 截图开始时间) 或 None；图像已为调用方retain，用完后release
+        """
+        deadline = time.time() + timeout
+
+        with self._cond:
+            while self._front is None or self._front_time <= newer_than:
+                remaining = deadline - time.time()
+                if remaining <= 0 or not self._running:
+                    return None
+                self._cond.wait(remaining)
+
+            self._retain(self._front)
+            return self._front, self._front_time
+
+    def _run(self) -> None:
+        """生产者循环"""
+        while self._running:
+            started = time.time()
+
+            try:
+                frame = self._capture_func()
+            except Exception as e:
+                # 设备异常时每帧都会失败，限频避免刷屏
+                log_every(5.0, "ERROR", "Frame grabber capture error: {}", e)
+                frame = None
+
+            if frame is None:
+                # 截图失败时稍作退避，避免空转
+                time.sleep(max(self._interval, 0.1))
+                continue
+
+            # 写入后缓冲（替换出的旧帧释放），再与前缓冲交换
+            if self._back is not None:
+                self._release(self._back)
+            self._back = frame
+            self._back_time = started
+            with self._cond:
+                self._front, self._back = self._back, self._front
+                self._front_time, self._back_time = self._back_time, self._front_time
+                self._frame_count += 1
+                self._cond.notify_all()
+
+            elapsed = time.time() - started
+            if elapsed < self._interval:
+                time.sleep(self._interval - elapsed)
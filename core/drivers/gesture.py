@@ -0,0 +1,372 @@
+"""
+手势 - 折线轨迹、多指和按住拖动，编译为设备端脚本一次执行
+"""
+
+import math
+import re
+from dataclasses import dataclass, asdict
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+# Linux输入事件（多点触控协议B）
+EV_SYN = 0
+EV_KEY = 1
+EV_ABS = 3
+SYN_REPORT = 0
+BTN_TOUCH = 330
+ABS_MT_SLOT = 47
+ABS_MT_TOUCH_MAJOR = 48
+ABS_MT_POSITION_X = 53
+ABS_MT_POSITION_Y = 54
+ABS_MT_TRACKING_ID = 57
+ABS_MT_PRESSURE = 58
+
+# 检测触摸设备：设备能力列表 + 可写的输入节点
+TOUCH_DETECT_COMMANDS = [
+    "getevent -lp",
+    'for d in /dev/input/event*; do [ -w "$d" ] && echo "writable:$d"; done; true',
+]
+
+KeyPoint = Tuple[float, float, float]  # (x, y, 毫秒)
+
+
+class Stroke:
+    """一根手指的轨迹，关键点之间按时间线性插值"""
+
+    def __init__(self, points: List[KeyPoint]):
+        if not points:
+            raise ValueError("Stroke needs at least one point")
+        self.points = sorted(points, key=lambda p: p[2])
+
+    @property
+    def start(self) -> float:
+        return self.points[0][2]
+
+    @property
+    def end(self) -> float:
+        return self.points[-1][2]
+
+    def position(self, t: float) -> Optional[Tuple[int, int]]:
+        """
+        t时刻的位置
+
+        Returns:
+            (x, y)，手指未按下时返回None
+        """
+        if t < self.start or t > self.end:
+            return None
+
+        for (x1, y1, t1), (x2, y2, t2) in zip(self.points, self.points[1:]):
+            if t1 <= t <= t2:
+                k = (t - t1) / (t2 - t1) if t2 > t1 else 1.0
+                return round(x1 + (x2 - x1) * k), round(y1 + (y2 - y1) * k)
+
+        x, y, _ = self.points[-1]
+        return round(x), round(y)
+
+
+class Gesture:
+    """
+    手势：一组同时进行的手指轨迹
+
+    坐标使用与tap相同的坐标系，时间单位为毫秒。
+    """
+
+    def __init__(self, strokes: Optional[List[Stroke]] = None):
+        self.strokes: List[Stroke] = list(strokes or [])
+
+    def add(self, points: List[KeyPoint]) -> 'Gesture':
+        """添加一根手指的关键点(x, y, 毫秒)，返回自身便于链式调用"""
+        self.strokes.append(Stroke(points))
+        return self
+
+    @property
+    def duration(self) -> float:
+        """总时长（毫秒）"""
+        return max((s.end for s in self.strokes), default=0.0)
+
+    def key_times(self) -> List[float]:
+        """所有关键点时刻"""
+        return sorted({p[2] for s in self.strokes for p in s.points})
+
+    @classmethod
+    def path(cls, points: List[Tuple[int, int]], duration: float = 500,
+             hold: float = 0) -> 'Gesture':
+        """
+        单指折线轨迹，按线段长度分配时间
+
+        Args:
+            points: 轨迹点
+            duration: 移动时长（毫秒）
+            hold: 在起点按住的时长（毫秒）
+        """
+        lengths = [math.dist(a, b) for a, b in zip(points, points[1:])]
+        total = sum(lengths) or 1.0
+        keypoints = [(points[0][0], points[0][1], 0.0)]
+        if hold:
+            keypoints.append((points[0][0], points[0][1], hold))
+        t = hold
+        for (x, y), length in zip(points[1:], lengths):
+            t += duration * length / total
+            keypoints.append((x, y, t))
+        return cls().add(keypoints)
+
+    @classmethod
+    def hold(cls, x: int, y: int, duration: float = 1000) -> 'Gesture':
+        """长按"""
+        return cls().add([(x, y, 0.0), (x, y, duration)])
+
+    @classmethod
+    def drag(cls, x1: int, y1: int, x2: int, y2: int,
+             hold: float = 500, duration: float = 300, release_hold: float = 100) -> 'Gesture':
+        """
+        按住-移动-松开（拖放）
+
+        Args:
+            x1, y1: 起点
+            x2, y2: 终点
+            hold: 起点按住时长（毫秒）
+            duration: 移动时长（毫秒）
+            release_hold: 终点停留后再松开（毫秒）
+        """
+        return cls().add([
+            (x1, y1, 0.0),
+            (x1, y1, hold),
+            (x2, y2, hold + duration),
+            (x2, y2, hold + duration + release_hold),
+        ])
+
+    @classmethod
+    def pinch(cls, cx: int, cy: int, start_distance: float, end_distance: float,
+              duration: float = 500, angle: float = 0.0) -> 'Gesture':
+        """
+        双指缩放
+
+        Args:
+            cx, cy: 中心点
+            start_distance: 两指起始距离
+            end_distance: 两指结束距离
+            duration: 时长（毫秒）
+            angle: 两指连线角度（度）
+        """
+        dx, dy = math.cos(math.radians(angle)) / 2, math.sin(math.radians(angle)) / 2
+        gesture = cls()
+        for sign in (1, -1):
+            gesture.add([
+                (cx + sign * dx * start_distance, cy + sign * dy * start_distance, 0.0),
+                (cx + sign * dx * end_distance, cy + sign * dy * end_distance, duration),
+            ])
+        return gesture
+
+
+@dataclass
+class TouchDevice:
+    """触摸屏输入节点及坐标轴范围"""
+    path: str
+    x_min: int
+    x_max: int
+    y_min: int
+    y_max: int
+    slots: int = 10
+    pressure_max: int = 0
+    touch_major_max: int = 0
+    writable: bool = False
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'TouchDevice':
+        return cls(**data)
+
+    def scale(self, x: int, y: int, width: int, height: int) -> Tuple[int, int]:
+        """
+        面板像素坐标转换为轴坐标
+
+        Args:
+            x, y: 自然方向像素坐标
+            width, height: 自然方向的物理尺寸
+        """
+        ax = self.x_min + round(x * (self.x_max - self.x_min) / max(1, width - 1))
+        ay = self.y_min + round(y * (self.y_max - self.y_min) / max(1, height - 1))
+        return (min(self.x_max, max(self.x_min, ax)),
+                min(self.y_max, max(self.y_min, ay)))
+
+    @classmethod
+    def parse(cls, getevent_output: str, writable_output: str = "") -> Optional['TouchDevice']:
+        """
+        解析 getevent -lp 输出
+
+        Args:
+            getevent_output: getevent -lp 输出
+            writable_output: 可写节点列表（writable:/dev/input/eventN）
+
+        Returns:
+            多点触控设备（优先INPUT_PROP_DIRECT），没有时返回None
+        """
+        writable = set(re.findall(r"writable:(\S+)", writable_output))
+        candidates = []
+        for block in re.split(r"^add device \d+:\s*", getevent_output, flags=re.M)[1:]:
+            path = block.split(None, 1)[0]
+            axes = {
+                name: (int(low), int(high))
+                for name, low, high in re.findall(
+                    r"(ABS_MT_\w+)\s*:\s*value -?\d+, min (-?\d+), max (-?\d+)", block)
+            }
+            if "ABS_MT_POSITION_X" not in axes or "ABS_MT_POSITION_Y" not in axes:
+                continue
+
+            device = cls(
+                path,
+                *axes["ABS_MT_POSITION_X"],
+                *axes["ABS_MT_POSITION_Y"],
+                slots=axes.get("ABS_MT_SLOT", (0, 9))[1] + 1,
+                pressure_max=axes.get("ABS_MT_PRESSURE", (0, 0))[1],
+                touch_major_max=axes.get("ABS_MT_TOUCH_MAJOR", (0, 0))[1],
+                writable=path in writable,
+            )
+            candidates.append(("INPUT_PROP_DIRECT" in block, device))
+
+        if not candidates:
+            return None
+        candidates.sort(key=lambda c: not c[0])
+        return candidates[0][1]
+
+
+def _sample_times(gesture: Gesture, step: float) -> List[float]:
+    """固定步长采样并包含所有关键点时刻"""
+    times = set(gesture.key_times())
+    t = 0.0
+    while t < gesture.duration:
+        times.add(t)
+        t += step
+    return sorted(times)
+
+
+def compile_sendevent(gesture: Gesture, device: TouchDevice,
+                      to_panel: Callable[[int, int], Tuple[int, int]],
+                      panel_size: Tuple[int, int],
+                      step: float = 16) -> str:
+    """
+    编译为sendevent脚本（多点触控协议B）
+
+    Args:
+        gesture: 手势
+        device: 触摸设备
+        to_panel: 坐标到面板（自然方向）像素坐标的转换
+        panel_size: 自然方向物理尺寸
+        step: 采样步长（毫秒）
+
+    Returns:
+        设备端shell脚本
+    """
+    if len(gesture.strokes) > device.slots:
+        raise ValueError(f"Gesture uses {len(gesture.strokes)} fingers, device supports {device.slots}")
+
+    lines: List[str] = []
+    frame: List[str] = []
+    current_slot = [-1]
+    active: Dict[int, Tuple[int, int]] = {}
+
+    def event(ev_type: int, code: int, value: int) -> None:
+        frame.append(f"sendevent {device.path} {ev_type} {code} {value}")
+
+    def select(slot: int) -> None:
+        if current_slot[0] != slot:
+            event(EV_ABS, ABS_MT_SLOT, slot)
+            current_slot[0] = slot
+
+    last_time = 0.0
+    times = _sample_times(gesture, step) + [gesture.duration + step]
+    for t in times:
+        frame.clear()
+        was_touching = bool(active)
+        for slot, stroke in enumerate(gesture.strokes):
+            position = stroke.position(t)
+            if position is None:
+                if slot in active:
+                    select(slot)
+                    event(EV_ABS, ABS_MT_TRACKING_ID, -1)
+                    del active[slot]
+                continue
+
+            axis = device.scale(*to_panel(*position), *panel_size)
+            previous = active.get(slot)
+            if previous == axis:
+                continue
+
+            select(slot)
+            if previous is None:
+                event(EV_ABS, ABS_MT_TRACKING_ID, 100 + slot)
+                if device.touch_major_max:
+                    event(EV_ABS, ABS_MT_TOUCH_MAJOR, max(1, device.touch_major_max // 16))
+                if device.pressure_max:
+                    event(EV_ABS, ABS_MT_PRESSURE, max(1, device.pressure_max // 2))
+            if previous is None or previous[0] != axis[0]:
+                event(EV_ABS, ABS_MT_POSITION_X, axis[0])
+            if previous is None or previous[1] != axis[1]:
+                event(EV_ABS, ABS_MT_POSITION_Y, axis[1])
+            active[slot] = axis
+
+        # 没有变化的采样点不输出，等待时间并入下一次sleep
+        if not frame:
+            continue
+        if active and not was_touching:
+            event(EV_KEY, BTN_TOUCH, 1)
+        elif was_touching and not active:
+            event(EV_KEY, BTN_TOUCH, 0)
+        event(EV_SYN, SYN_REPORT, 0)
+
+        if t > last_time:
+            lines.append(f"sleep {(t - last_time) / 1000:.3f}")
+            last_time = t
+        lines.extend(frame)
+
+    return "\n".join(lines)
+
+
+def compile_motionevent(gesture: Gesture,
+                        transform: Callable[[int, int], Tuple[int, int]],
+                        step: float = 50) -> str:
+    """
+    编译为 input motionevent 脚本（Android 10+，仅单指）
+
+    每条input命令都要启动一次进程，采样步长应比sendevent粗。
+
+    Args:
+        gesture: 手势
+        transform: 坐标到当前显示方向的转换
+        step: 采样步长（毫秒）
+
+    Returns:
+        设备端shell脚本
+    """
+    if len(gesture.strokes) != 1:
+        raise ValueError("input motionevent supports a single finger only")
+
+    stroke = gesture.strokes[0]
+    times = [t for t in _sample_times(gesture, step) if t >= stroke.start]
+    lines: List[str] = []
+    last_time = stroke.start
+    previous = None
+    for i, t in enumerate(times):
+        position = transform(*stroke.position(t))
+        last = i == len(times) - 1
+        if i == 0:
+            action = "DOWN"
+        elif position != previous:
+            action = "MOVE"
+        elif not last:
+            continue
+        else:
+            action = None
+
+        if t > last_time:
+            lines.append(f"sleep {(t - last_time) / 1000:.3f}")
+            last_time = t
+        if action:
+            lines.append(f"input motionevent {action} {position[0]} {position[1]}")
+        if last:
+            lines.append(f"input motionevent UP {position[0]} {position[1]}")
+        previous = position
+    return "\n".join(lines)
@@ -0,0 +1,153 @@
+"""
+连接健康监控 - 心跳、看门狗与自动重连
+"""
+
+import threading
+from typing import Optional
+from loguru import logger
+
+from core.events import EventBus, event_bus
+from .adb_driver import ADBDriver
+
+
+class ConnectionState:
+    """连接状态"""
+    CONNECTED = "connected"
+    LOST = "lost"
+    RECONNECTING = "reconnecting"
+
+
+class ConnectionMonitor:
+    """
+    设备连接监控
+
+    后台线程定期发送轻量心跳。连续失败时判定连接丢失：先终止卡住的adb命令，
+    让调用方立即返回而不是等满超时，然后用已知序列号重连。重启adb server会断开
+    本机所有设备，默认不启用（restart_server_after > 0 时多次重连失败后重启）。
+    状态变化通过事件总线发布 device.connection 事件。
+    """
+
+    EVENT = "device.connection"
+
+    def __init__(self, adb: ADBDriver,
+                 interval: float = 5.0,
+                 timeout: float = 2.0,
+                 max_failures: int = 2,
+                 restart_server_after: int = 0,
+                 bus: Optional[EventBus] = None):
+        """
+        初始化
+
+        Args:
+            adb: ADB驱动
+            interval: 心跳间隔（秒）
+            timeout: 心跳超时（秒）
+            max_failures: 连续心跳失败多少次判定为断开
+            restart_server_after: 连续重连失败多少次后重启adb server，0为不重启
+            bus: 事件总线，默认使用全局实例
+        """
+        self.adb = adb
+        self.interval = interval
+        self.timeout = timeout
+        self.max_failures = max_failures
+        self.restart_server_after = restart_server_after
+        self.bus = bus or event_bus
+
+        self._state = ConnectionState.CONNECTED
+        self._failures = 0
+        self._reconnect_attempts = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def state(self) -> str:
+        """当前连接状态"""
+        return self._state
+
+    @property
+    def thread_id(self) -> Optional[int]:
+        """心跳线程ID（未启动时为None）"""
+        return self._thread.ident if self._thread else None
+
+    def start(self) -> None:
+        """启动监控线程"""
+        if self._thread and self._thread.is_alive():
+            return
+
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name=f"health-{self.adb.device_id}", daemon=True
+        )
+        self._thread.start()
+        logger.info(f"Connection monitor started for {self.adb.device_id}")
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """停止监控线程"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def check(self) -> bool:
+        """
+        执行一次心跳并处理结果
+
+        Returns:
+            设备是否可用
+        """
+        if self.adb.ping(self.timeout):
+            # 重连失败后设备自行恢复时，驱动的connected标志也要恢复，两者始终一致
+            self.adb.connected = True
+            self._failures = 0
+            self._reconnect_attempts = 0
+            self._set_state(ConnectionState.CONNECTED)
+            return True
+
+        self._failures += 1
+        logger.warning(f"Heartbeat failed for {self.adb.device_id} ({self._failures}/{self.max_failures})")
+        if self._failures < self.max_failures:
+            return True
+
+        # 判定断开：立即终止卡住的命令，避免调用方逐个等待超时
+        self._set_state(ConnectionState.LOST)
+        self.adb.connected = False
+        self.adb.kill_inflight()
+        return self._recover()
+
+    def _recover(self) -> bool:
+        """尝试重连"""
+        self._set_state(ConnectionState.RECONNECTING)
+        restart = 0 < self.restart_server_after <= self._reconnect_attempts + 1
+        result = self.adb.reconnect(restart_server=restart)
+        self._reconnect_attempts += 1
+
+        if result.is_ok():
+            self._failures = 0
+            self._reconnect_attempts = 0
+            self._set_state(ConnectionState.CONNECTED)
+            return True
+
+        logger.error(f"Reconnect failed: {result.error}")
+        self._set_state(ConnectionState.LOST)
+        return False
+
+    def _set_state(self, state: str) -> None:
+        if state == self._state:
+            return
+
+        previous = self._state
+        self._state = state
+        logger.info(f"Device {self.adb.device_id} connection: {previous} -> {state}")
+        self.bus.emit(self.EVENT, {
+            'device': self.adb.device_id,
+            'state': state,
+            'previous': previous,
+        })
+
+    def _run(self) -> None:
+        """心跳循环"""
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                logger.error(f"Connection monitor error: {e}")
@@ -2,28 +2,102 @@
 输入驱动 - 简单的点击和滑动
 """
 
-import time
 import random
 from typing import Tuple, Optional, List
 from loguru import logger
 
 from core import Result
 from .adb_driver import ADBDriver
+from .device_info import DeviceSnapshot, rotate_point, to_natural
+from .pacing import InputPacer
+from .text_entry import (
+    TextCapabilities, ADB_KEYBOARD_IME, BACKENDS, TEXT_DETECT_COMMANDS,
+    build_commands, choose_backend, is_plain
+)
+from .gesture import (
+    Gesture, TouchDevice, TOUCH_DETECT_COMMANDS, compile_sendevent, compile_motionevent
+)
 
 
 class InputDriver:
     """简单的输入驱动"""
     
-    def __init__(self, adb: ADBDriver):
+    def __init__(self, adb: ADBDriver, pacer: Optional[InputPacer] = None):
         """
         初始化
         
         Args:
             adb: ADB驱动实例
+            pacer: 操作节奏控制，None时使用默认参数
         """
         self.adb = adb
-        self._last_action_time = 0
-        self._min_interval = 0.1  # 最小操作间隔
+        self.pacer = pacer or InputPacer()
+        self._touch: Optional[TouchDevice] = None
+        self._text_caps: Optional[TextCapabilities] = None
+        # 二进制操作日志（core.monitoring.ActionJournal），None为不记录
+        self.journal = None
+        # 文本输入方式：auto/ime/clipboard/input
+        self.text_backend = "auto"
+        self.text_short_limit = 8
+        self.restore_ime = True
+        # 点击方式：input（input tap）/ sendevent（需要可写的触摸节点）
+        self.tap_backend = "input"
+        self._touch_detected = False
+        # 坐标编写时的屏幕方向，None表示坐标总是按当前方向给出（不变换）
+        self.coordinate_rotation: Optional[int] = None
+    
+    @property
+    def device(self) -> Optional[DeviceSnapshot]:
+        """缓存的设备快照（不发起新的设备查询，除非尚未获取过）"""
+        result = self.adb.snapshot()
+        return result.unwrap() if result.is_ok() else None
+    
+    def set_coordinate_rotation(self, rotation: Optional[int]) -> None:
+        """
+        设置坐标编写时的屏幕方向
+        
+        设备旋转到其他方向时，坐标会根据缓存的设备快照自动变换。
+        
+        Args:
+            rotation: 0/1/2/3，None表示不变换
+        """
+        self.coordinate_rotation = None if rotation is None else rotation % 4
+    
+    def transform(self, x: int, y: int) -> Tuple[int, int]:
+        """
+        将编写方向的坐标转换为当前显示方向的坐标
+        
+        Args:
+            x, y: 坐标
+            
+        Returns:
+            当前方向下的坐标
+        """
+        if self.coordinate_rotation is None:
+            return x, y
+        
+        device = self.device
+        if device is None or device.rotation == self.coordinate_rotation:
+            return x, y
+        
+        return rotate_point(x, y, self.coordinate_rotation, device.rotation,
+                            device.width, device.height)
+    
+    def to_touch_panel(self, x: int, y: int) -> Tuple[int, int]:
+        """
+        将坐标转换为触摸屏面板（自然方向）坐标，供原始触摸事件使用
+        
+        Args:
+            x, y: 坐标
+            
+        Returns:
+            自然方向坐标
+        """
+        x, y = self.transform(x, y)
+        device = self.device
+        if device is None:
+            return x, y
+        return to_natural(x, y, device.rotation, device.width, device.height)
     
     def tap(self, x: int, y: int, duration: int = 50) -> Result[bool]:
         """
@@ -41,8 +115,16 @@ class InputDriver:
         x += random.randint(-2, 2)
         y += random.randint(-2, 2)
         
-        # 确保最小间隔
-        self._wait_min_interval()
+        # sendevent点击省去设备端启动input进程的开销
+        if self.tap_backend == "sendevent":
+            touch = self.touch_device
+            if touch and touch.writable:
+                return self.gesture(Gesture.hold(x, y, duration))
+        
+        x, y = self.transform(x, y)
+        
+        # 按设备响应延迟等待
+        self.pacer.wait()
         
         # 执行点击
         cmd = f"input tap {x} {y}"
@@ -52,8 +134,9 @@ class InputDriver:
         result = self.adb.shell(cmd)
         
         if result.is_ok():
-            logger.debug(f"Tap at ({x}, {y})")
-            self._last_action_time = time.time()
+            logger.debug("Tap at ({}, {})", x, y)
+            self._journal("tap", x, y, value=duration)
+            self.pacer.action_sent()
             return Result.ok(True)
         else:
             return Result.fail(f"Tap failed: {result.error}")
@@ -71,8 +154,11 @@ class InputDriver:
         Returns:
             Result[bool]: 操作结果
         """
-        # 确保最小间隔
-        self._wait_min_interval()
+        # 按设备响应延迟等待
+        self.pacer.wait()
+        
+        x1, y1 = self.transform(x1, y1)
+        x2, y2 = self.transform(x2, y2)
         
         # 添加轻微随机
         x1 += random.randint(-2, 2)
@@ -85,8 +171,9 @@ class InputDriver:
         result = self.adb.shell(cmd)
         
         if result.is_ok():
-            logger.debug(f"Swipe from ({x1}, {y1}) to ({x2}, {y2})")
-            self._last_action_time = time.time()
+            logger.debug("Swipe from ({}, {}) to ({}, {})", x1, y1, x2, y2)
+            self._journal("swipe", x1, y1, x2, y2, duration)
+            self.pacer.action_sent()
             return Result.ok(True)
         else:
             return Result.fail(f"Swipe failed: {result.error}")
@@ -103,35 +190,196 @@ class InputDriver:
         Returns:
             Result[bool]: 操作结果
         """
+        touch = self.touch_device
+        if touch and touch.writable:
+            return self.gesture(Gesture.hold(x, y, duration))
         return self.tap(x, y, duration)
     
-    def text(self, content: str) -> Result[bool]:
+    @property
+    def touch_device(self) -> Optional[TouchDevice]:
+        """触摸设备（首次访问时检测并缓存）"""
+        if not self._touch_detected:
+            result = self.detect_touch_device()
+            if result.is_fail():
+                logger.warning(result.error)
+        return self._touch
+    
+    @property
+    def touch_detected(self) -> bool:
+        """是否已检测（或设置）过触摸设备"""
+        return self._touch_detected
+    
+    def set_touch_device(self, device: Optional[TouchDevice]) -> None:
+        """
+        设置触摸设备（如从会话缓存恢复），跳过检测
+        
+        Args:
+            device: 触摸设备，None表示设备没有可用的触摸节点
+        """
+        self._touch = device
+        self._touch_detected = True
+    
+    def detect_touch_device(self) -> Result[TouchDevice]:
+        """
+        检测触摸输入节点和坐标轴范围（一次shell往返）
+        
+        Returns:
+            Result[TouchDevice]: 检测结果
+        """
+        result = self.adb.shell_many(TOUCH_DETECT_COMMANDS)
+        if result.is_fail():
+            return Result.fail(f"Touch device detection failed: {result.error}")
+        
+        outputs = [r.data.stdout if r.data else "" for r in result.unwrap()]
+        device = TouchDevice.parse(*outputs)
+        self._touch = device
+        self._touch_detected = True
+        if device is None:
+            return Result.fail("No multi-touch input device found")
+        
+        logger.info(f"Touch device: {device.path} x[{device.x_min},{device.x_max}] "
+                    f"y[{device.y_min},{device.y_max}] slots={device.slots} "
+                    f"writable={device.writable}")
+        return Result.ok(device)
+    
+    def gesture(self, gesture: Gesture, step: float = 16) -> Result[bool]:
+        """
+        执行手势（折线、多指、按住拖动），整个手势在一次ADB调用中完成
+        
+        触摸节点可写时编译为sendevent脚本；否则单指手势在Android 10+上使用
+        input motionevent。
+        
+        Args:
+            gesture: 手势
+            step: 采样步长（毫秒）
+            
+        Returns:
+            Result[bool]: 操作结果
+        """
+        if not gesture.strokes:
+            return Result.fail("Empty gesture")
+        
+        touch = self.touch_device
+        device = self.device
+        try:
+            if touch and touch.writable and device:
+                script = compile_sendevent(gesture, touch, self.to_touch_panel,
+                                           (device.width, device.height), step)
+            elif len(gesture.strokes) == 1 and device and device.sdk >= 29:
+                script = compile_motionevent(gesture, self.transform, max(step, 50))
+            else:
+                return Result.fail("Gesture requires a writable touch device "
+                                   "(or Android 10+ for single-finger gestures)")
+        except ValueError as e:
+            return Result.fail(f"Gesture compile failed: {e}")
+        
+        # 按设备响应延迟等待
+        self.pacer.wait()
+        
+        result = self.adb.shell_many([script], timeout=gesture.duration / 1000 + 10)
+        if result.is_ok():
+            result = result.unwrap()[0]
+        
+        if result.is_ok():
+            logger.debug("Gesture: {} finger(s), {:.0f}ms", len(gesture.strokes), gesture.duration)
+            first, last = gesture.strokes[0].points[0], gesture.strokes[0].points[-1]
+            self._journal("gesture", first[0], first[1], last[0], last[1], gesture.duration)
+            self.pacer.action_sent()
+            return Result.ok(True)
+        else:
+            return Result.fail(f"Gesture failed: {result.error}")
+    
+    def drag(self, x1: int, y1: int, x2: int, y2: int,
+             hold: int = 500, duration: int = 300) -> Result[bool]:
+        """
+        拖放：按住起点后移动到终点再松开
+        
+        Args:
+            x1, y1: 起点
+            x2, y2: 终点
+            hold: 起点按住时长（毫秒）
+            duration: 移动时长（毫秒）
+            
+        Returns:
+            Result[bool]: 操作结果
+        """
+        return self.gesture(Gesture.drag(x1, y1, x2, y2, hold, duration))
+    
+    def pinch(self, x: int, y: int, start_distance: float, end_distance: float,
+              duration: int = 500) -> Result[bool]:
+        """
+        双指缩放
+        
+        Args:
+            x, y: 中心点
+            start_distance: 两指起始距离
+            end_distance: 两指结束距离（大于起始距离为放大）
+            duration: 时长（毫秒）
+            
+        Returns:
+            Result[bool]: 操作结果
+        """
+        return self.gesture(Gesture.pinch(x, y, start_distance, end_distance, duration))
+    
+    def text(self, content: str, backend: Optional[str] = None) -> Result[bool]:
         """
         输入文本
         
+        默认按内容和长度自动选择：短ASCII用input text；长文本或中文优先用
+        ADBKeyBoard广播（base64），其次Clipper剪贴板粘贴。所有命令一次往返执行。
+        
         Args:
             content: 文本内容
+            backend: 指定输入方式 ime/clipboard/input，None为按text_backend设置
             
         Returns:
             Result[bool]: 操作结果
         """
-        # 确保最小间隔
-        self._wait_min_interval()
+        backend = backend or self.text_backend
+        if backend not in BACKENDS:
+            backend = "input" if is_plain(content) and len(content) <= self.text_short_limit else None
+        # input text 不需要检测设备能力
+        caps = TextCapabilities() if backend == "input" else self.text_capabilities
+        if backend is None:
+            backend = choose_backend(content, caps, self.text_short_limit)
         
-        # 转义特殊字符
-        content = content.replace(' ', '%s')
-        content = content.replace('"', '\\"')
-        content = content.replace("'", "\\'")
+        if backend == "input" and not is_plain(content):
+            return Result.fail("Text contains non-ASCII characters; install ADBKeyBoard or Clipper")
         
-        cmd = f'input text "{content}"'
-        result = self.adb.shell(cmd)
+        # 按设备响应延迟等待
+        self.pacer.wait()
+        
+        commands = build_commands(backend, content, caps, self.restore_ime)
+        result = self.adb.shell_many(commands, timeout=10 + len(content) * 0.05)
+        if result.is_ok():
+            failed = [r for r in result.unwrap() if r.is_fail()]
+            if failed:
+                result = failed[0]
         
         if result.is_ok():
-            logger.debug(f"Input text: {content[:20]}...")
-            self._last_action_time = time.time()
+            if backend == "ime" and not self.restore_ime:
+                caps.current_ime = ADB_KEYBOARD_IME
+            logger.debug("Input text ({}): {}...", backend, content[:20])
+            self._journal("text", value=len(content))
+            self.pacer.action_sent()
             return Result.ok(True)
         else:
-            return Result.fail(f"Text input failed: {result.error}")
+            return Result.fail(f"Text input failed ({backend}): {result.error}")
+    
+    @property
+    def text_capabilities(self) -> TextCapabilities:
+        """设备支持的文本输入方式（首次访问时检测并缓存）"""
+        if self._text_caps is None:
+            result = self.adb.shell_many(TEXT_DETECT_COMMANDS)
+            if result.is_fail():
+                logger.warning(f"Text input detection failed: {result.error}")
+                return TextCapabilities()
+            
+            outputs = [r.data.stdout if r.data else "" for r in result.unwrap()]
+            self._text_caps = TextCapabilities.parse(outputs)
+            logger.info(f"Text input: adb_keyboard={self._text_caps.adb_keyboard}, "
+                        f"clipper={self._text_caps.clipper}")
+        return self._text_caps
     
     def key_event(self, keycode: int) -> Result[bool]:
         """
@@ -143,15 +391,16 @@ class InputDriver:
         Returns:
             Result[bool]: 操作结果
         """
-        # 确保最小间隔
-        self._wait_min_interval()
+        # 按设备响应延迟等待
+        self.pacer.wait()
         
         cmd = f"input keyevent {keycode}"
         result = self.adb.shell(cmd)
         
         if result.is_ok():
-            logger.debug(f"Key event: {keycode}")
-            self._last_action_time = time.time()
+            logger.debug("Key event: {}", keycode)
+            self._journal("key", value=keycode)
+            self.pacer.action_sent()
             return Result.ok(True)
         else:
             return Result.fail(f"Key event failed: {result.error}")
@@ -168,20 +417,17 @@ class InputDriver:
         """最近任务键"""
         return self.key_event(187)
     
-    def _wait_min_interval(self) -> None:
-        """确保最小操作间隔"""
-        elapsed = time.time() - self._last_action_time
-        if elapsed < self._min_interval:
-            wait_time = self._min_interval - elapsed
-            # 添加10-30ms随机延迟
-            wait_time += random.uniform(0.01, 0.03)
-            time.sleep(wait_time)
-    
     def set_min_interval(self, interval: float) -> None:
         """
-        设置最小操作间隔
+        设置最小操作间隔（立即生效，自适应时测到更长的响应延迟后再调大）
         
         Args:
             interval: 间隔时间（秒）
         """
-        self._min_interval = max(0.05, interval)  # 最小50ms
\ No newline at end of file
+        self.pacer.set_interval(max(0.05, interval))  # 最小50ms
+    
+    def _journal(self, action: str, x: int = 0, y: int = 0, x2: int = 0, y2: int = 0,
+                 value: int = 0) -> None:
+        """记录操作到二进制日志"""
+        if self.journal is not None:
+            self.journal.record(action, x, y, x2, y2, value)
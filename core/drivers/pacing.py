@@ -0,0 +1,204 @@
+"""
+输入节奏控制 - 根据设备画面响应延迟自适应调整操作间隔
+"""
+
+from __future__ import annotations
+
+import random
+import time
+from typing import Optional
+from loguru import logger
+
+from core.utils import lazy_import
+
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
+
+
+class InputPacer:
+    """
+    自适应操作节奏
+
+    每次输入后记录发送时间，之后观察到的帧与操作前的最后一帧比较。
+    只有响应被前后两帧夹住时才产生样本：操作后先有一帧仍未变化（响应的下界），
+    紧接着的一帧出现明显变化（上界），取两帧时间的中点作为延迟。两帧的最大间隔随取帧
+    间隔放宽（非流水线模式下取帧间隔包含截图本身的耗时）。
+    操作后第一次取帧就已变化的（例如任务自己sleep了一段时间）无法确定延迟，直接丢弃，
+    否则任务的等待时间会被当成设备延迟。用指数滑动平均维护估计值，
+    操作间隔 = 估计值 × margin，限制在 [min_delay, max_delay] 内；
+    还没有估计值时使用固定的interval。
+    """
+
+    THUMB_SIZE = (64, 36)
+
+    def __init__(self, initial: Optional[float] = None,
+                 interval: float = 0.1,
+                 min_delay: float = 0.05,
+                 max_delay: float = 1.5,
+                 margin: float = 1.2,
+                 alpha: float = 0.3,
+                 change_threshold: float = 6.0,
+                 settle_timeout: float = 2.0,
+                 bracket: float = 0.3,
+                 adaptive: bool = True):
+        """
+        初始化
+
+        Args:
+            initial: 初始延迟估计（秒），None为测到样本前使用interval
+            interval: 固定操作间隔（秒），关闭自适应或还没有估计值时使用
+            min_delay: 操作间隔下限（秒）
+            max_delay: 操作间隔上限（秒）
+            margin: 间隔相对估计值的余量系数
+            alpha: 滑动平均系数，越大越跟随最新样本
+            change_threshold: 缩略图平均灰度差超过该值视为画面已响应
+            settle_timeout: 操作后超过该时间仍无变化则放弃本次测量（操作未引起画面变化）
+            bracket: 未变化帧与变化帧的最大间隔（秒），实际取该值与2倍平均取帧间隔中的较大者，
+                     超过则样本误差太大，丢弃
+            adaptive: False时间隔固定为interval
+        """
+        self.estimate = initial
+        self.interval = interval
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.margin = margin
+        self.alpha = alpha
+        self.change_threshold = change_threshold
+        self.settle_timeout = settle_timeout
+        self.bracket = bracket
+        self.adaptive = adaptive
+        self.samples = 0
+        self.last_action_time = 0.0
+        self._pending: Optional[float] = None      # 等待响应的操作发送时间
+        self._reference: Optional[np.ndarray] = None  # 操作前最后一帧的缩略图
+        self._reference_time = 0.0
+        self._unchanged_at: Optional[float] = None  # 操作后最后一帧未变化的帧时间
+        self._last_frame_time = 0.0
+        self._frame_gap: Optional[float] = None      # 取帧间隔的滑动平均
+
+    @property
+    def delay(self) -> float:
+        """当前操作间隔（秒）"""
+        if not self.adaptive or self.estimate is None:
+            return max(self.min_delay, self.interval)
+        return min(self.max_delay, max(self.min_delay, self.estimate * self.margin))
+
+    @property
+    def bracket_window(self) -> float:
+        """未变化帧与变化帧允许的最大间隔（秒）"""
+        if self._frame_gap is None:
+            return self.bracket
+        return max(self.bracket, 2 * self._frame_gap)
+
+    def set_interval(self, interval: float) -> None:
+        """
+        设置固定操作间隔并作为下限，丢弃已有估计值使其立即生效
+
+        自适应时之后测到的延迟只会在此基础上调大间隔。
+
+        Args:
+            interval: 间隔时间（秒）
+        """
+        self.interval = interval
+        self.min_delay = interval
+        self.estimate = None
+        self.samples = 0
+
+    def wait(self) -> None:
+        """等待到距上次操作满足当前间隔（附加10-30ms随机延迟）"""
+        elapsed = time.time() - self.last_action_time
+        delay = self.delay
+        if elapsed < delay:
+            time.sleep(delay - elapsed + random.uniform(0.01, 0.03))
+
+    def action_sent(self, timestamp: Optional[float] = None) -> None:
+        """
+        记录一次已发送的操作
+
+        Args:
+            timestamp: 发送时间，默认为当前时间
+        """
+        self.last_action_time = timestamp or time.time()
+        if self.adaptive:
+            self._pending = self.last_action_time
+            self._unchanged_at = None
+
+    def observe(self, frame: np.ndarray, timestamp: float) -> Optional[float]:
+        """
+        输入一帧（时间戳为截图开始时间）
+
+        Args:
+            frame: BGR图像
+            timestamp: 截图开始时间
+
+        Returns:
+            本帧产生的延迟样本（秒），没有时返回None
+        """
+        if not self.adaptive or timestamp <= self._reference_time:
+            return None
+        if timestamp > self._last_frame_time:
+            if self._last_frame_time:
+                gap = timestamp - self._last_frame_time
+                previous = self._frame_gap
+                self._frame_gap = gap if previous is None else previous + self.alpha * (gap - previous)
+            self._last_frame_time = timestamp
+
+        thumb = self._thumbnail(frame)
+        pending = self._pending
+        if pending is None or timestamp <= pending or self._reference is None:
+            # 操作前的帧作为比较基准；没有基准时本次操作无法测量
+            if pending is not None and timestamp > pending:
+                self._pending = None
+            self._set_reference(thumb, timestamp)
+            return None
+
+        change = float(cv2.absdiff(thumb, self._reference).mean())
+        if change >= self.change_threshold:
+            unchanged_at = self._unchanged_at
+            self._pending = None
+            self._unchanged_at = None
+            self._set_reference(thumb, timestamp)
+            if unchanged_at is None or timestamp - unchanged_at > self.bracket_window:
+                # 没有夹住响应时刻，只知道上界，不作为样本
+                return None
+            latency = (unchanged_at + timestamp) / 2 - pending
+            self._add_sample(latency)
+            return latency
+
+        self._unchanged_at = timestamp
+        if timestamp - pending > self.settle_timeout:
+            self._pending = None
+            self._unchanged_at = None
+            self._set_reference(thumb, timestamp)
+        return None
+
+    def reset(self, initial: Optional[float] = None) -> None:
+        """清除测量状态，可选地重设估计值"""
+        if initial is not None:
+            self.estimate = initial
+            self.samples = 0
+        self._pending = None
+        self._unchanged_at = None
+        self._reference = None
+        self._reference_time = 0.0
+        self._last_frame_time = 0.0
+        self._frame_gap = None
+
+    def _add_sample(self, latency: float) -> None:
+        if self.samples == 0 or self.estimate is None:
+            self.estimate = latency
+        else:
+            self.estimate += self.alpha * (latency - self.estimate)
+        self.samples += 1
+        logger.trace("Input latency sample {:.0f}ms, estimate {:.0f}ms, delay {:.0f}ms",
+                     latency * 1000, self.estimate * 1000, self.delay * 1000)
+
+    def _set_reference(self, thumb: np.ndarray, timestamp: float) -> None:
+        self._reference = thumb
+        self._reference_time = timestamp
+
+    def _thumbnail(self, frame: np.ndarray) -> np.ndarray:
+        thumb = cv2.resize(frame, self.THUMB_SIZE, interpolation=cv2.INTER_AREA)
+        if thumb.ndim == 3:
+            thumb = cv2.cvtColor(thumb, cv2.COLOR_BGR2GRAY)
+        return thumb
@@ -0,0 +1,444 @@
+"""
+scrcpy视频流截图 - 推送scrcpy服务端，后台解码H.264，随时取最新帧
+"""
+
+from __future__ import annotations
+
+import random
+import socket
+import struct
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Tuple
+from loguru import logger
+
+from core import Result
+from core.utils import lazy_import
+from .adb_driver import ADBDriver
+
+av = lazy_import("av")
+np = lazy_import("numpy")
+
+
+# 帧头：PTS与标志位(uint64) 数据长度(uint32)，大端
+FRAME_HEADER = struct.Struct(">QI")
+FLAG_CONFIG = 1 << 63
+FLAG_KEY_FRAME = 1 << 62
+
+DEVICE_SERVER_PATH = "/data/local/tmp/scrcpy-server.jar"
+SERVER_CLASS = "com.genymobile.scrcpy.Server"
+
+
+def quality_settings(quality: int, screen_size: Tuple[int, int]) -> Tuple[int, int]:
+    """
+    按截图质量换算视频流参数
+
+    质量100为原始分辨率；否则长边按质量百分比缩小。码率按质量线性取值（最高16Mbps）。
+
+    Args:
+        quality: 截图质量(1-100)
+        screen_size: 设备分辨率(width, height)
+
+    Returns:
+        (max_size, bit_rate)，max_size为0表示不限制
+    """
+    quality = max(1, min(100, int(quality)))
+    max_size = 0 if quality >= 100 else max(160, int(max(screen_size) * quality / 100) // 8 * 8)
+    bit_rate = max(1_000_000, 16_000_000 * quality // 100)
+    return max_size, bit_rate
+
+
+class ScrcpyStream:
+    """
+    scrcpy视频流接收与解码
+
+    后台线程连接本地端口，读取带帧头的H.264数据包并用PyAV解码，
+    只保留最新一帧。latest()不等待，直接返回已解码的最新帧。
+    与服务端之间只依赖套接字，可以用 serve_recording() 回放录制的流来测试。
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 27183,
+                 scale_to: Optional[int] = None,
+                 connect_timeout: float = 5.0,
+                 name: str = "scrcpy-stream"):
+        """
+        初始化
+
+        Args:
+            host: 地址
+            port: 端口
+            scale_to: 解码时把长边缩放到该值（缩小传输后恢复设备坐标系），None为不缩放
+            connect_timeout: 等待服务端就绪的时间（秒）
+            name: 线程名称
+        """
+        self.host = host
+        self.port = port
+        self.scale_to = scale_to
+        self.connect_timeout = connect_timeout
+        self._name = name
+
+        self._latest: Optional[Tuple[np.ndarray, float]] = None
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._socket: Optional[socket.socket] = None
+        self._running = False
+        self._frame_count = 0
+        self.error: Optional[str] = None
+
+    @property
+    def running(self) -> bool:
+        """是否在运行"""
+        return self._running
+
+    @property
+    def frame_count(self) -> int:
+        """已解码的帧数"""
+        return self._frame_count
+
+    @property
+    def thread_id(self) -> Optional[int]:
+        """接收线程ID（未启动时为None）"""
+        return self._thread.ident if self._thread else None
+
+    def start(self) -> None:
+        """启动接收线程"""
+        if self._running:
+            return
+        self._running = True
+        self.error = None
+        self._thread = threading.Thread(target=self._run, name=self._name, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """停止接收线程"""
+        self._running = False
+        sock = self._socket
+        if sock:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+        self._thread = None
+
+    def latest(self) -> Optional[Tuple[np.ndarray, float]]:
+        """
+        最新一帧（不等待）
+
+        返回的数组之后不会再被写入，但多个调用方可能拿到同一个数组，不要原地修改。
+
+        Returns:
+            (BGR图像, 解码时间) 或 None（尚未收到帧）
+        """
+        return self._latest
+
+    def wait_frame(self, newer_than: float = 0.0,
+                   timeout: float = 5.0) -> Optional[Tuple[np.ndarray, float]]:
+        """
+        等待比newer_than更新的帧
+
+        Returns:
+            (BGR图像, 解码时间) 或 None（超时或流已停止）
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._running and (self._latest is None or self._latest[1] <= newer_than):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+            latest = self._latest
+        return latest if latest and latest[1] > newer_than else None
+
+    def _connect(self) -> socket.socket:
+        """
+        连接服务端
+
+        经adb forward转发时，服务端就绪前连接也会成功但立即被关闭，
+        因此以收到服务端的1字节确认为准，没收到就重试。
+        """
+        deadline = time.monotonic() + self.connect_timeout
+        last_error = "no response"
+        while self._running and time.monotonic() < deadline:
+            sock = None
+            try:
+                sock = socket.create_connection((self.host, self.port), timeout=1.0)
+                if sock.recv(1):
+                    return sock
+                last_error = "connection closed"
+            except OSError as e:
+                last_error = str(e)
+            if sock:
+                sock.close()
+            time.sleep(0.1)
+        raise ConnectionError(f"scrcpy server not ready on {self.host}:{self.port}: {last_error}")
+
+    def _recv_exact(self, sock: socket.socket, size: int) -> Optional[bytearray]:
+        """读取定长数据，停止时返回None"""
+        buffer = bytearray(size)
+        view = memoryview(buffer)
+        received = 0
+        while received < size:
+            try:
+                count = sock.recv_into(view[received:])
+            except socket.timeout:
+                if not self._running:
+                    return None
+                continue
+            if count == 0:
+                if self._running:
+                    raise ConnectionError("scrcpy stream closed")
+                return None
+            received += count
+        return buffer
+
+    def _to_image(self, frame) -> np.ndarray:
+        """解码帧转BGR，需要时在格式转换中一并缩放"""
+        if not self.scale_to:
+            return frame.to_ndarray(format="bgr24")
+        ratio = self.scale_to / max(frame.width, frame.height)
+        width, height = round(frame.width * ratio), round(frame.height * ratio)
+        if (width, height) == (frame.width, frame.height):
+            return frame.to_ndarray(format="bgr24")
+        return frame.to_ndarray(format="bgr24", width=width, height=height)
+
+    def _run(self) -> None:
+        try:
+            codec = av.CodecContext.create("h264", "r")
+            self._socket = sock = self._connect()
+            logger.info(f"scrcpy stream connected: {self.host}:{self.port}")
+
+            config = b""
+            while self._running:
+                header = self._recv_exact(sock, FRAME_HEADER.size)
+                if header is None:
+                    break
+                pts_flags, size = FRAME_HEADER.unpack(header)
+                payload = self._recv_exact(sock, size)
+                if payload is None:
+                    break
+
+                # SPS/PPS单独成包，与下一帧合并后送入解码器
+                if pts_flags & FLAG_CONFIG:
+                    config = bytes(payload)
+                    continue
+                if config:
+                    payload = config + payload
+                    config = b""
+
+                for frame in codec.decode(av.Packet(bytes(payload))):
+                    image = self._to_image(frame)
+                    with self._cond:
+                        self._latest = (image, time.time())
+                        self._frame_count += 1
+                        self._cond.notify_all()
+        except Exception as e:
+            if self._running:
+                self.error = str(e)
+                logger.error(f"scrcpy stream error: {e}")
+        finally:
+            self._running = False
+            if self._socket:
+                self._socket.close()
+                self._socket = None
+            with self._cond:
+                self._cond.notify_all()
+
+
+class ScrcpyClient:
+    """
+    scrcpy截图源
+
+    推送服务端jar、建立端口转发、在设备上启动服务端（只传视频，不控制、不传音频），
+    然后由 ScrcpyStream 接收解码。需要scrcpy 2.x服务端，version必须与jar一致。
+    """
+
+    def __init__(self, adb: ADBDriver,
+                 server: str = "scrcpy-server",
+                 version: str = "2.4",
+                 max_size: int = 0,
+                 bit_rate: int = 8_000_000,
+                 max_fps: int = 0,
+                 scale_to: Optional[int] = None):
+        """
+        初始化
+
+        Args:
+            adb: ADB驱动
+            server: 本地scrcpy-server文件
+            version: 服务端版本
+            max_size: 视频长边上限，0为不限制
+            bit_rate: 码率
+            max_fps: 帧率上限，0为不限制
+            scale_to: 解码时把长边恢复到该值（一般为设备长边）
+        """
+        self.adb = adb
+        self.server = server
+        self.version = version
+        self.max_size = max_size
+        self.bit_rate = bit_rate
+        self.max_fps = max_fps
+        self.scale_to = scale_to if max_size else None
+
+        self.stream: Optional[ScrcpyStream] = None
+        self._process = None
+        self._forward: Optional[str] = None
+
+    @property
+    def running(self) -> bool:
+        """视频流是否在运行"""
+        return self.stream is not None and self.stream.running
+
+    def _server_command(self, scid: int) -> str:
+        options = {
+            "scid": f"{scid:08x}",
+            "log_level": "warn",
+            "tunnel_forward": "true",
+            "audio": "false",
+            "control": "false",
+            "cleanup": "true",
+            "video_codec": "h264",
+            "max_size": self.max_size,
+            "video_bit_rate": self.bit_rate,
+            "max_fps": self.max_fps,
+            "send_device_meta": "false",
+            "send_codec_meta": "false",
+            "send_dummy_byte": "true",
+            "send_frame_meta": "true",
+        }
+        args = " ".join(f"{key}={value}" for key, value in options.items())
+        return f"CLASSPATH={DEVICE_SERVER_PATH} app_process / {SERVER_CLASS} {self.version} {args}"
+
+    def start(self, timeout: float = 5.0) -> Result[bool]:
+        """
+        启动服务端并等待第一帧
+
+        Args:
+            timeout: 等待第一帧的时间（秒）
+        """
+        if self.running:
+            return Result.ok(True)
+        self.close()
+
+        if not Path(self.server).exists():
+            return Result.fail(f"scrcpy server not found: {self.server}")
+
+        result = self.adb.push(self.server, DEVICE_SERVER_PATH)
+        if result.is_fail():
+            return Result.fail(result.error)
+
+        scid = random.getrandbits(31)
+        forward = self.adb.forward("tcp:0", f"localabstract:scrcpy_{scid:08x}")
+        if forward.is_fail():
+            return Result.fail(forward.error)
+        try:
+            port = int(forward.unwrap())
+        except ValueError:
+            return Result.fail(f"Unexpected forward output: {forward.unwrap()}")
+        self._forward = f"tcp:{port}"
+
+        process = self.adb.spawn(self._server_command(scid))
+        if process.is_fail():
+            self.close()
+            return Result.fail(process.error)
+        self._process = process.unwrap()
+
+        self.stream = ScrcpyStream(port=port, scale_to=self.scale_to, connect_timeout=timeout,
+                                   name=f"scrcpy-{self.adb.device_id or 'default'}")
+        self.stream.start()
+        if self.stream.wait_frame(timeout=timeout) is None:
+            error = self.stream.error or "no frame received"
+            if self._process.poll() is not None:
+                error = f"server exited ({self._process.returncode}), check version {self.version}"
+            self.close()
+            return Result.fail(f"scrcpy start failed: {error}")
+
+        logger.info(f"scrcpy started: max_size={self.max_size}, bit_rate={self.bit_rate}, port={port}")
+        return Result.ok(True)
+
+    def latest(self) -> Optional[Tuple[np.ndarray, float]]:
+        """最新一帧（不等待）"""
+        return self.stream.latest() if self.stream else None
+
+    def close(self) -> None:
+        """停止视频流、服务端和端口转发"""
+        if self.stream:
+            self.stream.stop()
+            self.stream = None
+        if self._process:
+            if self._process.poll() is None:
+                ADBDriver._kill_tree(self._process)
+            self._process = None
+        if self._forward:
+            self.adb.forward(self._forward, remove=True)
+            self._forward = None
+
+
+def serve_recording(path: str, host: str = "127.0.0.1", port: int = 27183,
+                    fps: float = 30.0, ready: Optional[threading.Event] = None) -> int:
+    """
+    用录制的H.264裸流模拟scrcpy服务端（测试用）
+
+    接受一个连接，发送1字节确认，然后把文件切分为帧并按scrcpy帧头格式逐帧发送。
+
+    Args:
+        path: Annex-B格式的.h264文件（如 scrcpy --record=x.h264 或 ffmpeg -f h264 录制）
+        host: 监听地址
+        port: 监听端口
+        fps: 发送帧率，0为不限速
+        ready: 开始监听后置位的事件
+
+    Returns:
+        发送的帧数
+    """
+    parser = av.CodecContext.create("h264", "r")
+    packets = parser.parse(Path(path).read_bytes()) + parser.parse(b"")
+
+    with socket.create_server((host, port)) as server:
+        if ready:
+            ready.set()
+        conn, _ = server.accept()
+        with conn:
+            conn.sendall(b"\0")
+            sent = 0
+            for i, packet in enumerate(packets):
+                flags = FLAG_KEY_FRAME if packet.is_keyframe else 0
+                data = bytes(packet)
+                try:
+                    conn.sendall(FRAME_HEADER.pack(flags | i, len(data)) + data)
+                except OSError:
+                    break
+                sent += 1
+                if fps:
+                    time.sleep(1 / fps)
+    return sent
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Replay or probe a scrcpy video stream")
+    sub = parser.add_subparsers(dest="command", required=True)
+    serve = sub.add_parser("serve", help="serve a recorded .h264 file as a scrcpy server")
+    serve.add_argument("recording")
+    serve.add_argument("--port", type=int, default=27183)
+    serve.add_argument("--fps", type=float, default=30.0)
+    probe = sub.add_parser("probe", help="connect to a stream and report decode rate")
+    probe.add_argument("--port", type=int, default=27183)
+    probe.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        print(f"sent {serve_recording(args.recording, port=args.port, fps=args.fps)} frames")
+    else:
+        stream = ScrcpyStream(port=args.port)
+        stream.start()
+        time.sleep(args.seconds)
+        latest = stream.latest()
+        stream.stop()
+        shape = latest[0].shape if latest else None
+        print(f"{stream.frame_count} frames in {args.seconds:.1f}s, last frame {shape}, error={stream.error}")
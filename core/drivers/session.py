@@ -0,0 +1,81 @@
+"""
+设备会话缓存 - 持久化设备连接信息，重连时跳过探测
+"""
+
+import json
+import time
+from dataclasses import dataclass, asdict, field
+from pathlib import Path
+from typing import Any, Dict, Optional
+from loguru import logger
+
+
+@dataclass
+class SessionProfile:
+    """设备会话信息"""
+    device_key: str             # 配置中的设备ID（未指定时为default）
+    serial: str                 # adb实际使用的序列号
+    adb_cmd: str                # 已解析的adb命令
+    screen_width: int = 0
+    screen_height: int = 0
+    density: int = 0
+    extra: Dict[str, Any] = field(default_factory=dict)  # 其他按设备保存的设置
+    updated_at: float = 0.0
+
+
+class SessionStore:
+    """会话缓存，每个设备一个JSON文件"""
+
+    def __init__(self, directory: str = ".sessions"):
+        """
+        初始化
+
+        Args:
+            directory: 缓存目录
+        """
+        self.directory = Path(directory)
+
+    def _path(self, device_key: str) -> Path:
+        safe_name = "".join(c if c.isalnum() or c in "-_." else "_" for c in device_key)
+        return self.directory / f"{safe_name}.json"
+
+    def load(self, device_key: str) -> Optional[SessionProfile]:
+        """
+        读取设备会话
+
+        Args:
+            device_key: 设备ID
+
+        Returns:
+            会话信息或None
+        """
+        path = self._path(device_key)
+        if not path.exists():
+            return None
+
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return SessionProfile(**json.load(f))
+        except Exception as e:
+            logger.warning(f"Invalid session profile {path}: {e}")
+            return None
+
+    def save(self, profile: SessionProfile) -> bool:
+        """保存设备会话"""
+        profile.updated_at = time.time()
+        path = self._path(profile.device_key)
+
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(asdict(profile), f, indent=2, ensure_ascii=False)
+            return True
+        except Exception as e:
+            logger.warning(f"Failed to save session profile: {e}")
+            return False
+
+    def delete(self, device_key: str) -> None:
+        """删除设备会话"""
+        path = self._path(device_key)
+        if path.exists():
+            path.unlink()
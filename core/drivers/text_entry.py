@@ -0,0 +1,126 @@
+"""
+文本输入 - 按内容和长度选择输入法广播、剪贴板粘贴或 input text
+"""
+
+import base64
+import shlex
+from dataclasses import dataclass
+from typing import List
+
+
+ADB_KEYBOARD_IME = "com.android.adbkeyboard/.AdbIME"
+CLIPPER_PACKAGE = "ca.zgrs.clipper"
+KEYCODE_PASTE = 279
+IME_SWITCH_TIMEOUT = 2.0   # 切换输入法后等待其成为默认输入法的上限（秒）
+
+# 检测可用的输入方式（一次往返）；-a 同时列出未启用的输入法
+TEXT_DETECT_COMMANDS = [
+    "ime list -a -s",
+    "settings get secure default_input_method",
+    f"pm path {CLIPPER_PACKAGE}; true",
+]
+
+BACKENDS = ("ime", "clipboard", "input")
+
+
+@dataclass
+class TextCapabilities:
+    """设备支持的文本输入方式"""
+    adb_keyboard: bool = False   # 已安装ADBKeyBoard
+    clipper: bool = False        # 已安装Clipper（剪贴板广播）
+    current_ime: str = ""        # 当前默认输入法
+
+    @classmethod
+    def parse(cls, outputs: List[str]) -> 'TextCapabilities':
+        """
+        解析检测命令输出
+
+        Args:
+            outputs: 与TEXT_DETECT_COMMANDS一一对应的输出
+        """
+        outputs = list(outputs) + [""] * (len(TEXT_DETECT_COMMANDS) - len(outputs))
+        ime_list, current, clipper = (o.strip() for o in outputs[:3])
+        return cls(
+            adb_keyboard=ADB_KEYBOARD_IME in ime_list.split(),
+            clipper=clipper.startswith("package:"),
+            current_ime=current if current != "null" else "",
+        )
+
+
+def is_plain(content: str) -> bool:
+    """是否为 input text 可以直接输入的可打印ASCII"""
+    return all(32 <= ord(c) < 127 for c in content)
+
+
+def choose_backend(content: str, caps: TextCapabilities, short_limit: int = 8) -> str:
+    """
+    按内容和长度选择输入方式
+
+    - 短ASCII文本：input text，不需要切换输入法
+    - 长文本或非ASCII（如中文）：ADBKeyBoard广播，其次剪贴板粘贴
+    - 都不可用时回退到 input text（非ASCII字符无法输入）
+
+    Args:
+        content: 文本
+        caps: 设备能力
+        short_limit: 直接使用input text的最大长度
+
+    Returns:
+        ime / clipboard / input
+    """
+    if is_plain(content) and len(content) <= short_limit:
+        return "input"
+    if caps.adb_keyboard:
+        return "ime"
+    if caps.clipper:
+        return "clipboard"
+    return "input"
+
+
+def wait_for_ime(ime: str, timeout: float = IME_SWITCH_TIMEOUT, interval: float = 0.1) -> str:
+    """
+    生成设备端等待命令：轮询默认输入法直到变为ime，超时后以非零状态结束
+
+    ime set 返回时新输入法可能还没生效，紧接着的广播会被丢弃。
+    """
+    target = shlex.quote(ime)
+    current = "$(settings get secure default_input_method)"
+    return (f"i=0; while [ \"{current}\" != {target} ] && [ $i -lt {int(timeout / interval)} ]; "
+            f"do sleep {interval}; i=$((i+1)); done; [ \"{current}\" = {target} ]")
+
+
+def build_commands(backend: str, content: str, caps: TextCapabilities,
+                   restore_ime: bool = True) -> List[str]:
+    """
+    生成设备端命令（由shell_many一次执行）
+
+    Args:
+        backend: ime / clipboard / input
+        content: 文本
+        caps: 设备能力
+        restore_ime: ime方式输入后是否切回原输入法
+
+    Returns:
+        命令列表
+    """
+    if backend == "ime":
+        payload = base64.b64encode(content.encode("utf-8")).decode("ascii")
+        commands = []
+        switch = caps.current_ime != ADB_KEYBOARD_IME
+        if switch:
+            commands += [f"ime enable {ADB_KEYBOARD_IME}", f"ime set {ADB_KEYBOARD_IME}",
+                         wait_for_ime(ADB_KEYBOARD_IME)]
+        # am broadcast 等接收方处理完才返回，之后再切回原输入法
+        commands.append(f"am broadcast -a ADB_INPUT_B64 --es msg {payload}")
+        if switch and restore_ime and caps.current_ime:
+            commands.append(f"ime set {shlex.quote(caps.current_ime)}")
+        return commands
+
+    if backend == "clipboard":
+        return [
+            f"am broadcast -a clipper.set -e text {shlex.quote(content)}",
+            f"input keyevent {KEYCODE_PASTE}",
+        ]
+
+    # input text 中空格需要写成%s
+    return [f"input text {shlex.quote(content.replace(' ', '%s'))}"]
@@ -2,17 +2,35 @@
 游戏控制器 - 串联所有功能的简单控制器
 """
 
+from __future__ import annotations
+
+import queue
 import time
-import cv2
-import numpy as np
 from pathlib import Path
-from typing import Optional, Tuple, List
+from typing import Callable, Dict, Optional, Tuple, List, Union
 from loguru import logger
 
-from core import Result
-from core.drivers import ADBDriver, InputDriver
+from core import Result, TaskInterrupted
+from core.drivers import (
+    ADBDriver, InputDriver, InputPacer, Gesture, TouchDevice, CaptureDriver, FrameGrabber, ScrcpyClient, quality_settings,
+    SessionProfile, SessionStore, ConnectionMonitor, ConnectionState, get_decoder,
+    BenchResult, benchmark_capture, benchmark_input, pick_winner, scrcpy_available
+)
+from core.events import event_bus
 from core.config import config
-from core.utils import retry, wait
+from core.monitoring import TaskProfiling, ActionJournal, RunHistory, RunRecord, log_every
+from core.vision import (
+    TemplateLibrary, TemplatePack, match_template, match_all, ColorSignature, load_signatures, SceneIndex,
+    IncrementalMatcher, MISS, VisionPool, FrameSlot
+)
+from core.tasks.watchers import WatcherRegistry
+from core.utils import FramePool, retry, wait, lazy_import
+
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
+
+# 一次取帧中最多连续处理的中断数（弹窗叠弹窗），避免监视器误判时死循环
+MAX_INTERRUPT_CHAIN = 5
 
 
 class Game:
@@ -28,9 +46,57 @@ class Game:
         self.device_id = device_id
         self.adb = ADBDriver()
         self.input = None
+        self.capture = None
         self.connected = False
         self.screen_width = 1920
         self.screen_height = 1080
+        self.screen_density = 0
+        self._frame_size: Optional[Tuple[int, int]] = None  # 最近一帧的尺寸，变化时刷新设备快照
+        self.sessions: Optional[SessionStore] = None
+        if config.get("session.enabled", True):
+            self.sessions = SessionStore(config.get("session.cache_dir", ".sessions"))
+        self.session: Optional[SessionProfile] = None
+        self._grabber: Optional[FrameGrabber] = None
+        self._held_frame: Optional[np.ndarray] = None  # 最近交给调用方的帧，下次取帧时释放
+        self._health: Optional[ConnectionMonitor] = None
+        self._connection_handlers: List[Callable] = []
+        self.templates = TemplateLibrary(
+            config.get("templates.path", "."),
+            config.get("templates.reference_resolution"),
+            config.get("templates.cache_mb", 256) * 1024 * 1024,
+            TemplatePack(config.get("templates.pack")) if config.get("templates.pack") else None
+        )
+        self.colors = {}
+        if config.get("colors.path"):
+            self.colors = load_signatures(config.get("colors.path"))
+        self.vision_pool: Optional[VisionPool] = None
+        self.tracker: Optional[IncrementalMatcher] = None
+        if config.get("templates.incremental", False):
+            self.tracker = IncrementalMatcher(
+                config.get("templates.tile_size", 32),
+                config.get("templates.tile_threshold", 12)
+            )
+        self.profiling = TaskProfiling(
+            enabled=config.get("profiling.enabled", False),
+            tasks=config.get("profiling.tasks") or [],
+            interval=config.get("profiling.interval", 0.005),
+            output_dir=config.get("profiling.output_dir", "profiles"),
+            all_threads=config.get("profiling.all_threads", False)
+        )
+        self.scenes: Optional[SceneIndex] = None
+        if config.get("scenes.index"):
+            self.scenes = SceneIndex.load(config.get("scenes.index"))
+        self.history: Optional[RunHistory] = None
+        if config.get("history.enabled", True):
+            self.history = RunHistory.shared(
+                config.get("history.path", "data/history.db"),
+                batch_size=config.get("history.batch_size", 100),
+                flush_interval=config.get("history.flush_interval", 2.0)
+            )
+        self._run: Optional[RunRecord] = None
+        self.watchers = WatcherRegistry()
+        if config.get("watchers.path"):
+            self.watchers.load(config.get("watchers.path"))
     
     def connect(self) -> bool:
         """
@@ -39,86 +105,770 @@ class Game:
         Returns:
             是否成功
         """
-        # 连接ADB
-        result = self.adb.connect(self.device_id)
-        if result.is_fail():
-            logger.error(f"Failed to connect: {result.error}")
-            return False
+        # 优先从会话缓存恢复，只需一次shell调用验证
+        if not self._resume_session():
+            # 连接ADB
+            result = self.adb.connect(self.device_id)
+            if result.is_fail():
+                logger.error(f"Failed to connect: {result.error}")
+                return False
+            
+            # 一次往返获取分辨率、密度与方向
+            if self.refresh_device():
+                logger.info(f"Screen size: {self.screen_width}x{self.screen_height}")
+            
+            self._save_session()
         
         # 初始化输入驱动
-        self.input = InputDriver(self.adb)
+        self.input = InputDriver(self.adb, self._create_pacer())
+        self.input.set_coordinate_rotation(config.get("input.coordinate_rotation"))
+        if config.get("logging.journal"):
+            device = "".join(c if c.isalnum() or c in "-_." else "_"
+                             for c in (self.adb.device_id or self.device_id or "default"))
+            self.input.journal = ActionJournal(config.get("logging.journal").format(device=device))
+        self.input.tap_backend = self._tuned("input.tap_backend", "input_backend", "input")
+        self.input.text_backend = config.get("input.text_backend", "auto")
+        self.input.text_short_limit = config.get("input.text_short_limit", 8)
+        self.input.restore_ime = config.get("input.restore_ime", True)
+        if self.session and "touch_device" in self.session.extra:
+            touch = self.session.extra["touch_device"]
+            self.input.set_touch_device(TouchDevice.from_dict(touch) if touch else None)
         
-        # 获取屏幕分辨率
-        size_result = self.adb.get_screen_size()
-        if size_result.is_ok():
-            self.screen_width, self.screen_height = size_result.unwrap()
-            logger.info(f"Screen size: {self.screen_width}x{self.screen_height}")
+        # 初始化截图驱动（auto时使用bench-device为本设备测出的格式）
+        self.capture = CaptureDriver(self.adb, self._tuned("performance.capture_format", "capture_format", "png"))
+        if config.get("performance.frame_pool", 4):
+            self.capture.pool = FramePool(config.get("performance.frame_pool", 4),
+                                          debug=config.get("performance.frame_pool_debug", False))
+        capture_method = self._tuned("performance.capture_method", "capture_method", "screencap")
+        if capture_method == "scrcpy":
+            self.capture.scrcpy = self._create_scrcpy()
+        self.capture.set_capture_method(capture_method)
         
         self.connected = True
         logger.info(f"Connected to device: {self.device_id or 'default'}")
+        
+        # 可选：连接心跳与自动重连
+        if config.get("connection.keepalive", False):
+            self.start_health_monitor()
+        
+        # 可选：后台截图流水线
+        if config.get("performance.capture_pipeline", False):
+            self.start_capture(config.get("performance.capture_interval", 0.0))
+        return True
+    
+    def _create_pacer(self) -> InputPacer:
+        """按配置创建操作节奏控制，延迟估计优先使用会话中保存的值"""
+        adaptive = config.get("performance.adaptive_pacing", True)
+        initial = config.get("performance.input_latency")
+        if adaptive and self.session:
+            initial = self.session.extra.get("input_latency", initial)
+        return InputPacer(
+            initial=initial,
+            interval=config.get("performance.operation_delay", 0.1),
+            min_delay=config.get("performance.operation_delay_min", 0.05),
+            max_delay=config.get("performance.operation_delay_max", 1.5),
+            adaptive=adaptive
+        )
+    
+    def _create_scrcpy(self) -> ScrcpyClient:
+        """按配置创建scrcpy视频流，未指定的尺寸和码率由截图质量换算"""
+        screen_size = (self.screen_width, self.screen_height)
+        max_size, bit_rate = quality_settings(config.get("performance.screenshot_quality", 80), screen_size)
+        max_size = config.get("performance.scrcpy.max_size") or max_size
+        return ScrcpyClient(
+            self.adb,
+            server=config.get("performance.scrcpy.server", "scrcpy-server"),
+            version=str(config.get("performance.scrcpy.version", "2.4")),
+            max_size=max_size,
+            bit_rate=config.get("performance.scrcpy.bit_rate") or bit_rate,
+            max_fps=config.get("performance.scrcpy.max_fps", 0),
+            scale_to=max(screen_size)
+        )
+    
+    def _tuned(self, key: str, session_key: str, default: str) -> str:
+        """读取后端配置，auto时使用会话中保存的基准测试结果"""
+        value = config.get(key, "auto")
+        if value != "auto":
+            return value
+        if self.session:
+            return self.session.extra.get(session_key, default)
+        return default
+    
+    def tune_backends(self, iterations: int = 20, save: bool = True) -> List[BenchResult]:
+        """
+        测试各截图方式、截图格式和输入方式，应用并保存最快的后端
+        
+        scrcpy在PyAV和服务端文件可用时参与测试。结果保存到会话缓存，
+        配置为auto时下次连接自动使用。
+        
+        Args:
+            iterations: 每个后端的测试次数
+            save: 是否保存到会话缓存
+            
+        Returns:
+            全部测试结果
+        """
+        if not self.connected:
+            logger.error("Device not connected")
+            return []
+        
+        # 后台截图会干扰测量，测试期间暂停
+        pipeline = self.capture_running
+        self.stop_capture()
+        if self.capture.scrcpy is None and scrcpy_available():
+            self.capture.scrcpy = self._create_scrcpy()
+        capture_results = benchmark_capture(self.capture, iterations)
+        point = config.get("input.bench_point")
+        input_results = benchmark_input(self.input, iterations, tuple(point) if point else None)
+        
+        winners = {}
+        capture_winner = pick_winner(capture_results)
+        if capture_winner:
+            self.capture.set_capture_method(capture_winner.method)
+            winners["capture_method"] = capture_winner.method
+        # scrcpy不可用时回退到screencap，格式总是取screencap中最快的
+        format_winner = pick_winner([r for r in capture_results if r.method == "screencap"])
+        if format_winner:
+            self.capture.set_decoder(get_decoder(format_winner.backend))
+            winners["capture_format"] = format_winner.backend
+        # 只有两种点击方式都测到了才有比较结果，否则保持auto以便触摸节点可写后重新测试
+        input_winner = pick_winner(input_results)
+        if input_winner and all(r.ok for r in input_results):
+            self.input.tap_backend = input_winner.backend
+            winners["input_backend"] = input_winner.backend
+        
+        logger.info(f"Fastest backends: {winners}")
+        if save and winners:
+            if self.session is None:
+                self._save_session()
+            if self.session is not None:
+                self.session.extra.update(winners)
+                self._save_session()
+        
+        if pipeline:
+            self.start_capture(config.get("performance.capture_interval", 0.0))
+        return capture_results + input_results
+    
+    def _resume_session(self) -> bool:
+        """
+        从会话缓存恢复连接
+        
+        用缓存的序列号直接获取一次设备快照，同时验证设备可用和分辨率未变。
+        
+        Returns:
+            是否恢复成功
+        """
+        if self.sessions is None:
+            return False
+        
+        profile = self.sessions.load(self.device_id or "default")
+        if profile is None:
+            return False
+        
+        self.adb.attach(profile.serial, profile.adb_cmd)
+        if not self.refresh_device():
+            logger.info(f"Cached session for {profile.serial} is stale, reconnecting")
+            self.adb.connected = False
+            self.adb.device_id = None
+            return False
+        
+        self.session = profile
+        if ((self.screen_width, self.screen_height, self.screen_density) !=
+                (profile.screen_width, profile.screen_height, profile.density)):
+            self._save_session()
+        
+        logger.info(f"Resumed session: {profile.serial} ({self.screen_width}x{self.screen_height})")
+        return True
+    
+    def refresh_device(self) -> bool:
+        """
+        刷新设备快照（一次shell往返），更新分辨率、密度和方向
+        
+        设备旋转后调用，输入驱动的坐标变换会使用新的方向。
+        
+        Returns:
+            是否成功
+        """
+        result = self.adb.snapshot(refresh=True)
+        if result.is_fail():
+            logger.warning(result.error)
+            return False
+        
+        snapshot = result.unwrap()
+        # 截图按当前方向输出，模板缩放等使用显示尺寸
+        self.screen_width, self.screen_height = snapshot.display_size
+        self.screen_density = snapshot.density
+        return True
+    
+    def _save_session(self) -> None:
+        """保存当前连接信息到会话缓存"""
+        if self.sessions is None or not self.adb.device_id:
+            return
+        
+        if self.session is None:
+            self.session = SessionProfile(
+                device_key=self.device_id or "default",
+                serial=self.adb.device_id,
+                adb_cmd=self.adb.adb_cmd
+            )
+        self.session.serial = self.adb.device_id
+        self.session.adb_cmd = self.adb.adb_cmd
+        self.session.screen_width = self.screen_width
+        self.session.screen_height = self.screen_height
+        self.session.density = self.screen_density
+        if self.input and self.input.pacer.samples:
+            self.session.extra["input_latency"] = round(self.input.pacer.estimate, 4)
+        if self.input and self.input.touch_detected:
+            touch = self.input.touch_device
+            self.session.extra["touch_device"] = touch.to_dict() if touch else None
+        self.sessions.save(self.session)
+    
+    def start_health_monitor(self) -> None:
+        """启动连接健康监控（心跳、卡死命令终止、自动重连）"""
+        if self._health is None:
+            self._health = ConnectionMonitor(
+                self.adb,
+                interval=config.get("connection.heartbeat_interval", 5.0),
+                timeout=config.get("connection.heartbeat_timeout", 2.0),
+                max_failures=config.get("connection.max_failures", 2),
+                restart_server_after=config.get("connection.restart_server_after", 0)
+            )
+            event_bus.on(ConnectionMonitor.EVENT, self._on_connection_event)
+        self._health.start()
+    
+    def stop_health_monitor(self) -> None:
+        """停止连接健康监控"""
+        if self._health:
+            self._health.stop()
+            event_bus.off(ConnectionMonitor.EVENT, self._on_connection_event)
+            self._health = None
+    
+    def on_connection_change(self, handler: Callable[[str], None]) -> None:
+        """
+        订阅连接状态变化
+        
+        Args:
+            handler: 处理函数，参数为新状态（connected/lost/reconnecting）
+        """
+        self._connection_handlers.append(handler)
+    
+    def _on_connection_event(self, event) -> None:
+        """处理本设备的连接状态事件"""
+        if event.data.get('device') != self.adb.device_id:
+            return
+        
+        state = event.data['state']
+        self.connected = state == ConnectionState.CONNECTED
+        for handler in self._connection_handlers:
+            try:
+                handler(state)
+            except Exception as e:
+                logger.error(f"Connection handler error: {e}")
+    
+    def start_capture(self, interval: float = 0.0) -> bool:
+        """
+        启动后台截图线程，使截图与图像识别重叠执行
+        
+        Args:
+            interval: 两次截图之间的最小间隔（秒）
+            
+        Returns:
+            是否成功
+        """
+        if not self.connected:
+            logger.error("Device not connected")
+            return False
+        
+        if self._grabber is None:
+            self._grabber = FrameGrabber(
+                self._capture_frame,
+                interval=interval,
+                name=f"grabber-{self.device_id or 'default'}",
+                retain=self.retain_frame,
+                release=self.release_frame
+            )
+        self._grabber.start()
         return True
     
-    def screenshot(self) -> Optional[np.ndarray]:
+    def stop_capture(self) -> None:
+        """停止后台截图线程"""
+        if self._grabber:
+            self._grabber.stop()
+            self._grabber = None
+    
+    @property
+    def capture_running(self) -> bool:
+        """后台截图线程是否在运行（运行时取帧本身会等待新帧，轮询无需再休眠）"""
+        return self._grabber is not None and self._grabber.running
+    
+    def _thread_ids(self) -> List[Optional[int]]:
+        """本设备的后台线程（截图、心跳、scrcpy接收），分析任务时一并采样"""
+        workers = [self._grabber, self._health]
+        if self.capture and self.capture.scrcpy:
+            workers.append(self.capture.scrcpy.stream)
+        return [worker.thread_id for worker in workers if worker is not None]
+    
+    def screenshot(self, newer_than: float = 0.0) -> Optional[np.ndarray]:
         """
         截图
         
+        Args:
+            newer_than: 流水线模式下只接受该时间戳之后开始的截图
+            
         Returns:
-            图像数组
+            图像数组，有效期同next_frame()
         """
+        frame = self.next_frame(newer_than)
+        return frame[0] if frame else None
+    
+    def next_frame(self, newer_than: float = 0.0,
+                    timeout: float = 10.0) -> Optional[Tuple[np.ndarray, float]]:
+        """
+        获取一帧及其截图开始时间
+        
+        每一帧先交给中断监视器检查；监视器处理了弹窗时重新取帧，
+        调用方拿到的是处理后的画面。
+        
+        帧可能是复用的缓冲区，由Game代为持有到下一次取帧；需要保留更久时
+        retain_frame()，用完后release_frame()（或自行复制）。
+        
+        Args:
+            newer_than: 只接受该时间戳之后开始的截图
+            timeout: 流水线模式下的等待超时（秒）
+            
+        Returns:
+            (图像, 时间戳) 或 None
+            
+        Raises:
+            TaskInterrupted: 监视器要求终止当前任务
+        """
+        frame = self._fetch_frame(newer_than, timeout)
+        for _ in range(MAX_INTERRUPT_CHAIN):
+            if frame is None or not self.watchers.check(self, frame[0]):
+                break
+            frame = self._fetch_frame(time.time(), timeout)
+        return frame
+    
+    def _fetch_frame(self, newer_than: float, timeout: float) -> Optional[Tuple[np.ndarray, float]]:
+        """取帧（截图或从后台截图线程获取）"""
         if not self.connected:
             logger.error("Device not connected")
             return None
         
-        result = self.adb.screenshot()
+        clock = time.perf_counter()
+        if self.capture_running:
+            frame = self._grabber.latest(newer_than, timeout)
+            if frame is None:
+                logger.error("Screenshot failed: no new frame from grabber")
+        else:
+            started = time.time()
+            image = self._capture_frame()
+            frame = (image, started) if image is not None else None
+        self._record_op("screenshot", clock, frame is not None)
+        
+        if frame is not None:
+            self._hold_frame(frame[0])
+            self._check_frame_size(frame[0])
+        
+        # 用操作后的画面变化测量设备响应延迟
+        if frame is not None and self.input:
+            self.input.pacer.observe(*frame)
+        return frame
+    
+    def _hold_frame(self, image: np.ndarray) -> None:
+        """持有新取到的帧，释放上一帧（其缓冲区此后可能被新截图复用）"""
+        previous, self._held_frame = self._held_frame, image
+        if previous is not None:
+            self.release_frame(previous)
+        if self.tracker:
+            self.tracker.invalidate_frame()
+    
+    def retain_frame(self, frame: np.ndarray) -> bool:
+        """
+        为截图返回的帧增加一个持有者，使其在下一次取帧后仍然有效
+        
+        Returns:
+            帧是否来自帧缓冲池或视觉进程池（否则帧本来就不会被复用）
+        """
+        if self.capture and self.capture.retain_frame(frame):
+            return True
+        return self.vision_pool is not None and self.vision_pool.retain_frame(frame)
+    
+    def release_frame(self, frame: np.ndarray) -> bool:
+        """
+        释放retain_frame()增加的持有者
+        
+        Returns:
+            帧是否来自帧缓冲池或视觉进程池
+        """
+        if self.capture and self.capture.release_frame(frame):
+            return True
+        return self.vision_pool is not None and self.vision_pool.release_frame(frame)
+    
+    @property
+    def frame_size(self) -> Tuple[int, int]:
+        """最近一帧的尺寸(width, height)，尚未截图时为设备显示尺寸"""
+        return self._frame_size or (self.screen_width, self.screen_height)
+    
+    def _check_frame_size(self, image: np.ndarray) -> None:
+        """截图尺寸变化（设备旋转）时刷新设备快照，坐标变换和模板缩放随之更新"""
+        size = (image.shape[1], image.shape[0])
+        if size == self._frame_size:
+            return
+        first = self._frame_size is None
+        self._frame_size = size
+        if first and (size[0] > size[1]) == (self.screen_width > self.screen_height):
+            return
+        logger.info(f"Frame size changed to {size[0]}x{size[1]}, refreshing device snapshot")
+        self.refresh_device()
+    
+    def _capture_frame(self) -> Optional[np.ndarray]:
+        """执行一次截图并解码（返回的帧由调用方持有）"""
+        out = self._pool_frame()
+        result = self.capture.capture(out)
+        if out is not None and (result.is_fail() or result.unwrap() is not out):
+            # 解码器没有写入借来的槽位（分辨率变化等），归还
+            self.vision_pool.release_frame(out)
         if result.is_fail():
             logger.error(f"Screenshot failed: {result.error}")
             return None
-        
-        # 转换为numpy数组
-        image_bytes = result.unwrap()
-        image = cv2.imdecode(
-            np.frombuffer(image_bytes, np.uint8),
-            cv2.IMREAD_COLOR
-        )
-        return image
+        return result.unwrap()
     
     def find_image(self, template_path: str, 
-                   threshold: float = 0.8) -> Optional[Tuple[int, int]]:
+                   threshold: float = 0.8,
+                   screen: Optional[np.ndarray] = None,
+                   coarse_scale: Optional[float] = None,
+                   region: Optional[Tuple[int, int, int, int]] = None) -> Optional[Tuple[int, int]]:
         """
         查找图片
         
         Args:
             template_path: 模板图片路径
             threshold: 匹配阈值
+            screen: 已有的截图，None时重新截图
+            coarse_scale: 粗匹配缩放比例，None时使用配置 templates.coarse_scale
+            region: 搜索区域(x, y, width, height)，None为全屏
             
         Returns:
             坐标(x, y)或None
         """
         # 截图
-        screen = self.screenshot()
         if screen is None:
+            screen = self.screenshot()
+        if screen is None:
+            return None
+        
+        clock = time.perf_counter()
+        # 模板和区域按实际帧尺寸换算（旋转或缩放后的帧与缓存的设备分辨率可能不同）
+        screen_size = screen.shape[1::-1]
+        
+        # 模板声明了搜索区域时只搜索该区域
+        if region is None:
+            region = self.templates.region_for(template_path, screen_size)
+        
+        # 增量识别：相关图块没有变化时复用上次结果
+        key = (template_path, threshold)
+        if self.tracker:
+            self.tracker.observe(screen)
+            cached = self.tracker.lookup(key, region)
+            if cached is not MISS:
+                self._record_op("find_image", clock)
+                return cached
+        
+        if coarse_scale is None:
+            coarse_scale = config.get("templates.coarse_scale")
+        
+        slot = self._pool_slot(screen) if self.vision_pool else None
+        if slot is not None:
+            # 在进程池中匹配，等待期间释放GIL
+            with slot:
+                box = self._pool_result(template_path, self.vision_pool.match(
+                    slot, template_path, threshold, screen_size, coarse_scale, region
+                ))
+        else:
+            box = self._match_box(screen, template_path, threshold, coarse_scale, region)
+        
+        self._record_op("find_image", clock)
+        return self._match_result(template_path, threshold, box, region)
+    
+    def find_all(self, template_path: str,
+                 threshold: float = 0.8,
+                 max_results: Optional[int] = None,
+                 screen: Optional[np.ndarray] = None,
+                 region: Optional[Tuple[int, int, int, int]] = None) -> List[Tuple[int, int, float]]:
+        """
+        查找图片的所有出现位置（一次匹配，向量化非极大值抑制）
+        
+        Args:
+            template_path: 模板图片路径
+            threshold: 匹配阈值
+            max_results: 最多返回的数量，None为不限
+            screen: 已有的截图，None时重新截图
+            region: 搜索区域(x, y, width, height)，None时使用模板声明的区域或全屏
+            
+        Returns:
+            [(中心x, 中心y, 分数), ...]，按分数从高到低
+        """
+        if screen is None:
+            screen = self.screenshot()
+        if screen is None:
+            return []
+        
+        screen_size = screen.shape[1::-1]
+        template = self.templates.get(template_path, screen_size)
+        if template is None:
+            log_every(5.0, "ERROR", "Template not found: {}", template_path)
+            return []
+        
+        if region is None:
+            region = self.templates.region_for(template_path, screen_size)
+        offset_x, offset_y = 0, 0
+        search = screen
+        if region:
+            offset_x, offset_y = max(0, region[0]), max(0, region[1])
+            search = screen[offset_y:region[1] + region[3], offset_x:region[0] + region[2]]
+        
+        h, w = template.shape[:2]
+        hits = match_all(search, template, threshold, max_results,
+                         mask=self.templates.mask(template_path, screen_size))
+        logger.debug("Found {} x{}", template_path, len(hits))
+        return [(x + offset_x + w // 2, y + offset_y + h // 2, score) for x, y, score in hits]
+    
+    def find_images(self, template_paths: List[str],
+                    threshold: float = 0.8,
+                    screen: Optional[np.ndarray] = None) -> Dict[str, Optional[Tuple[int, int]]]:
+        """
+        在同一帧上查找多张图片
+        
+        配置了视觉进程池时所有模板并行匹配，帧只写入共享内存一次。
+        
+        Args:
+            template_paths: 模板路径列表
+            threshold: 匹配阈值
+            screen: 已有的截图，None时重新截图
+            
+        Returns:
+            模板路径到坐标(x, y)或None的映射
+        """
+        if screen is None:
+            screen = self.screenshot()
+        if screen is None:
+            return {path: None for path in template_paths}
+        
+        if not self.vision_pool:
+            return {path: self.find_image(path, threshold, screen) for path in template_paths}
+        
+        results: Dict[str, Optional[Tuple[int, int]]] = {}
+        pending = {}
+        if self.tracker:
+            self.tracker.observe(screen)
+        
+        for path in template_paths:
+            cached = self.tracker.lookup((path, threshold), None) if self.tracker else MISS
+            if cached is not MISS:
+                results[path] = cached
+            else:
+                pending[path] = None
+        
+        if pending:
+            coarse_scale = config.get("templates.coarse_scale")
+            screen_size = screen.shape[1::-1]
+            slot = self._pool_slot(screen)
+            if slot is None:
+                for path in pending:
+                    box = self._match_box(screen, path, threshold, coarse_scale, None)
+                    results[path] = self._match_result(path, threshold, box, None)
+                return results
+            
+            with slot:
+                for path in pending:
+                    pending[path] = self.vision_pool.match(slot, path, threshold, screen_size, coarse_scale)
+                for path, future in pending.items():
+                    box = self._pool_result(path, future)
+                    results[path] = self._match_result(path, threshold, box, None)
+        
+        return results
+    
+    def use_vision_pool(self, pool: Optional[VisionPool]) -> None:
+        """
+        设置视觉进程池（可在多个设备间共享），None表示在本进程内匹配
+        
+        Args:
+            pool: 视觉进程池
+        """
+        self.vision_pool = pool
+    
+    def _pool_frame(self) -> Optional[np.ndarray]:
+        """截图解码可以直接写入时，从视觉进程池借一个共享内存槽位作为目标"""
+        if (not self.vision_pool or self.capture.capture_method != "screencap"
+                or not self.capture.decoder.in_place or not self.capture.frame_shape):
+            return None
+        return self.vision_pool.lend(self.capture.frame_shape)
+    
+    def _pool_slot(self, screen: np.ndarray) -> Optional[FrameSlot]:
+        """
+        取帧所在的进程池槽位：截图时已解码到槽位的直接使用，否则复制进空闲槽位
+        
+        Returns:
+            FrameSlot，帧超过槽位大小或等待超时没有空闲槽位时返回None（在本进程匹配）
+        """
+        slot = self.vision_pool.slot_of(screen)
+        if slot is not None:
+            return slot
+        if not self.vision_pool.fits(screen.shape):
+            log_every(60.0, "WARNING", "Frame {} exceeds vision pool slot size, matching in process",
+                      screen.shape)
+            return None
+        try:
+            return self.vision_pool.put_frame(screen)
+        except queue.Empty:
+            log_every(10.0, "WARNING", "No free vision pool slot, matching in process")
             return None
+    
+    def _match_box(self, screen: np.ndarray, template_path: str, threshold: float,
+                   coarse_scale: Optional[float],
+                   region: Optional[Tuple[int, int, int, int]]) -> Optional[Tuple[int, int, int, int]]:
+        """
+        在本进程内匹配
         
-        # 加载模板
-        template = cv2.imread(template_path)
+        Returns:
+            匹配框(x, y, width, height)或None
+        """
+        # 加载模板（按帧尺寸缩放）
+        screen_size = screen.shape[1::-1]
+        template = self.templates.get(template_path, screen_size)
         if template is None:
-            logger.error(f"Template not found: {template_path}")
+            log_every(5.0, "ERROR", "Template not found: {}", template_path)
             return None
         
         # 模板匹配
-        result = cv2.matchTemplate(screen, template, cv2.TM_CCOEFF_NORMED)
-        min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(result)
+        offset_x, offset_y = 0, 0
+        search = screen
+        if region:
+            offset_x, offset_y = max(0, region[0]), max(0, region[1])
+            search = screen[offset_y:region[1] + region[3], offset_x:region[0] + region[2]]
+        coarse = None
+        if coarse_scale:
+            coarse = self.templates.coarse(template_path, screen_size, coarse_scale)
+        mask = self.templates.mask(template_path, screen_size)
+        match = match_template(search, template, threshold, coarse_scale, coarse, mask)
+        if not match:
+            return None
         
-        if max_val >= threshold:
+        h, w = template.shape[:2]
+        return match[0] + offset_x, match[1] + offset_y, w, h
+    
+    def _pool_result(self, template_path: str, future) -> Optional[Tuple[int, int, int, int]]:
+        """取进程池匹配结果"""
+        try:
+            match = future.result(timeout=config.get("vision.pool_timeout", 10.0))
+        except Exception as e:
+            logger.error(f"Match failed for {template_path}: {e}")
+            return None
+        return match[:4] if match else None
+    
+    def _match_result(self, template_path: str, threshold: float,
+                      box: Optional[Tuple[int, int, int, int]],
+                      region: Optional[Tuple[int, int, int, int]]) -> Optional[Tuple[int, int]]:
+        """把匹配框转换为中心点坐标，并记录增量识别结果"""
+        if box:
             # 返回中心点坐标
-            h, w = template.shape[:2]
-            center_x = max_loc[0] + w // 2
-            center_y = max_loc[1] + h // 2
-            logger.debug(f"Found {template_path} at ({center_x}, {center_y})")
+            x, y, w, h = box
+            center_x = x + w // 2
+            center_y = y + h // 2
+            logger.debug("Found {} at ({}, {})", template_path, center_x, center_y)
+            if self.tracker:
+                self.tracker.store((template_path, threshold), (center_x, center_y), box, region)
             return (center_x, center_y)
         
+        if self.tracker:
+            self.tracker.store((template_path, threshold), None, None, region)
         return None
     
+    def check_colors(self, signature: Union[str, ColorSignature],
+                     screen: Optional[np.ndarray] = None) -> bool:
+        """
+        多点取色检查
+        
+        Args:
+            signature: 颜色特征或其名称
+            screen: 已有的截图，None时重新截图
+            
+        Returns:
+            是否匹配
+        """
+        sig = self._color_signature(signature)
+        if sig is None:
+            return False
+        
+        if screen is None:
+            screen = self.screenshot()
+        if screen is None:
+            return False
+        
+        return sig.scaled(screen.shape[1::-1]).check(screen)
+    
+    def find_color_pattern(self, signature: Union[str, ColorSignature],
+                           region: Optional[Tuple[int, int, int, int]] = None,
+                           screen: Optional[np.ndarray] = None) -> Optional[Tuple[int, int]]:
+        """
+        按相对偏移查找颜色图案
+        
+        Args:
+            signature: 颜色特征或其名称
+            region: 搜索区域(x, y, width, height)
+            screen: 已有的截图，None时重新截图
+            
+        Returns:
+            锚点坐标(x, y)或None
+        """
+        sig = self._color_signature(signature)
+        if sig is None:
+            return None
+        
+        if screen is None:
+            screen = self.screenshot()
+        if screen is None:
+            return None
+        
+        return sig.scaled(screen.shape[1::-1]).find(screen, region)
+    
+    def _color_signature(self, signature: Union[str, ColorSignature]) -> Optional[ColorSignature]:
+        """解析颜色特征（按帧尺寸缩放由调用方完成）"""
+        if isinstance(signature, str):
+            sig = self.colors.get(signature)
+            if sig is None:
+                logger.error(f"Color signature not found: {signature}")
+                return None
+        else:
+            sig = signature
+        return sig
+    
+    def identify_scene(self, screen: Optional[np.ndarray] = None,
+                       max_distance: Optional[int] = None) -> Optional[Tuple[str, int]]:
+        """
+        识别当前界面
+        
+        Args:
+            screen: 已有的截图，None时重新截图
+            max_distance: 最大汉明距离，None时使用配置 scenes.max_distance
+            
+        Returns:
+            (场景名称, 距离) 或 None
+        """
+        if self.scenes is None:
+            logger.error("Scene index not loaded")
+            return None
+        
+        if screen is None:
+            screen = self.screenshot()
+        if screen is None:
+            return None
+        
+        if max_distance is None:
+            max_distance = config.get("scenes.max_distance", 10)
+        return self.scenes.identify(screen, max_distance)
+    
     def tap_image(self, template_path: str, 
                   threshold: float = 0.8) -> bool:
         """
@@ -154,12 +904,19 @@ class Game:
             是否找到
         """
         start_time = time.time()
+        last_frame_time = 0.0
         
         while time.time() - start_time < timeout:
-            if self.find_image(template_path):
-                logger.debug(f"Found {template_path}")
-                return True
-            wait(interval)
+            frame = self.next_frame(last_frame_time)
+            if frame is not None:
+                screen, last_frame_time = frame
+                if self.find_image(template_path, screen=screen):
+                    logger.debug("Found {}", template_path)
+                    return True
+            
+            # 流水线模式下取帧本身会等待新帧
+            if not self.capture_running:
+                wait(interval)
         
         logger.warning(f"Timeout waiting for {template_path}")
         return False
@@ -178,7 +935,9 @@ class Game:
             logger.error("Device not connected")
             return False
         
+        clock = time.perf_counter()
         result = self.input.tap(x, y)
+        self._record_op("tap", clock, result.is_ok())
         return result.is_ok()
     
     def swipe(self, x1: int, y1: int, x2: int, y2: int,
@@ -198,9 +957,46 @@ class Game:
             logger.error("Device not connected")
             return False
         
+        clock = time.perf_counter()
         result = self.input.swipe(x1, y1, x2, y2, duration)
+        self._record_op("swipe", clock, result.is_ok())
+        return result.is_ok()
+    
+    def gesture(self, gesture: Gesture) -> bool:
+        """
+        执行手势（折线、多指、按住拖动）
+        
+        Args:
+            gesture: 手势
+            
+        Returns:
+            是否成功
+        """
+        if not self.connected:
+            logger.error("Device not connected")
+            return False
+        
+        result = self.input.gesture(gesture)
+        if result.is_fail():
+            logger.error(result.error)
         return result.is_ok()
     
+    def drag(self, x1: int, y1: int, x2: int, y2: int,
+             hold: int = 500, duration: int = 300) -> bool:
+        """
+        拖放
+        
+        Args:
+            x1, y1: 起点
+            x2, y2: 终点
+            hold: 起点按住时长（毫秒）
+            duration: 移动时长（毫秒）
+            
+        Returns:
+            是否成功
+        """
+        return self.gesture(Gesture.drag(x1, y1, x2, y2, hold, duration))
+    
     def text(self, content: str) -> bool:
         """
         输入文本
@@ -241,20 +1037,56 @@ class Game:
         Returns:
             是否成功
         """
+        device = self.adb.device_id or self.device_id or "default"
+        run = self.history.run(task_func.__name__, device) if self.history else None
+        self._run = run
+        result, error = False, None
         try:
             logger.info(f"Running task: {task_func.__name__}")
-            result = task_func(self)
+            session = self.profiling.profile(task_func.__name__, device, self._thread_ids)
+            if session:
+                with session:
+                    result = task_func(self)
+            else:
+                result = task_func(self)
             if result:
                 logger.info(f"Task completed: {task_func.__name__}")
             else:
                 logger.warning(f"Task failed: {task_func.__name__}")
             return result
+        except TaskInterrupted as e:
+            logger.warning(f"Task {task_func.__name__} aborted by watcher: {e.watcher}")
+            error = str(e)
+            return False
         except Exception as e:
             logger.error(f"Task error: {e}")
+            error = str(e)
             return False
+        finally:
+            self._run = None
+            if run:
+                run.finish(bool(result), error)
+    
+    def _record_op(self, name: str, started: float, success: bool = True) -> None:
+        """把一次操作的耗时计入当前任务运行（没有运行中的任务时忽略）"""
+        run = self._run
+        if run is not None:
+            run.operation(name, time.perf_counter() - started, success)
     
     def disconnect(self) -> None:
         """断开连接"""
+        if self.connected:
+            self._save_session()
+        self.stop_health_monitor()
+        self.stop_capture()
+        if self._held_frame is not None:
+            self.release_frame(self._held_frame)
+            self._held_frame = None
+        if self.capture:
+            self.capture.close()
+        if self.input and self.input.journal:
+            self.input.journal.close()
+            self.input.journal = None
         if self.adb:
             self.adb.disconnect()
         self.connected = False
@@ -3,5 +3,10 @@
 """
 
 from .monitor import Monitor, Timer, monitor
+from .profiler import SamplingProfiler, TaskProfiling
+from .log import setup_logging, log_every, RateLimiter, ActionJournal
+from .history import RunHistory, RunRecord, Regression
 
-__all__ = ['Monitor', 'Timer', 'monitor']
\ No newline at end of file
+__all__ = ['Monitor', 'Timer', 'monitor', 'SamplingProfiler', 'TaskProfiling',
+           'setup_logging', 'log_every', 'RateLimiter', 'ActionJournal',
+           'RunHistory', 'RunRecord', 'Regression']
\ No newline at end of file
@@ -0,0 +1,385 @@
+"""
+运行历史 - 任务与操作耗时持久化到SQLite，对比基线检测性能回退
+"""
+
+from __future__ import annotations
+
+import atexit
+import queue
+import statistics
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from loguru import logger
+
+from core.utils import lazy_import
+
+sqlite3 = lazy_import("sqlite3")
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id TEXT PRIMARY KEY,
+    task TEXT NOT NULL,
+    device TEXT NOT NULL,
+    started REAL NOT NULL,
+    duration REAL NOT NULL,
+    success INTEGER NOT NULL,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS runs_task_started ON runs(task, started);
+CREATE TABLE IF NOT EXISTS operations (
+    run_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    total REAL NOT NULL,
+    max REAL NOT NULL,
+    failures INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS operations_run ON operations(run_id);
+"""
+
+DAY = 86400.0
+
+
+class RunRecord:
+    """
+    一次任务运行
+
+    运行期间的操作只在内存中按名称累计（次数、总耗时、最大耗时、失败数），
+    结束时连同运行结果一次性交给后台线程写入。
+    """
+
+    def __init__(self, history: "RunHistory", task: str, device: str):
+        self.history = history
+        self.id = uuid.uuid4().hex
+        self.task = task
+        self.device = device
+        self.started = time.time()
+        self.success = False
+        self.error: Optional[str] = None
+        self.operations: Dict[str, List[float]] = {}
+        self._start = time.perf_counter()
+
+    def operation(self, name: str, duration: float, success: bool = True) -> None:
+        """
+        累计一次操作
+
+        Args:
+            name: 操作名称
+            duration: 耗时（秒）
+            success: 是否成功
+        """
+        stats = self.operations.get(name)
+        if stats is None:
+            self.operations[name] = [1, duration, duration, 0 if success else 1]
+            return
+        stats[0] += 1
+        stats[1] += duration
+        if duration > stats[2]:
+            stats[2] = duration
+        if not success:
+            stats[3] += 1
+
+    def finish(self, success: bool, error: Optional[str] = None) -> None:
+        """结束运行并提交写入"""
+        self.success = success
+        self.error = error
+        duration = time.perf_counter() - self._start
+        run = (self.id, self.task, self.device, self.started, duration, int(success), error)
+        operations = [(self.id, name, int(count), total, peak, int(failures))
+                      for name, (count, total, peak, failures) in self.operations.items()]
+        self.history.submit(run, operations)
+
+    def __enter__(self) -> "RunRecord":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc is not None:
+            self.finish(False, f"{exc_type.__name__}: {exc}")
+        else:
+            self.finish(self.success, self.error)
+
+
+@dataclass
+class Regression:
+    """一个任务或操作在两个时间窗口间的对比"""
+    kind: str                   # task / operation
+    name: str
+    device: Optional[str]       # None表示所有设备合并
+    baseline_ms: float          # 基线窗口的耗时中位数
+    recent_ms: float            # 近期窗口的耗时中位数
+    baseline_success: float
+    recent_success: float
+    baseline_runs: int
+    recent_runs: int
+    slower: bool = False
+    less_reliable: bool = False
+
+    @property
+    def change(self) -> float:
+        """耗时变化比例（0.3表示慢了30%）"""
+        return self.recent_ms / self.baseline_ms - 1 if self.baseline_ms else 0.0
+
+    @property
+    def regressed(self) -> bool:
+        return self.slower or self.less_reliable
+
+
+class RunHistory:
+    """
+    运行历史库
+
+    写入通过队列交给后台线程，按批次提交事务，调用方不等待磁盘。
+    同一进程内的多个设备共享一个实例（见 shared()），数据库使用WAL，
+    多进程写同一个文件时也能并发读取。
+    """
+
+    _shared: Dict[str, "RunHistory"] = {}
+    _shared_lock = threading.Lock()
+
+    def __init__(self, path: str, batch_size: int = 100, flush_interval: float = 2.0):
+        """
+        初始化
+
+        Args:
+            path: 数据库文件
+            batch_size: 累计多少次运行后提交一次
+            flush_interval: 最长提交间隔（秒）
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        self._thread_lock = threading.Lock()
+
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @classmethod
+    def shared(cls, path: str, **kwargs) -> "RunHistory":
+        """获取进程内共享的实例，退出时自动写完剩余数据"""
+        key = str(Path(path).resolve())
+        with cls._shared_lock:
+            history = cls._shared.get(key)
+            if history is None:
+                history = cls._shared[key] = cls(path, **kwargs)
+                atexit.register(history.close)
+            return history
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def run(self, task: str, device: str) -> RunRecord:
+        """
+        开始记录一次任务运行
+
+        Args:
+            task: 任务名
+            device: 设备ID
+
+        Returns:
+            RunRecord，用作上下文管理器或手动调用finish()
+        """
+        return RunRecord(self, task, device)
+
+    def submit(self, run: Tuple, operations: List[Tuple]) -> None:
+        """提交一次运行的数据（入队即返回）"""
+        if self._closed:
+            return
+        self._ensure_writer()
+        self._queue.put((run, operations))
+
+    def _ensure_writer(self) -> None:
+        if self._thread is not None:
+            return
+        with self._thread_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._write_loop, name="run-history", daemon=True)
+                self._thread.start()
+
+    def _write_loop(self) -> None:
+        conn = self._connect()
+        runs: List[Tuple] = []
+        operations: List[Tuple] = []
+        waiters: List[threading.Event] = []
+        deadline = time.monotonic() + self.flush_interval
+        stopping = False
+
+        while not stopping:
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                item = None
+
+            if item is None:
+                pass
+            elif isinstance(item, threading.Event):
+                waiters.append(item)
+            elif item == "stop":
+                stopping = True
+            else:
+                runs.append(item[0])
+                operations.extend(item[1])
+
+            if not (stopping or waiters or len(runs) >= self.batch_size
+                    or time.monotonic() >= deadline):
+                continue
+
+            if runs:
+                try:
+                    with conn:
+                        conn.executemany("INSERT OR REPLACE INTO runs VALUES (?, ?, ?, ?, ?, ?, ?)", runs)
+                        conn.executemany("INSERT INTO operations VALUES (?, ?, ?, ?, ?, ?)", operations)
+                except sqlite3.Error as e:
+                    logger.error(f"Run history write failed ({len(runs)} runs dropped): {e}")
+                runs, operations = [], []
+            for event in waiters:
+                event.set()
+            waiters = []
+            deadline = time.monotonic() + self.flush_interval
+
+        conn.close()
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """等待已提交的数据写入"""
+        if self._thread is None:
+            return True
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self, timeout: float = 10.0) -> None:
+        """写完剩余数据并停止后台线程"""
+        if self._closed:
+            return
+        self._closed = True
+        if self._thread is not None:
+            self._queue.put("stop")
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _window_runs(self, start: float, end: float, task: Optional[str],
+                     device: Optional[str]) -> List[Tuple]:
+        query = "SELECT id, task, device, duration, success FROM runs WHERE started >= ? AND started < ?"
+        params: List = [start, end]
+        if task:
+            query += " AND task = ?"
+            params.append(task)
+        if device:
+            query += " AND device = ?"
+            params.append(device)
+        with self._connect() as conn:
+            return conn.execute(query, params).fetchall()
+
+    def _window_operations(self, start: float, end: float, task: Optional[str],
+                           device: Optional[str]) -> List[Tuple]:
+        query = ("SELECT r.task, r.device, o.name, o.count, o.total, o.failures "
+                 "FROM operations o JOIN runs r ON o.run_id = r.id "
+                 "WHERE r.started >= ? AND r.started < ?")
+        params: List = [start, end]
+        if task:
+            query += " AND r.task = ?"
+            params.append(task)
+        if device:
+            query += " AND r.device = ?"
+            params.append(device)
+        with self._connect() as conn:
+            return conn.execute(query, params).fetchall()
+
+    def compare(self, recent: float = 1.0, baseline: float = 7.0,
+                threshold: float = 0.2, success_drop: float = 0.1,
+                min_runs: int = 3, task: Optional[str] = None,
+                device: Optional[str] = None, by_device: bool = False,
+                operations: bool = False,
+                now: Optional[float] = None) -> List[Regression]:
+        """
+        对比近期窗口与之前的基线窗口
+
+        耗时取每次运行的中位数（操作取每次运行的平均耗时再取中位数），
+        近期比基线慢超过threshold或成功率下降超过success_drop时标记为回退。
+
+        Args:
+            recent: 近期窗口（天）
+            baseline: 基线窗口（天，紧接在近期窗口之前）
+            threshold: 耗时回退阈值（0.2为慢20%）
+            success_drop: 成功率下降阈值
+            min_runs: 两个窗口都至少有这么多次运行才比较
+            task: 只看该任务
+            device: 只看该设备
+            by_device: 按设备分别比较
+            operations: 同时比较各操作
+            now: 近期窗口的结束时间，默认为当前时间
+
+        Returns:
+            对比结果，回退的排在前面
+        """
+        now = now or time.time()
+        split = now - recent * DAY
+        start = split - baseline * DAY
+
+        def group_runs(rows: List[Tuple]) -> Dict[Tuple, Tuple[List[float], List[int]]]:
+            groups: Dict[Tuple, Tuple[List[float], List[int]]] = {}
+            for _, name, dev, duration, success in rows:
+                key = ("task", name, dev if by_device else None)
+                durations, outcomes = groups.setdefault(key, ([], []))
+                durations.append(duration * 1000)
+                outcomes.append(success)
+            return groups
+
+        def group_operations(rows: List[Tuple]) -> Dict[Tuple, Tuple[List[float], List[int]]]:
+            groups: Dict[Tuple, Tuple[List[float], List[int]]] = {}
+            for task_name, dev, name, count, total, failures in rows:
+                key = ("operation", f"{task_name}/{name}", dev if by_device else None)
+                durations, outcomes = groups.setdefault(key, ([], [0, 0]))
+                durations.append(total / count * 1000)
+                outcomes[0] += count - failures
+                outcomes[1] += count
+            return groups
+
+        windows = []
+        for window_start, window_end in ((start, split), (split, now)):
+            groups = group_runs(self._window_runs(window_start, window_end, task, device))
+            if operations:
+                groups.update(group_operations(
+                    self._window_operations(window_start, window_end, task, device)))
+            windows.append(groups)
+        before, after = windows
+
+        results = []
+        for key in sorted(set(before) & set(after)):
+            (base_durations, base_outcomes), (recent_durations, recent_outcomes) = before[key], after[key]
+            if len(base_durations) < min_runs or len(recent_durations) < min_runs:
+                continue
+
+            if key[0] == "task":
+                base_success = sum(base_outcomes) / len(base_outcomes)
+                recent_success = sum(recent_outcomes) / len(recent_outcomes)
+            else:
+                base_success = base_outcomes[0] / base_outcomes[1]
+                recent_success = recent_outcomes[0] / recent_outcomes[1]
+
+            item = Regression(
+                kind=key[0], name=key[1], device=key[2],
+                baseline_ms=statistics.median(base_durations),
+                recent_ms=statistics.median(recent_durations),
+                baseline_success=base_success,
+                recent_success=recent_success,
+                baseline_runs=len(base_durations),
+                recent_runs=len(recent_durations)
+            )
+            item.slower = item.change > threshold
+            item.less_reliable = base_success - recent_success > success_drop
+            results.append(item)
+
+        results.sort(key=lambda r: (not r.regressed, r.kind != "task", -r.change))
+        return results
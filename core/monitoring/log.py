@@ -0,0 +1,204 @@
+"""
+日志层 - 异步输出、按调用点限频与二进制操作日志
+"""
+
+import struct
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple
+from loguru import logger
+
+
+def setup_logging(console_level: str = "INFO",
+                  file_path: Optional[str] = "logs/game.log",
+                  file_level: str = "INFO",
+                  rotation: str = "1 day") -> None:
+    """
+    配置日志输出
+
+    文件输出使用enqueue，格式化后的消息交给后台线程写盘，调用方不等待IO。
+    没有输出接受的级别（如DEBUG）在loguru内部直接返回，不会格式化参数；
+    热路径应写成 logger.debug("x={}", x) 而不是 f-string。
+
+    Args:
+        console_level: 控制台级别
+        file_path: 日志文件，None为不写文件
+        file_level: 文件级别
+        rotation: 文件轮转周期
+    """
+    logger.remove()
+    logger.add(sys.stderr, level=console_level)
+    if file_path:
+        logger.add(file_path, rotation=rotation, level=file_level, enqueue=True)
+
+
+class RateLimiter:
+    """
+    按调用点限频
+
+    每个调用点在interval内最多输出一次，期间被抑制的条数附在下一次输出后。
+    """
+
+    def __init__(self, interval: float = 1.0):
+        self.interval = interval
+        self._sites: Dict[Tuple, Tuple[float, int]] = {}
+        self._lock = threading.Lock()
+
+    def allow(self, site: Tuple) -> Tuple[bool, int]:
+        """
+        调用点本次是否输出
+
+        Returns:
+            (是否输出, 此前被抑制的条数)
+        """
+        now = time.monotonic()
+        with self._lock:
+            last, suppressed = self._sites.get(site, (0.0, 0))
+            if now - last < self.interval:
+                self._sites[site] = (last, suppressed + 1)
+                return False, 0
+            self._sites[site] = (now, 0)
+            return True, suppressed
+
+
+_limiters: Dict[float, RateLimiter] = {}
+
+
+def log_every(interval: float, level: str, message: str, *args, **kwargs) -> None:
+    """
+    限频日志：同一调用点每interval秒最多输出一次
+
+    Args:
+        interval: 最小间隔（秒）
+        level: 日志级别
+        message: loguru格式的消息（{}占位，参数延迟格式化）
+    """
+    caller = sys._getframe(1)
+    site = (caller.f_code, caller.f_lineno)
+    limiter = _limiters.get(interval)
+    if limiter is None:
+        limiter = _limiters.setdefault(interval, RateLimiter(interval))
+
+    allowed, suppressed = limiter.allow(site)
+    if not allowed:
+        return
+    if suppressed:
+        message += f" (+{suppressed} suppressed)"
+    logger.opt(depth=1).log(level, message, *args, **kwargs)
+
+
+# 操作记录：时间戳(double) 类型(uint8) 4个坐标(int16) 时长或参数(int32)
+_RECORD = struct.Struct("<dBhhhhi")
+_MAGIC = b"SPSJ\x01"
+
+ACTION_CODES = {
+    "tap": 1,
+    "swipe": 2,
+    "key": 3,
+    "text": 4,
+    "gesture": 5,
+}
+_ACTION_NAMES = {code: name for name, code in ACTION_CODES.items()}
+
+
+def _int16(value: int) -> int:
+    return max(-32768, min(32767, int(value)))
+
+
+class ActionJournal:
+    """
+    二进制操作日志
+
+    每条记录固定21字节，只做struct打包和缓冲写入，不格式化文本。
+    用 ActionJournal.expand() 或 python -m core.monitoring.log <文件> 离线展开。
+    """
+
+    def __init__(self, path: str, buffer_size: int = 64 * 1024):
+        """
+        初始化
+
+        Args:
+            path: 日志文件（追加写入）
+            buffer_size: 写缓冲大小
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        new_file = not self.path.exists() or self.path.stat().st_size == 0
+        self._file = open(self.path, "ab", buffering=buffer_size)
+        if new_file:
+            self._file.write(_MAGIC)
+        self._lock = threading.Lock()
+
+    def record(self, action: str, x: int = 0, y: int = 0, x2: int = 0, y2: int = 0,
+               value: int = 0, timestamp: Optional[float] = None) -> None:
+        """
+        记录一次操作
+
+        Args:
+            action: tap/swipe/key/text/gesture
+            x, y, x2, y2: 坐标
+            value: 时长（毫秒）、按键码或文本长度
+            timestamp: 时间戳，默认为当前时间
+        """
+        packed = _RECORD.pack(timestamp or time.time(), ACTION_CODES.get(action, 0),
+                              _int16(x), _int16(y), _int16(x2), _int16(y2), int(value))
+        with self._lock:
+            self._file.write(packed)
+
+    def flush(self) -> None:
+        """写出缓冲"""
+        with self._lock:
+            self._file.flush()
+
+    def close(self) -> None:
+        """关闭"""
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+    @staticmethod
+    def read(path: str) -> Iterator[Tuple[float, str, int, int, int, int, int]]:
+        """
+        读取记录
+
+        Yields:
+            (时间戳, 类型, x, y, x2, y2, 参数)
+        """
+        with open(path, "rb") as f:
+            data = f.read()
+        if not data.startswith(_MAGIC):
+            raise ValueError(f"Not an action journal: {path}")
+
+        body = memoryview(data)[len(_MAGIC):]
+        usable = len(body) - len(body) % _RECORD.size
+        for ts, code, x, y, x2, y2, value in _RECORD.iter_unpack(body[:usable]):
+            yield ts, _ACTION_NAMES.get(code, f"unknown({code})"), x, y, x2, y2, value
+
+    @classmethod
+    def expand(cls, path: str) -> Iterator[str]:
+        """展开为文本行"""
+        for ts, action, x, y, x2, y2, value in cls.read(path):
+            stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(ts)) + f".{int(ts % 1 * 1000):03d}"
+            if action in ("swipe", "gesture"):
+                yield f"{stamp} {action} ({x}, {y}) -> ({x2}, {y2}) {value}ms"
+            elif action == "tap":
+                yield f"{stamp} tap ({x}, {y}) {value}ms"
+            elif action == "key":
+                yield f"{stamp} key {value}"
+            elif action == "text":
+                yield f"{stamp} text len={value}"
+            else:
+                yield f"{stamp} {action} {x} {y} {x2} {y2} {value}"
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Expand a binary action journal to text")
+    parser.add_argument("journal")
+    args = parser.parse_args()
+
+    for line in ActionJournal.expand(args.journal):
+        print(line)
@@ -54,6 +54,16 @@ class Monitor:
             self._counters[name] = 0
         self._counters[name] += value
     
+    def set_count(self, name: str, value: int) -> None:
+        """
+        设置计数器值（用于导出外部统计）
+        
+        Args:
+            name: 计数器名称
+            value: 计数值
+        """
+        self._counters[name] = value
+    
     def get_count(self, name: str) -> int:
         """获取计数器值"""
         return self._counters.get(name, 0)
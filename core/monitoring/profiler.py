@@ -0,0 +1,205 @@
+"""
+采样分析器 - 定时采样线程调用栈，输出折叠栈（flamegraph）格式
+"""
+
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Optional, Set
+from loguru import logger
+
+
+class SamplingProfiler:
+    """
+    采样分析器
+
+    后台线程按固定间隔读取 sys._current_frames()，把每个线程的调用栈折叠为
+    "线程;外层函数;...;内层函数" 并计数。只在采样时遍历栈帧，被分析代码没有插桩开销。
+    输出可直接交给 flamegraph.pl / speedscope。
+
+    默认只采样调用start()的线程和threads()给出的线程（如本设备的后台线程），
+    同一进程里其他设备的线程不会混进来。
+    """
+
+    def __init__(self, interval: float = 0.005,
+                 all_threads: bool = False,
+                 max_depth: int = 128,
+                 threads: Optional[Callable[[], Iterable[Optional[int]]]] = None):
+        """
+        初始化
+
+        Args:
+            interval: 采样间隔（秒）
+            all_threads: 是否采样进程内所有线程
+            max_depth: 最大栈深度
+            threads: 额外采样的线程ID，每次采样时调用（线程可能在分析期间启动或重建）
+        """
+        self.interval = interval
+        self.all_threads = all_threads
+        self.max_depth = max_depth
+        self.threads = threads
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.duration = 0.0
+        self._targets: Optional[Set[int]] = None
+        self._labels: Dict[object, str] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._started = 0.0
+
+    def start(self) -> None:
+        """开始采样"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._targets = None if self.all_threads else {threading.get_ident()}
+        self._stop.clear()
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> Counter:
+        """
+        停止采样
+
+        Returns:
+            折叠栈计数
+        """
+        if self._thread:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+            self.duration += time.perf_counter() - self._started
+        return self.stacks
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            targets = self._targets
+            if targets is not None and self.threads is not None:
+                targets = targets | set(self.threads())
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own or (targets is not None and ident not in targets):
+                    continue
+                self.stacks[self._collapse(names.get(ident, str(ident)), frame)] += 1
+            self.samples += 1
+
+    def _collapse(self, thread_name: str, frame) -> str:
+        stack = []
+        while frame is not None and len(stack) < self.max_depth:
+            code = frame.f_code
+            label = self._labels.get(code)
+            if label is None:
+                # 按函数聚合（不区分行号），火焰图更易读
+                label = f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})"
+                self._labels[code] = label
+            stack.append(label)
+            frame = frame.f_back
+        stack.append(thread_name)
+        return ";".join(reversed(stack))
+
+    def write(self, path: str) -> Path:
+        """
+        写出折叠栈文件
+
+        Args:
+            path: 输出路径
+
+        Returns:
+            文件路径
+        """
+        output = Path(path)
+        output.parent.mkdir(parents=True, exist_ok=True)
+        with open(output, 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        return output
+
+    def top(self, n: int = 10) -> Dict[str, int]:
+        """按自身采样数排序的最热函数"""
+        leaf = Counter()
+        for stack, count in self.stacks.items():
+            leaf[stack.rsplit(";", 1)[-1]] += count
+        return dict(leaf.most_common(n))
+
+    def __enter__(self) -> 'SamplingProfiler':
+        self.start()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.stop()
+
+
+class TaskProfiling:
+    """
+    按任务启用采样分析
+
+    enabled为True时分析所有任务，否则只分析tasks中列出的任务。
+    每次任务运行输出一个文件：<output_dir>/<任务>-<设备>-<时间(毫秒)>-<随机后缀>.folded
+    """
+
+    def __init__(self, enabled: bool = False,
+                 tasks: Optional[Set[str]] = None,
+                 interval: float = 0.005,
+                 output_dir: str = "profiles",
+                 all_threads: bool = False):
+        self.enabled = enabled
+        self.tasks = set(tasks or ())
+        self.interval = interval
+        self.output_dir = Path(output_dir)
+        self.all_threads = all_threads
+
+    def wants(self, task_name: str) -> bool:
+        """是否分析该任务"""
+        return self.enabled or task_name in self.tasks
+
+    def profile(self, task_name: str, device: str,
+                threads: Optional[Callable[[], Iterable[Optional[int]]]] = None) -> Optional['_TaskSession']:
+        """
+        创建任务分析上下文
+
+        Args:
+            task_name: 任务名称
+            device: 设备标识
+            threads: 除任务线程外要采样的线程ID（该设备的后台线程）
+
+        Returns:
+            上下文管理器，不分析该任务时返回None
+        """
+        if not self.wants(task_name):
+            return None
+        return _TaskSession(self, task_name, device, threads)
+
+
+class _TaskSession:
+    """单次任务的分析上下文"""
+
+    def __init__(self, owner: TaskProfiling, task_name: str, device: str,
+                 threads: Optional[Callable[[], Iterable[Optional[int]]]] = None):
+        self.owner = owner
+        self.task_name = task_name
+        self.device = device
+        self.profiler = SamplingProfiler(owner.interval, owner.all_threads, threads=threads)
+
+    def __enter__(self) -> SamplingProfiler:
+        self.profiler.start()
+        return self.profiler
+
+    def __exit__(self, *args) -> None:
+        profiler = self.profiler
+        profiler.stop()
+        safe_device = "".join(c if c.isalnum() or c in "-_." else "_" for c in self.device)
+        # 同一设备上的同一任务在一秒内多次结束时文件也不会相互覆盖
+        now = time.time()
+        stamp = f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(now))}{int(now * 1000) % 1000:03d}"
+        name = f"{self.task_name}-{safe_device}-{stamp}-{uuid.uuid4().hex[:6]}.folded"
+        try:
+            path = profiler.write(str(self.owner.output_dir / name))
+        except OSError as e:
+            logger.error(f"Failed to write profile: {e}")
+            return
+        logger.info(f"Profile for {self.task_name} on {self.device}: {profiler.samples} samples "
+                    f"in {profiler.duration:.1f}s -> {path}")
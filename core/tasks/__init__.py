@@ -0,0 +1,9 @@
+"""
+任务系统 - 声明式状态机任务
+"""
+
+from .engine import Detector, Action, Transition, State, TaskDefinition, TaskEngine
+from .watchers import Watcher, WatcherRegistry
+
+__all__ = ['Detector', 'Action', 'Transition', 'State', 'TaskDefinition', 'TaskEngine',
+           'Watcher', 'WatcherRegistry']
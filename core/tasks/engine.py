@@ -0,0 +1,385 @@
+"""
+状态机任务引擎 - 声明式任务定义与执行
+"""
+
+from __future__ import annotations
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, TYPE_CHECKING
+from loguru import logger
+
+from core import ConfigError
+from core.utils import lazy_import
+
+yaml = lazy_import("yaml")
+
+if TYPE_CHECKING:
+    from core.game import Game
+
+
+@dataclass
+class Detector:
+    """
+    检测器
+
+    kind: image（模板）/ color（多点取色）/ scene（场景识别）/ always（无条件）/
+    call（可调用对象，接收game和帧，返回命中结果或None）
+    """
+    kind: str
+    target: Any = None
+    threshold: float = 0.8
+    region: Optional[tuple] = None
+    negate: bool = False
+
+    @classmethod
+    def parse(cls, data: Any) -> 'Detector':
+        """
+        从配置解析
+
+        支持 {image: path, threshold: 0.9, region: [x, y, w, h], not: true}、
+        {color: name}、{scene: name}、"always" 或可调用对象
+        """
+        if data is None or data == "always":
+            return cls("always")
+        if isinstance(data, Detector):
+            return data
+        if callable(data):
+            return cls("call", data)
+        if not isinstance(data, dict):
+            raise ConfigError(f"Invalid detector: {data!r}")
+
+        for kind in ("image", "color", "scene"):
+            if kind in data:
+                region = data.get("region")
+                return cls(kind, data[kind], float(data.get("threshold", 0.8)),
+                           tuple(region) if region else None, bool(data.get("not", False)))
+        raise ConfigError(f"Unknown detector: {data!r}")
+
+    def check(self, game: 'Game', screen) -> Any:
+        """
+        在给定帧上检测
+
+        Returns:
+            命中时返回坐标或True，未命中返回None
+        """
+        if self.kind == "always":
+            hit = True
+        elif self.kind == "image":
+            hit = game.find_image(self.target, self.threshold, screen=screen, region=self.region)
+        elif self.kind == "color":
+            hit = game.check_colors(self.target, screen=screen) or None
+        elif self.kind == "scene":
+            scene = game.identify_scene(screen=screen)
+            hit = True if scene and scene[0] == self.target else None
+        elif self.kind == "call":
+            hit = self.target(game, screen)
+        else:
+            hit = None
+
+        if self.negate:
+            return None if hit else True
+        return hit
+
+
+@dataclass
+class Action:
+    """
+    动作
+
+    kind: tap / tap_match / swipe / key / back / home / text / wait / call
+    """
+    kind: str
+    args: Any = None
+
+    @classmethod
+    def parse(cls, data: Any) -> 'Action':
+        """从配置解析：字符串为无参动作，单键字典为带参动作，可调用对象为call"""
+        if isinstance(data, Action):
+            return data
+        if callable(data):
+            return cls("call", data)
+        if isinstance(data, str):
+            return cls(data)
+        if isinstance(data, dict) and len(data) == 1:
+            kind, args = next(iter(data.items()))
+            return cls(kind, args)
+        raise ConfigError(f"Invalid action: {data!r}")
+
+    def run(self, game: 'Game', match: Any = None) -> bool:
+        """
+        执行动作
+
+        Args:
+            game: 游戏控制器
+            match: 触发转移的检测结果（tap_match使用）
+
+        Returns:
+            是否成功
+        """
+        if self.kind == "tap":
+            return game.tap(*self.args)
+        if self.kind == "tap_match":
+            if not isinstance(match, tuple):
+                logger.warning("tap_match without a detected position")
+                return False
+            return game.tap(*match)
+        if self.kind == "swipe":
+            return game.swipe(*self.args)
+        if self.kind == "key":
+            return game.input.key_event(int(self.args)).is_ok()
+        if self.kind == "back":
+            return game.back()
+        if self.kind == "home":
+            return game.home()
+        if self.kind == "text":
+            return game.text(str(self.args))
+        if self.kind == "wait":
+            time.sleep(float(self.args))
+            return True
+        if self.kind == "call":
+            return self.args(game) is not False
+
+        logger.error(f"Unknown action: {self.kind}")
+        return False
+
+
+@dataclass
+class Transition:
+    """状态转移"""
+    target: str
+    when: Detector
+    actions: List[Action] = field(default_factory=list)
+
+
+@dataclass
+class State:
+    """
+    状态
+
+    terminal为success/failure时到达即结束任务。
+    """
+    name: str
+    transitions: List[Transition] = field(default_factory=list)
+    actions: List[Action] = field(default_factory=list)  # 进入状态时执行
+    timeout: Optional[float] = None
+    on_timeout: Optional[str] = None
+    terminal: Optional[str] = None
+
+
+class TaskDefinition:
+    """
+    声明式任务
+
+    实例可以直接传给 Game.run_task()，调用时由TaskEngine执行。
+
+    YAML格式：
+        name: daily_dungeon
+        initial: main
+        timeout: 300
+        states:
+          main:
+            transitions:
+              - to: dungeon
+                when: {image: dungeon_button.png}
+                do: [tap_match, {wait: 1}]
+          dungeon:
+            timeout: 20
+            on_timeout: main
+            transitions: ...
+          done: {terminal: success}
+    """
+
+    def __init__(self, name: str, initial: str, states: Dict[str, State],
+                 timeout: float = 300.0, tick_interval: float = 0.2):
+        self.name = name
+        self.initial = initial
+        self.states = states
+        self.timeout = timeout
+        self.tick_interval = tick_interval
+        self.validate()
+
+    @property
+    def __name__(self) -> str:
+        return self.name
+
+    def __call__(self, game: 'Game') -> bool:
+        return TaskEngine(game, self).run()
+
+    def validate(self) -> None:
+        """检查状态引用"""
+        if self.initial not in self.states:
+            raise ConfigError(f"Task '{self.name}': unknown initial state '{self.initial}'")
+        for state in self.states.values():
+            targets = [t.target for t in state.transitions]
+            if state.on_timeout:
+                targets.append(state.on_timeout)
+            for target in targets:
+                if target not in self.states:
+                    raise ConfigError(f"Task '{self.name}': state '{state.name}' -> unknown '{target}'")
+
+    def successors(self, state_name: str) -> Set[str]:
+        """一步可达的状态"""
+        state = self.states[state_name]
+        names = {t.target for t in state.transitions}
+        if state.on_timeout:
+            names.add(state.on_timeout)
+        return names
+
+    def templates_for(self, state_name: str) -> Set[str]:
+        """状态的出边检测所需的模板"""
+        return {t.when.target for t in self.states[state_name].transitions
+                if t.when.kind == "image"}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'TaskDefinition':
+        """从字典构建"""
+        states = {}
+        for name, spec in (data.get("states") or {}).items():
+            spec = spec or {}
+            transitions = [
+                Transition(
+                    t["to"],
+                    Detector.parse(t.get("when")),
+                    [Action.parse(a) for a in t.get("do", [])]
+                )
+                for t in spec.get("transitions", [])
+            ]
+            states[name] = State(
+                name,
+                transitions,
+                [Action.parse(a) for a in spec.get("do", [])],
+                spec.get("timeout"),
+                spec.get("on_timeout"),
+                spec.get("terminal"),
+            )
+
+        return cls(
+            data.get("name", "task"),
+            data.get("initial") or next(iter(states), ""),
+            states,
+            float(data.get("timeout", 300.0)),
+            float(data.get("tick_interval", 0.2)),
+        )
+
+    @classmethod
+    def load(cls, file_path: str) -> 'TaskDefinition':
+        """从YAML文件加载"""
+        path = Path(file_path)
+        with open(path, 'r', encoding='utf-8') as f:
+            data = yaml.safe_load(f) or {}
+        data.setdefault("name", path.stem)
+        return cls.from_dict(data)
+
+
+class TaskEngine:
+    """
+    状态机执行器
+
+    每个tick取一帧，在同一帧上检查当前状态的所有出边；
+    只检查当前状态可能发生的转移，并预加载下一步可达状态所需的模板。
+    """
+
+    _prefetcher = ThreadPoolExecutor(max_workers=1, thread_name_prefix="template-prefetch")
+
+    def __init__(self, game: 'Game', task: TaskDefinition):
+        self.game = game
+        self.task = task
+        self.state = task.initial
+        self.history: List[str] = []
+
+    def run(self) -> bool:
+        """
+        执行任务
+
+        Returns:
+            是否以success终止
+        """
+        task = self.task
+        started = time.time()
+        self._enter(task.initial)
+        state_started = time.time()
+        last_frame_time = 0.0
+
+        while time.time() - started < task.timeout:
+            state = task.states[self.state]
+            if state.terminal:
+                success = state.terminal == "success"
+                logger.info(f"Task {task.name} finished in state {state.name}: {state.terminal}")
+                return success
+
+            if state.timeout and time.time() - state_started > state.timeout:
+                if state.on_timeout:
+                    logger.warning(f"State {state.name} timed out, going to {state.on_timeout}")
+                    self._enter(state.on_timeout)
+                    state_started = time.time()
+                    continue
+                logger.warning(f"Task {task.name} timed out in state {state.name}")
+                return False
+
+            frame = self.game.next_frame(last_frame_time)
+            if frame is None:
+                time.sleep(task.tick_interval)
+                continue
+            screen, last_frame_time = frame
+
+            # 中断监视器处理弹窗的时间不计入状态超时
+            if self.game.watchers.last_handled > state_started:
+                state_started = time.time()
+
+            fired = self._step(state, screen)
+            if fired:
+                state_started = time.time()
+            elif not self.game.capture_running:
+                time.sleep(task.tick_interval)
+
+        logger.warning(f"Task {task.name} timed out after {task.timeout}s in state {self.state}")
+        return False
+
+    def _step(self, state: State, screen) -> bool:
+        """
+        在一帧上检查所有出边，命中第一条即执行动作并转移
+
+        动作失败时留在当前状态，下一帧条件仍满足会重试，直到状态超时。
+
+        Returns:
+            是否完成了转移
+        """
+        for transition in state.transitions:
+            match = transition.when.check(self.game, screen)
+            if match is None:
+                continue
+
+            logger.debug("{} -> {}", state.name, transition.target)
+            for action in transition.actions:
+                if not action.run(self.game, match):
+                    logger.warning(f"Action {action.kind} failed in transition {state.name} -> "
+                                   f"{transition.target}, staying in {state.name}")
+                    return False
+            self._enter(transition.target)
+            return True
+        return False
+
+    def _enter(self, name: str) -> None:
+        """进入状态：执行进入动作并预加载后继状态的模板"""
+        self.state = name
+        self.history.append(name)
+        state = self.task.states[name]
+        for action in state.actions:
+            action.run(self.game)
+        self._prefetch(name)
+
+    def _prefetch(self, name: str) -> None:
+        """后台加载当前状态及下一步可达状态所需的模板"""
+        paths = set(self.task.templates_for(name))
+        for successor in self.task.successors(name):
+            paths |= self.task.templates_for(successor)
+        if not paths:
+            return
+
+        templates = self.game.templates
+        screen_size = self.game.frame_size
+        for path in paths:
+            self._prefetcher.submit(templates.get, path, screen_size)
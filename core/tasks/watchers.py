@@ -0,0 +1,207 @@
+"""
+中断监视器 - 在任务已经获取的每一帧上检查弹窗并抢先处理
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, TYPE_CHECKING
+from loguru import logger
+
+from core import ConfigError, TaskInterrupted
+from core.events import event_bus
+from core.utils import lazy_import
+from .engine import Detector, Action
+
+yaml = lazy_import("yaml")
+
+if TYPE_CHECKING:
+    from core.game import Game
+
+
+@dataclass
+class Watcher:
+    """
+    中断监视器
+
+    when命中时执行do中的动作（tap_match点击命中位置）；abort为True时处理完后
+    终止当前任务（如断线对话框）。every为每隔几帧检查一次，cooldown为两次触发的最小间隔。
+    """
+    name: str
+    when: Detector
+    actions: List[Action] = field(default_factory=list)
+    abort: bool = False
+    priority: int = 0
+    every: int = 1
+    cooldown: float = 1.0
+    enabled: bool = True
+    fired: int = 0
+    last_fired: float = 0.0
+
+    @classmethod
+    def parse(cls, name: str, data: Dict[str, Any]) -> 'Watcher':
+        """
+        从配置解析
+
+        格式：{when: {image: popup_close.png}, do: [tap_match], abort: false,
+              priority: 0, every: 1, cooldown: 1.0}
+        """
+        if not isinstance(data, dict) or "when" not in data:
+            raise ConfigError(f"Watcher '{name}': missing 'when'")
+        return cls(
+            name,
+            Detector.parse(data["when"]),
+            [Action.parse(a) for a in data.get("do", [])],
+            bool(data.get("abort", False)),
+            int(data.get("priority", 0)),
+            max(1, int(data.get("every", 1))),
+            float(data.get("cooldown", 1.0)),
+            bool(data.get("enabled", True)),
+        )
+
+
+class WatcherRegistry:
+    """
+    中断监视器注册表
+
+    Game.next_frame 每取到一帧就交给 check()，监视器只复用这一帧，不额外截图。
+    命中后先执行处理动作，再由 Game 重新取帧交给任务，任务看到的始终是处理后的画面。
+    处理动作内部再取帧时不会重复触发监视器。
+    """
+
+    EVENT = "task.interrupt"
+
+    def __init__(self):
+        self._watchers: List[Watcher] = []
+        self._frames = 0
+        self._local = threading.local()
+        self.last_handled = 0.0
+
+    def __len__(self) -> int:
+        return len(self._watchers)
+
+    def __contains__(self, name: str) -> bool:
+        return any(w.name == name for w in self._watchers)
+
+    @property
+    def busy(self) -> bool:
+        """当前线程是否正在执行处理动作"""
+        return getattr(self._local, "busy", False)
+
+    def add(self, watcher: Watcher) -> Watcher:
+        """添加监视器（同名替换），按优先级从高到低检查"""
+        self.remove(watcher.name)
+        self._watchers.append(watcher)
+        self._watchers.sort(key=lambda w: -w.priority)
+        return watcher
+
+    def register(self, name: str, when: Any, actions: Optional[List[Any]] = None,
+                 **options) -> Watcher:
+        """
+        注册监视器
+
+        Args:
+            name: 名称
+            when: 检测器或其配置（如 {"image": "popups/close.png"}）
+            actions: 动作列表（配置或可调用对象，可调用对象接收game）
+            **options: abort / priority / every / cooldown
+
+        Returns:
+            Watcher
+        """
+        return self.add(Watcher(name, Detector.parse(when),
+                                [Action.parse(a) for a in actions or []], **options))
+
+    def remove(self, name: str) -> bool:
+        """移除监视器"""
+        count = len(self._watchers)
+        self._watchers = [w for w in self._watchers if w.name != name]
+        return len(self._watchers) != count
+
+    def set_enabled(self, name: str, enabled: bool) -> None:
+        """启用或暂停监视器"""
+        for watcher in self._watchers:
+            if watcher.name == name:
+                watcher.enabled = enabled
+
+    def load(self, file_path: str) -> int:
+        """
+        从YAML加载
+
+            watchers:
+              login_reward:
+                when: {image: popups/reward_close.png}
+                do: [tap_match]
+              disconnected:
+                when: {image: popups/disconnected.png}
+                do: [{tap: [960, 700]}]
+                abort: true
+                priority: 10
+
+        Returns:
+            加载的数量
+        """
+        with open(Path(file_path), 'r', encoding='utf-8') as f:
+            data = yaml.safe_load(f) or {}
+        specs = data.get("watchers", data)
+        for name, spec in specs.items():
+            self.add(Watcher.parse(name, spec))
+        logger.info(f"Loaded {len(specs)} watchers from {file_path}")
+        return len(specs)
+
+    def check(self, game: 'Game', screen) -> bool:
+        """
+        在一帧上检查监视器，命中第一个即处理
+
+        Args:
+            game: 游戏控制器
+            screen: 任务刚取到的帧
+
+        Returns:
+            是否处理了中断（画面已变化，需要重新取帧）
+
+        Raises:
+            TaskInterrupted: 命中的监视器要求终止任务
+        """
+        if not self._watchers or self.busy:
+            return False
+
+        self._frames += 1
+        now = time.time()
+        for watcher in self._watchers:
+            if not watcher.enabled or self._frames % watcher.every:
+                continue
+            if now - watcher.last_fired < watcher.cooldown:
+                continue
+
+            match = watcher.when.check(game, screen)
+            if match is None:
+                continue
+
+            self._handle(game, watcher, match)
+            return True
+        return False
+
+    def _handle(self, game: 'Game', watcher: Watcher, match: Any) -> None:
+        logger.info(f"Interrupt: {watcher.name}")
+        self._local.busy = True
+        try:
+            for action in watcher.actions:
+                if not action.run(game, match):
+                    logger.warning(f"Watcher {watcher.name}: action {action.kind} failed")
+                    break
+        finally:
+            self._local.busy = False
+            watcher.fired += 1
+            watcher.last_fired = self.last_handled = time.time()
+
+        event_bus.emit(self.EVENT, {
+            'watcher': watcher.name,
+            'device': game.device_id,
+            'abort': watcher.abort,
+        })
+        if watcher.abort:
+            raise TaskInterrupted(watcher.name)
@@ -2,12 +2,60 @@
 工具函数 - 只保留必要的
 """
 
+from __future__ import annotations
+
+import sys
 import time
 import functools
-from typing import Any, Callable, Optional
+import importlib
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Hashable, Iterator, List, Optional, Tuple
 from loguru import logger
 
 
+class LazyModule:
+    """延迟导入的模块代理，首次访问属性时才真正导入"""
+    
+    def __init__(self, name: str):
+        self.__dict__['_name'] = name
+        self.__dict__['_module'] = None
+    
+    def _load(self):
+        module = self.__dict__['_module']
+        if module is None:
+            module = importlib.import_module(self.__dict__['_name'])
+            self.__dict__['_module'] = module
+        return module
+    
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self._load(), attr)
+    
+    def __repr__(self) -> str:
+        return f"<lazy module '{self.__dict__['_name']}'>"
+
+
+def lazy_import(name: str) -> Any:
+    """
+    延迟导入模块
+    
+    cv2/numpy/PIL等重量级模块在真正使用时才加载，缩短启动时间。
+    
+    Args:
+        name: 模块名，如 'cv2'、'PIL.Image'
+        
+    Returns:
+        已导入的模块或延迟代理
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    return LazyModule(name)
+
+
+np = lazy_import("numpy")
+
+
 def retry(times: int = 3, delay: float = 1.0):
     """
     简单的重试装饰器
@@ -53,28 +101,367 @@ def timer(name: str = None):
     return decorator
 
 
-class SimpleCache:
-    """简单的内存缓存"""
+_MISSING = object()
+
+
+class LRUCache:
+    """
+    线程安全的LRU缓存
+
+    支持按条目数和按字节数限制容量（ndarray按nbytes计算）、可选TTL，
+    并统计命中/未命中/淘汰次数。
+    """
     
-    def __init__(self, max_size: int = 100):
-        self._cache = {}
+    def __init__(self, max_size: int = 100,
+                 max_bytes: Optional[int] = None,
+                 ttl: Optional[float] = None):
+        """
+        初始化
+        
+        Args:
+            max_size: 最大条目数
+            max_bytes: 最大字节数，None表示不限制
+            ttl: 默认过期时间（秒），None表示不过期
+        """
+        self._cache: OrderedDict = OrderedDict()  # key -> (value, size, expires_at)
         self._max_size = max_size
+        self._max_bytes = max_bytes
+        self._ttl = ttl
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
     
-    def get(self, key: str) -> Optional[Any]:
-        """获取缓存值"""
-        return self._cache.get(key)
+    def __len__(self) -> int:
+        return len(self._cache)
     
-    def set(self, key: str, value: Any) -> None:
-        """设置缓存值"""
-        if len(self._cache) >= self._max_size:
-            # 删除最早的项
-            first_key = next(iter(self._cache))
-            del self._cache[first_key]
-        self._cache[key] = value
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            entry = self._cache.get(key)
+            return entry is not None and (entry[2] is None or entry[2] > time.monotonic())
+    
+    @property
+    def size_bytes(self) -> int:
+        """当前占用字节数"""
+        return self._bytes
+    
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """获取缓存值，命中时移到最近使用位置"""
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            
+            value, _, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return default
+            
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return value
+    
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """
+        设置缓存值
+        
+        Args:
+            key: 键
+            value: 值
+            ttl: 过期时间（秒），None时使用默认值
+        """
+        size = _sizeof(value)
+        ttl = self._ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        
+        with self._lock:
+            if key in self._cache:
+                self._remove(key)
+            
+            # 单个值超过容量时不缓存
+            if self._max_bytes is not None and size > self._max_bytes:
+                return
+            
+            self._cache[key] = (value, size, expires_at)
+            self._bytes += size
+            
+            while (len(self._cache) > self._max_size or
+                   (self._max_bytes is not None and self._bytes > self._max_bytes)):
+                oldest = next(iter(self._cache))
+                self._remove(oldest)
+                self.evictions += 1
+    
+    def delete(self, key: Hashable) -> None:
+        """删除缓存值"""
+        with self._lock:
+            if key in self._cache:
+                self._remove(key)
     
     def clear(self) -> None:
         """清空缓存"""
-        self._cache.clear()
+        with self._lock:
+            self._cache.clear()
+            self._bytes = 0
+    
+    def stats(self) -> Dict[str, int]:
+        """获取统计信息"""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._cache),
+                'bytes': self._bytes,
+            }
+    
+    def export(self, monitor, name: str) -> None:
+        """
+        导出统计信息到Monitor
+        
+        Args:
+            monitor: Monitor实例
+            name: 指标前缀
+        """
+        for key, value in self.stats().items():
+            monitor.set_count(f"{name}.{key}", value)
+    
+    def _remove(self, key: Hashable) -> None:
+        _, size, _ = self._cache.pop(key)
+        self._bytes -= size
+
+
+# 兼容旧名称
+SimpleCache = LRUCache
+
+
+def _sizeof(value: Any) -> int:
+    """估算值的字节数，ndarray使用nbytes"""
+    nbytes = getattr(value, 'nbytes', None)
+    if isinstance(nbytes, int):
+        return nbytes
+    return sys.getsizeof(value)
+
+
+def memoize(cache: Optional[LRUCache] = None, key: Optional[Callable] = None, **cache_options):
+    """
+    基于LRUCache的记忆化装饰器
+    
+    Args:
+        cache: 使用的缓存实例，None时新建
+        key: 由参数生成缓存键的函数，默认使用(args, kwargs)
+        **cache_options: 新建缓存时的参数（max_size/max_bytes/ttl）
+    
+    Usage:
+        @memoize(max_bytes=64 * 1024 * 1024)
+        def load_template(path): ...
+        
+        load_template.cache.stats()
+    """
+    def decorator(func: Callable) -> Callable:
+        store = cache if cache is not None else LRUCache(**cache_options)
+        
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            cache_key = key(*args, **kwargs) if key else (args, tuple(sorted(kwargs.items())))
+            try:
+                value = store.get(cache_key, _MISSING)
+            except TypeError:
+                # 不可哈希的参数直接调用
+                return func(*args, **kwargs)
+            
+            if value is _MISSING:
+                value = func(*args, **kwargs)
+                store.set(cache_key, value)
+            return value
+        
+        wrapper.cache = store
+        return wrapper
+    return decorator
+
+
+def _refcount(buffers: List[Any], index: int) -> int:
+    """列表中对象的Python引用计数（仅用于调试检查）"""
+    return sys.getrefcount(buffers[index])
+
+
+class FramePool:
+    """
+    帧缓冲池（每台设备一个）
+
+    缓冲区按形状复用，所有权显式管理：acquire()/adopt()之后调用方持有一份引用，
+    交给其他持有者时retain()，每个持有者用完后release()，计数归零才回到池中
+    （也可以用lease()上下文管理器）。池满且没有空闲缓冲时临时分配，不阻塞调用方；
+    临时分配的数组不在池中，retain()/release()对其无效。debug为True时，复用前检查
+    缓冲区是否仍被Python对象引用（release()过早），依赖解释器的引用计数，只用于调试。
+    """
+    
+    _IDLE_REFS: Optional[int] = None
+    
+    def __init__(self, capacity: int = 4, debug: bool = False):
+        """
+        初始化
+        
+        Args:
+            capacity: 池中最多保留的缓冲区数
+            debug: 复用缓冲区前断言其已没有外部引用
+        """
+        if debug and FramePool._IDLE_REFS is None:
+            FramePool._IDLE_REFS = _refcount([object()], 0)
+        self.capacity = capacity
+        self.debug = debug
+        self._buffers: Dict[Tuple, List[Any]] = {}
+        self._owners: Dict[int, int] = {}  # 使用中的池内缓冲：id -> 持有者数
+        self._lock = threading.Lock()
+        self.reused = 0
+        self.allocated = 0
+    
+    def __len__(self) -> int:
+        return sum(len(buffers) for buffers in self._buffers.values())
+    
+    def acquire(self, shape: Tuple[int, ...], dtype: str = "uint8") -> np.ndarray:
+        """
+        获取一块空闲缓冲区（内容未初始化）
+        
+        Args:
+            shape: 形状
+            dtype: 数据类型
+            
+        Returns:
+            数组，调用方持有，用完后release()
+        """
+        key = (tuple(shape), dtype)
+        with self._lock:
+            buffers = self._buffers.setdefault(key, [])
+            index = self._first_idle(buffers)
+            if index is not None:
+                array = buffers[index]
+                self._owners[id(array)] = 1
+                self.reused += 1
+                return array
+            
+            array = np.empty(shape, dtype)
+            self.allocated += 1
+            if len(self) < self.capacity or self._evict_idle(key):
+                buffers.append(array)
+                self._owners[id(array)] = 1
+            return array
+    
+    @contextmanager
+    def lease(self, shape: Tuple[int, ...], dtype: str = "uint8") -> Iterator[np.ndarray]:
+        """acquire()一块缓冲区，退出时release()"""
+        array = self.acquire(shape, dtype)
+        try:
+            yield array
+        finally:
+            self.release(array)
+    
+    def adopt(self, array: np.ndarray) -> None:
+        """
+        把池外分配的数组（如分辨率变化后解码器新分配的帧）纳入池中
+        
+        调用方持有该数组，用完后release()；池已满时不纳入。
+        """
+        key = (array.shape, array.dtype.name)
+        with self._lock:
+            buffers = self._buffers.setdefault(key, [])
+            if any(b is array for b in buffers):
+                return
+            if len(self) < self.capacity or self._evict_idle(key):
+                buffers.append(array)
+                self._owners[id(array)] = 1
+    
+    def retain(self, array: np.ndarray) -> bool:
+        """
+        增加一个持有者
+        
+        Returns:
+            数组是否为池中使用中的缓冲
+        """
+        with self._lock:
+            if id(array) not in self._owners:
+                return False
+            self._owners[id(array)] += 1
+            return True
+    
+    def release(self, array: np.ndarray) -> bool:
+        """
+        释放一个持有者，全部释放后缓冲区回到池中
+        
+        Returns:
+            数组是否为池中使用中的缓冲
+        """
+        with self._lock:
+            count = self._owners.get(id(array))
+            if count is None:
+                return False
+            if count > 1:
+                self._owners[id(array)] = count - 1
+            else:
+                del self._owners[id(array)]
+            return True
+    
+    def _first_idle(self, buffers: List[Any]) -> Optional[int]:
+        """第一块没有持有者的缓冲区下标"""
+        for index in range(len(buffers)):
+            if id(buffers[index]) not in self._owners:
+                if self.debug:
+                    assert _refcount(buffers, index) <= self._IDLE_REFS, \
+                        f"Frame buffer {buffers[index].shape} released while still referenced"
+                return index
+        return None
+    
+    def _evict_idle(self, keep: Tuple) -> bool:
+        """池满时丢弃一块其他形状的空闲缓冲（旋转后的旧尺寸、不再使用的裁剪尺寸）"""
+        for key, buffers in self._buffers.items():
+            if key == keep:
+                continue
+            index = self._first_idle(buffers)
+            if index is not None:
+                del buffers[index]
+                return True
+        return False
+    
+    def clear(self) -> None:
+        """清空（仍被持有的数组不受影响，之后的release()无效）"""
+        with self._lock:
+            self._buffers.clear()
+            self._owners.clear()
+    
+    def stats(self) -> Dict[str, int]:
+        """获取统计信息"""
+        with self._lock:
+            return {
+                'buffers': len(self),
+                'bytes': sum(a.nbytes for buffers in self._buffers.values() for a in buffers),
+                'reused': self.reused,
+                'allocated': self.allocated,
+            }
+
+
+_scratch = threading.local()
+
+
+def scratch_buffer(name: str, shape: Tuple[int, ...], dtype: str = "uint8") -> np.ndarray:
+    """
+    线程内复用的临时数组，供cv2的dst参数使用
+    
+    同名缓冲在形状不变时反复复用，内容只在本次调用内有效，不能返回给调用方。
+    
+    Args:
+        name: 用途名称
+        shape: 形状
+        dtype: 数据类型
+    """
+    buffers = getattr(_scratch, "buffers", None)
+    if buffers is None:
+        buffers = _scratch.buffers = {}
+    array = buffers.get(name)
+    if array is None or array.shape != tuple(shape) or array.dtype != dtype:
+        array = buffers[name] = np.empty(shape, dtype)
+    return array
 
 
 def normalize_coordinate(x: int, y: int, 
@@ -96,6 +483,24 @@ def normalize_coordinate(x: int, y: int,
     return new_x, new_y
 
 
+def uniform_scale(source_width: int, source_height: int,
+                  target_width: int, target_height: int) -> float:
+    """
+    等比缩放系数（用于模板等图像尺寸）
+    
+    宽高比不同时取两个方向中较小的比例，图像不会被拉伸；
+    坐标和区域仍用normalize_coordinate按各轴分别换算。
+    
+    Args:
+        source_width, source_height: 源分辨率
+        target_width, target_height: 目标分辨率
+        
+    Returns:
+        缩放系数
+    """
+    return min(target_width / source_width, target_height / source_height)
+
+
 def wait(seconds: float, message: str = None) -> None:
     """
     等待
@@ -0,0 +1,18 @@
+"""
+视觉模块 - 模板管理与图像识别
+"""
+
+from .template import TemplateLibrary, match_template, match_all
+from .pack import TemplatePack, build_pack
+from .color import ColorPoint, ColorSignature, load_signatures
+from .scene import SceneIndex, BKTree, dhash
+from .dirty import FrameDiffer, IncrementalMatcher, MISS
+from .worker_pool import VisionPool, FrameSlot
+
+__all__ = [
+    'TemplateLibrary', 'match_template', 'match_all', 'TemplatePack', 'build_pack',
+    'ColorPoint', 'ColorSignature', 'load_signatures',
+    'SceneIndex', 'BKTree', 'dhash',
+    'FrameDiffer', 'IncrementalMatcher', 'MISS',
+    'VisionPool', 'FrameSlot',
+]
@@ -0,0 +1,209 @@
+"""
+多点取色 - 基于少量像素颜色的快速界面检测
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from loguru import logger
+
+from core.utils import normalize_coordinate, lazy_import
+
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
+yaml = lazy_import("yaml")
+
+
+@dataclass
+class ColorPoint:
+    """取色点"""
+    x: int
+    y: int
+    color: Tuple[int, int, int]  # BGR
+    tolerance: int = 10
+
+    @classmethod
+    def parse(cls, data: Any) -> 'ColorPoint':
+        """
+        从配置解析
+
+        支持 [x, y, [b, g, r], tolerance] 或 {x, y, color, tolerance} 两种写法
+        """
+        if isinstance(data, dict):
+            return cls(int(data['x']), int(data['y']),
+                       tuple(int(c) for c in data['color']),
+                       int(data.get('tolerance', 10)))
+
+        x, y, color = data[0], data[1], data[2]
+        tolerance = data[3] if len(data) > 3 else 10
+        return cls(int(x), int(y), tuple(int(c) for c in color), int(tolerance))
+
+
+class ColorSignature:
+    """
+    多点颜色特征
+
+    check() 在已知位置上比较各点颜色；find() 把第一个点当作锚点，
+    其余点按相对偏移在整张图上搜索该颜色图案。
+    """
+
+    def __init__(self, name: str, points: List[ColorPoint],
+                 reference_resolution: Optional[Tuple[int, int]] = None):
+        """
+        初始化
+
+        Args:
+            name: 特征名称
+            points: 取色点列表
+            reference_resolution: 取色时的分辨率(width, height)
+        """
+        if not points:
+            raise ValueError(f"Color signature '{name}' has no points")
+
+        self.name = name
+        self.points = points
+        self.reference_resolution = tuple(reference_resolution) if reference_resolution else None
+
+        self._xs = np.array([p.x for p in points], dtype=np.intp)
+        self._ys = np.array([p.y for p in points], dtype=np.intp)
+        self._colors = np.array([p.color for p in points], dtype=np.int16)
+        self._tolerances = np.array([p.tolerance for p in points], dtype=np.int16)
+        self._scaled: Dict[Tuple[int, int], 'ColorSignature'] = {}
+
+    def scaled(self, screen_size: Tuple[int, int]) -> 'ColorSignature':
+        """
+        获取适配目标分辨率的特征
+
+        Args:
+            screen_size: 设备分辨率(width, height)
+        """
+        reference = self.reference_resolution
+        if reference is None or reference == tuple(screen_size):
+            return self
+
+        key = tuple(screen_size)
+        if key not in self._scaled:
+            points = []
+            for p in self.points:
+                x, y = normalize_coordinate(p.x, p.y, reference[0], reference[1],
+                                            screen_size[0], screen_size[1])
+                points.append(ColorPoint(x, y, p.color, p.tolerance))
+            self._scaled[key] = ColorSignature(self.name, points, key)
+        return self._scaled[key]
+
+    def check(self, screen: np.ndarray) -> bool:
+        """
+        检查所有点颜色是否匹配
+
+        Args:
+            screen: BGR截图
+
+        Returns:
+            是否匹配
+        """
+        h, w = screen.shape[:2]
+        if self._xs.max() >= w or self._ys.max() >= h:
+            return False
+
+        pixels = screen[self._ys, self._xs].astype(np.int16)
+        diff = np.abs(pixels - self._colors).max(axis=1)
+        return bool(np.all(diff <= self._tolerances))
+
+    def find(self, screen: np.ndarray,
+             region: Optional[Tuple[int, int, int, int]] = None) -> Optional[Tuple[int, int]]:
+        """
+        按相对偏移搜索颜色图案
+
+        Args:
+            screen: BGR截图
+            region: 搜索区域(x, y, width, height)，None为全屏
+
+        Returns:
+            锚点（第一个点）坐标或None
+        """
+        h, w = screen.shape[:2]
+        rx, ry, rw, rh = region if region else (0, 0, w, h)
+        area = screen[ry:ry + rh, rx:rx + rw]
+        if area.size == 0:
+            return None
+
+        # 锚点颜色用inRange一次筛出所有候选
+        anchor = self._colors[0]
+        tolerance = self._tolerances[0]
+        lower = np.clip(anchor - tolerance, 0, 255).astype(np.uint8)
+        upper = np.clip(anchor + tolerance, 0, 255).astype(np.uint8)
+        cand_y, cand_x = np.nonzero(cv2.inRange(area, lower, upper))
+        if cand_x.size == 0:
+            return None
+        cand_x = cand_x + rx
+        cand_y = cand_y + ry
+
+        # 逐个点过滤候选（每个点对所有候选一次向量化比较）
+        dxs = self._xs - self._xs[0]
+        dys = self._ys - self._ys[0]
+        for i in range(1, len(self.points)):
+            px = cand_x + dxs[i]
+            py = cand_y + dys[i]
+            inside = (px >= 0) & (px < w) & (py >= 0) & (py < h)
+            cand_x, cand_y, px, py = cand_x[inside], cand_y[inside], px[inside], py[inside]
+
+            pixels = screen[py, px].astype(np.int16)
+            ok = np.abs(pixels - self._colors[i]).max(axis=1) <= self._tolerances[i]
+            cand_x, cand_y = cand_x[ok], cand_y[ok]
+            if cand_x.size == 0:
+                return None
+
+        return int(cand_x[0]), int(cand_y[0])
+
+
+def load_signatures(file_path: str) -> Dict[str, ColorSignature]:
+    """
+    从YAML加载颜色特征
+
+    格式：
+        reference_resolution: [1920, 1080]
+        signatures:
+          main_menu:
+            - [100, 200, [255, 255, 255], 10]
+            - {x: 300, y: 40, color: [0, 0, 255], tolerance: 8}
+
+    Args:
+        file_path: YAML文件路径
+
+    Returns:
+        名称到特征的映射
+    """
+    path = Path(file_path)
+    if not path.exists():
+        logger.error(f"Color signature file not found: {path}")
+        return {}
+
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = yaml.safe_load(f) or {}
+    except Exception as e:
+        logger.error(f"Failed to load color signatures: {e}")
+        return {}
+
+    reference = data.get('reference_resolution')
+    signatures = {}
+    for name, entry in (data.get('signatures') or {}).items():
+        # 单个特征可以覆盖参考分辨率
+        if isinstance(entry, dict):
+            points = entry.get('points', [])
+            entry_reference = entry.get('reference_resolution', reference)
+        else:
+            points = entry
+            entry_reference = reference
+
+        try:
+            signatures[name] = ColorSignature(
+                name, [ColorPoint.parse(p) for p in points], entry_reference
+            )
+        except Exception as e:
+            logger.error(f"Invalid color signature '{name}': {e}")
+
+    logger.info(f"Loaded {len(signatures)} color signatures from {path}")
+    return signatures
@@ -0,0 +1,181 @@
+"""
+脏区域跟踪 - 按图块比较相邻帧，使识别增量化
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, Hashable, Optional, Tuple
+from loguru import logger
+
+from core.utils import lazy_import, scratch_buffer
+
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
+
+
+# 查询结果不可复用时返回的标记
+MISS = object()
+
+Box = Tuple[int, int, int, int]  # (x, y, width, height)
+
+
+class FrameDiffer:
+    """
+    帧差分器
+
+    把帧划分为固定大小的图块，与上一帧做一次向量化比较，记录每个图块最后一次变化时的代数。
+    """
+
+    def __init__(self, tile_size: int = 32, threshold: int = 12):
+        """
+        初始化
+
+        Args:
+            tile_size: 图块边长（像素）
+            threshold: 像素通道差超过该值视为变化
+        """
+        self.tile_size = tile_size
+        self.threshold = threshold
+        self.generation = 0
+        self._previous: Optional[np.ndarray] = None
+        self._changed_at: Optional[np.ndarray] = None  # 每个图块最后变化的代数
+        self._rows: Optional[np.ndarray] = None
+        self._cols: Optional[np.ndarray] = None
+
+    def update(self, frame: np.ndarray) -> np.ndarray:
+        """
+        输入新帧
+
+        Args:
+            frame: BGR图像
+
+        Returns:
+            本帧变化的图块掩码(rows, cols)
+        """
+        h, w = frame.shape[:2]
+        self.generation += 1
+
+        if self._previous is None or self._previous.shape != frame.shape:
+            # 首帧或分辨率变化：全部视为脏
+            self._rows = np.arange(0, h, self.tile_size)
+            self._cols = np.arange(0, w, self.tile_size)
+            self._previous = frame.copy()
+            self._changed_at = np.full((len(self._rows), len(self._cols)), self.generation, np.int64)
+            return np.ones(self._changed_at.shape, bool)
+
+        # 差值图只在本次使用，写入线程内复用的缓冲，避免每帧分配整帧大小的数组
+        diff = cv2.absdiff(frame, self._previous, dst=scratch_buffer("tile_diff", frame.shape, frame.dtype))
+        if diff.ndim == 3:
+            diff = np.max(diff, axis=2, out=scratch_buffer("tile_diff_max", frame.shape[:2], frame.dtype))
+
+        # 用reduceat按图块取最大差值，边缘不完整的图块同样处理
+        tile_max = np.maximum.reduceat(np.maximum.reduceat(diff, self._rows, axis=0), self._cols, axis=1)
+        dirty = tile_max > self.threshold
+        self._changed_at[dirty] = self.generation
+
+        np.copyto(self._previous, frame)
+        return dirty
+
+    def changed_since(self, generation: int, box: Optional[Box] = None) -> bool:
+        """
+        区域在指定代数之后是否变化过
+
+        Args:
+            generation: 代数
+            box: 区域(x, y, width, height)，None为全屏
+        """
+        if self._changed_at is None:
+            return True
+
+        if box is None:
+            tiles = self._changed_at
+        else:
+            x, y, w, h = box
+            ts = self.tile_size
+            tiles = self._changed_at[max(0, y // ts):(y + h - 1) // ts + 1,
+                                     max(0, x // ts):(x + w - 1) // ts + 1]
+        return tiles.size == 0 or int(tiles.max()) > generation
+
+    def dirty_ratio(self, mask: np.ndarray) -> float:
+        """变化图块比例"""
+        return float(mask.mean()) if mask.size else 1.0
+
+    def reset(self) -> None:
+        """重置状态"""
+        self._previous = None
+        self._changed_at = None
+
+
+class IncrementalMatcher:
+    """
+    增量匹配结果缓存
+
+    - 上次找到：匹配框内图块未变化时，原结果仍然成立，直接复用
+    - 上次未找到：整个搜索区域都未变化时才复用
+    """
+
+    def __init__(self, tile_size: int = 32, threshold: int = 12):
+        self.differ = FrameDiffer(tile_size, threshold)
+        self._frame: Optional[np.ndarray] = None
+        self._results: Dict[Hashable, Tuple[int, Any, Optional[Box], Optional[Box]]] = {}
+        self.reused = 0
+        self.computed = 0
+
+    def observe(self, frame: np.ndarray) -> None:
+        """输入帧（同一帧重复输入会被忽略）"""
+        if frame is self._frame:
+            return
+        self._frame = frame
+        mask = self.differ.update(frame)
+        logger.opt(lazy=True).trace("Frame {}: {:.1%} tiles dirty",
+                                    lambda: self.differ.generation, lambda: self.differ.dirty_ratio(mask))
+
+    def invalidate_frame(self) -> None:
+        """上一帧的缓冲区可能已被复用：下次observe()即使是同一数组也重新比较"""
+        self._frame = None
+
+    def lookup(self, key: Hashable, region: Optional[Box] = None) -> Any:
+        """
+        查询可复用的结果
+
+        Args:
+            key: 结果键（如模板路径和阈值）
+            region: 搜索区域
+
+        Returns:
+            上次的结果，不可复用时返回MISS
+        """
+        entry = self._results.get(key)
+        if entry is None:
+            return MISS
+
+        generation, result, match_box, search_region = entry
+        if search_region != region:
+            return MISS
+
+        check_box = match_box if result is not None else region
+        if self.differ.changed_since(generation, check_box):
+            return MISS
+
+        self.reused += 1
+        return result
+
+    def store(self, key: Hashable, result: Any,
+              match_box: Optional[Box] = None, region: Optional[Box] = None) -> None:
+        """
+        保存结果
+
+        Args:
+            key: 结果键
+            result: 匹配结果（None表示未找到）
+            match_box: 找到时的匹配框
+            region: 搜索区域
+        """
+        self.computed += 1
+        self._results[key] = (self.differ.generation, result, match_box, region)
+
+    def clear(self) -> None:
+        """清空"""
+        self.differ.reset()
+        self._results.clear()
+        self._frame = None
@@ -0,0 +1,254 @@
+"""
+模板包 - 把模板目录预编译为单个文件，通过内存映射加载
+"""
+
+from __future__ import annotations
+
+import json
+import struct
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from loguru import logger
+
+from core.utils import lazy_import
+
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
+yaml = lazy_import("yaml")
+
+
+MAGIC = b"SPSTPK01"
+ALIGNMENT = 64
+IMAGE_SUFFIXES = {".png", ".jpg", ".jpeg", ".bmp"}
+SET_FILE = "templates.yaml"
+
+
+class TemplatePack:
+    """
+    模板包（只读，内存映射）
+
+    文件布局：MAGIC | 头长度(uint64) | JSON头 | 按64字节对齐的数组数据。
+    每个模板保存BGR原图、可选的透明度掩码（匹配时忽略透明像素）、粗匹配用的金字塔、
+    参考分辨率和搜索区域。打开时只解析头部，数组是映射到文件的只读视图，
+    多个进程打开同一个包时共享操作系统页缓存。
+    """
+
+    def __init__(self, path: str):
+        """
+        打开模板包
+
+        Args:
+            path: 包文件路径
+        """
+        self.path = Path(path)
+        self._map = np.memmap(self.path, dtype=np.uint8, mode='r')
+        if bytes(self._map[:len(MAGIC)]) != MAGIC:
+            raise ValueError(f"Not a template pack: {path}")
+
+        (header_len,) = struct.unpack_from("<Q", self._map, len(MAGIC))
+        start = len(MAGIC) + 8
+        header = json.loads(bytes(self._map[start:start + header_len]).decode("utf-8"))
+        self.entries: Dict[str, Dict[str, Any]] = header["entries"]
+        self.data_offset: int = header["data_offset"]
+        logger.info(f"Template pack opened: {self.path} ({len(self.entries)} templates)")
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.entries
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def names(self) -> List[str]:
+        """包内模板名称（相对模板根目录的路径）"""
+        return list(self.entries)
+
+    def _array(self, spec: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+        if spec is None:
+            return None
+        dtype = np.dtype(spec["dtype"])
+        count = int(np.prod(spec["shape"]))
+        offset = self.data_offset + spec["offset"]
+        return np.frombuffer(self._map, dtype, count, offset).reshape(spec["shape"])
+
+    def image(self, name: str) -> Optional[np.ndarray]:
+        """BGR原图"""
+        entry = self.entries.get(name)
+        return self._array(entry["bgr"]) if entry else None
+
+    def mask(self, name: str) -> Optional[np.ndarray]:
+        """透明度掩码（模板PNG带alpha通道时存在）"""
+        entry = self.entries.get(name)
+        return self._array(entry.get("mask")) if entry else None
+
+    def pyramid(self, name: str, scale: float) -> Optional[np.ndarray]:
+        """预先缩小的BGR图（粗匹配用），没有该比例时返回None"""
+        entry = self.entries.get(name)
+        if not entry:
+            return None
+        for level in entry["pyramid"]:
+            if abs(level["scale"] - scale) < 1e-6:
+                return self._array(level)
+        return None
+
+    def reference(self, name: str) -> Optional[Tuple[int, int]]:
+        """参考分辨率"""
+        entry = self.entries.get(name)
+        reference = entry.get("reference") if entry else None
+        return tuple(reference) if reference else None
+
+    def region(self, name: str) -> Optional[Tuple[int, int, int, int]]:
+        """搜索区域（参考分辨率下的坐标）"""
+        entry = self.entries.get(name)
+        region = entry.get("region") if entry else None
+        return tuple(region) if region else None
+
+    def close(self) -> None:
+        """释放映射（之前返回的数组仍然持有映射，直到被回收）"""
+        self._map = None
+
+
+def split_alpha(image: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    把IMREAD_UNCHANGED读出的图像拆成BGR图和透明度掩码
+
+    Returns:
+        (BGR图, 掩码)，不透明或没有alpha通道时掩码为None
+    """
+    mask = None
+    if image.ndim == 2:
+        image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+    elif image.shape[2] == 4:
+        alpha = image[:, :, 3]
+        if alpha.min() < 255:
+            mask = np.where(alpha > 0, 255, 0).astype(np.uint8)
+        image = cv2.cvtColor(image, cv2.COLOR_BGRA2BGR)
+    return image, mask
+
+
+def _read_set_file(directory: Path, inherited: Dict[str, Any]) -> Dict[str, Any]:
+    """读取目录的templates.yaml（参考分辨率与各模板的搜索区域）"""
+    settings = {"reference_resolution": inherited.get("reference_resolution"), "regions": {}}
+    set_file = directory / SET_FILE
+    if set_file.exists():
+        with open(set_file, 'r', encoding='utf-8') as f:
+            data = yaml.safe_load(f) or {}
+        if data.get("reference_resolution"):
+            settings["reference_resolution"] = list(data["reference_resolution"])
+        settings["regions"] = data.get("regions") or {}
+    return settings
+
+
+def _iter_templates(root: Path, default_reference: Optional[Tuple[int, int]]
+                    ) -> Iterator[Tuple[str, Path, Optional[List[int]], Optional[List[int]]]]:
+    settings_by_dir: Dict[Path, Dict[str, Any]] = {}
+    default = {"reference_resolution": list(default_reference) if default_reference else None}
+    for path in sorted(root.rglob("*")):
+        if path.suffix.lower() not in IMAGE_SUFFIXES or not path.is_file():
+            continue
+        directory = path.parent
+        if directory not in settings_by_dir:
+            settings_by_dir[directory] = _read_set_file(directory, default)
+        settings = settings_by_dir[directory]
+        region = settings["regions"].get(path.name)
+        yield (path.relative_to(root).as_posix(), path,
+               settings["reference_resolution"], list(region) if region else None)
+
+
+def build_pack(root: str, output: str,
+               reference_resolution: Optional[Tuple[int, int]] = None,
+               pyramid_scales: Tuple[float, ...] = (0.5, 0.25)) -> int:
+    """
+    把模板目录编译为模板包
+
+    Args:
+        root: 模板根目录
+        output: 输出文件
+        reference_resolution: 默认参考分辨率（目录的templates.yaml可以覆盖）
+        pyramid_scales: 预先生成的缩小比例
+
+    Returns:
+        打包的模板数
+    """
+    root_path = Path(root)
+    blobs: List[bytes] = []
+    entries: Dict[str, Dict[str, Any]] = {}
+    offset = 0
+
+    def add(array: np.ndarray, **extra) -> Dict[str, Any]:
+        nonlocal offset
+        array = np.ascontiguousarray(array)
+        padding = -offset % ALIGNMENT
+        if padding:
+            blobs.append(b"\0" * padding)
+            offset += padding
+        spec = {"offset": offset, "shape": list(array.shape), "dtype": array.dtype.str, **extra}
+        blobs.append(array.tobytes())
+        offset += array.nbytes
+        return spec
+
+    for name, path, reference, region in _iter_templates(root_path, reference_resolution):
+        image = cv2.imread(str(path), cv2.IMREAD_UNCHANGED)
+        if image is None:
+            logger.warning(f"Skipping unreadable template: {path}")
+            continue
+
+        image, mask = split_alpha(image)
+        h, w = image.shape[:2]
+        pyramid = []
+        for scale in pyramid_scales:
+            size = (max(1, round(w * scale)), max(1, round(h * scale)))
+            small = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+            pyramid.append(add(small, scale=scale))
+
+        entries[name] = {
+            "bgr": add(image),
+            "mask": add(mask) if mask is not None else None,
+            "pyramid": pyramid,
+            "reference": reference,
+            "region": region,
+        }
+
+    # 数据区起点依赖头部长度，先用占位值计算；多留32字节容纳data_offset数值本身变长
+    header = {"version": 1, "data_offset": 0, "entries": entries}
+    header_bytes = json.dumps(header, ensure_ascii=False).encode("utf-8")
+    data_offset = len(MAGIC) + 8 + len(header_bytes) + 32
+    data_offset += -data_offset % ALIGNMENT
+    header["data_offset"] = data_offset
+    header_bytes = json.dumps(header, ensure_ascii=False).encode("utf-8")
+
+    output_path = Path(output)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<Q", len(header_bytes)))
+        f.write(header_bytes)
+        f.write(b"\0" * (data_offset - f.tell()))
+        for blob in blobs:
+            f.write(blob)
+
+    logger.info(f"Template pack built: {output_path} ({len(entries)} templates, "
+                f"{(data_offset + offset) / 1024 / 1024:.1f} MB)")
+    return len(entries)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from core.config import config
+
+    parser = argparse.ArgumentParser(description="Compile a template directory into a memory-mapped pack")
+    parser.add_argument("root", help="template root directory")
+    parser.add_argument("-o", "--output", default="templates.pack")
+    parser.add_argument("--reference", type=int, nargs=2, metavar=("WIDTH", "HEIGHT"),
+                        help="default reference resolution (templates.yaml overrides per directory); "
+                             "defaults to templates.reference_resolution from --config")
+    parser.add_argument("--config", default="config.yaml", help="config file")
+    parser.add_argument("--scales", type=float, nargs="*", default=[0.5, 0.25],
+                        help="precomputed coarse-matching scales")
+    args = parser.parse_args()
+
+    reference = args.reference
+    if reference is None and config.load(args.config):
+        reference = config.get("templates.reference_resolution")
+    build_pack(args.root, args.output, tuple(reference) if reference else None,
+               tuple(args.scales))
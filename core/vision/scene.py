@@ -0,0 +1,233 @@
+"""
+场景识别 - 基于感知哈希的界面快速识别
+"""
+
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from loguru import logger
+
+from core.utils import lazy_import, scratch_buffer
+
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
+
+
+IMAGE_SUFFIXES = ('.png', '.jpg', '.jpeg', '.bmp')
+
+
+def dhash(image: np.ndarray, hash_size: int = 8) -> int:
+    """
+    计算差值哈希(dHash)
+
+    Args:
+        image: BGR或灰度图像
+        hash_size: 哈希边长，结果为hash_size*hash_size位
+
+    Returns:
+        哈希值
+    """
+    if image.ndim == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY, dst=scratch_buffer("dhash_gray", image.shape[:2]))
+    small = cv2.resize(image, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+def hamming(a: int, b: int) -> int:
+    """汉明距离"""
+    return (a ^ b).bit_count()
+
+
+class BKTree:
+    """
+    BK树 - 按汉明距离组织的度量树
+
+    节点以扁平列表存储：[hash, label, {distance: child_index}]，便于直接序列化。
+    """
+
+    def __init__(self):
+        self.nodes: List[list] = []
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def add(self, value: int, label: str) -> None:
+        """插入节点"""
+        if not self.nodes:
+            self.nodes.append([value, label, {}])
+            return
+
+        index = 0
+        while True:
+            node_value, _, children = self.nodes[index]
+            distance = hamming(value, node_value)
+            if distance in children:
+                index = children[distance]
+            else:
+                children[distance] = len(self.nodes)
+                self.nodes.append([value, label, {}])
+                return
+
+    def nearest(self, value: int, max_distance: int) -> Optional[Tuple[str, int]]:
+        """
+        查找最近节点
+
+        Args:
+            value: 查询哈希
+            max_distance: 最大距离
+
+        Returns:
+            (标签, 距离) 或 None
+        """
+        if not self.nodes:
+            return None
+
+        best: Optional[Tuple[str, int]] = None
+        limit = max_distance
+        stack = [0]
+        while stack:
+            node_value, label, children = self.nodes[stack.pop()]
+            distance = hamming(value, node_value)
+            if distance <= limit:
+                best = (label, distance)
+                limit = distance
+                if distance == 0:
+                    break
+
+            # 三角不等式剪枝
+            for child_distance, child in children.items():
+                if distance - limit <= child_distance <= distance + limit:
+                    stack.append(child)
+        return best
+
+
+class SceneIndex:
+    """
+    场景索引
+
+    用带标签的参考截图建立dHash的BK树，识别时一次哈希计算加一次树查询。
+    索引可以保存为JSON，启动时直接加载而不需要重新计算。
+    """
+
+    def __init__(self, hash_size: int = 8):
+        """
+        初始化
+
+        Args:
+            hash_size: 哈希边长
+        """
+        self.hash_size = hash_size
+        self._tree = BKTree()
+
+    def __len__(self) -> int:
+        return len(self._tree)
+
+    def add(self, label: str, image: np.ndarray) -> int:
+        """
+        添加参考截图
+
+        Args:
+            label: 场景名称
+            image: 参考截图
+
+        Returns:
+            哈希值
+        """
+        value = dhash(image, self.hash_size)
+        self._tree.add(value, label)
+        return value
+
+    def add_directory(self, directory: str) -> int:
+        """
+        批量添加参考截图
+
+        子目录名作为场景名（同一场景可放多张截图），根目录下的图片以文件名为场景名。
+
+        Args:
+            directory: 截图目录
+
+        Returns:
+            添加数量
+        """
+        root = Path(directory)
+        count = 0
+        for path in sorted(root.rglob('*')):
+            if path.suffix.lower() not in IMAGE_SUFFIXES:
+                continue
+
+            image = cv2.imread(str(path))
+            if image is None:
+                logger.warning(f"Failed to read scene image: {path}")
+                continue
+
+            label = path.stem if path.parent == root else path.parent.relative_to(root).as_posix()
+            self.add(label, image)
+            count += 1
+
+        logger.info(f"Added {count} scene images from {root}")
+        return count
+
+    def identify(self, image: np.ndarray,
+                 max_distance: int = 10) -> Optional[Tuple[str, int]]:
+        """
+        识别场景
+
+        Args:
+            image: 截图
+            max_distance: 允许的最大汉明距离
+
+        Returns:
+            (场景名称, 距离) 或 None
+        """
+        return self._tree.nearest(dhash(image, self.hash_size), max_distance)
+
+    def save(self, file_path: str) -> bool:
+        """保存索引"""
+        data = {
+            'hash_size': self.hash_size,
+            'nodes': [[value, label, {str(d): c for d, c in children.items()}]
+                      for value, label, children in self._tree.nodes],
+        }
+        try:
+            path = Path(file_path)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            logger.info(f"Scene index saved to {path} ({len(self)} entries)")
+            return True
+        except Exception as e:
+            logger.error(f"Failed to save scene index: {e}")
+            return False
+
+    @classmethod
+    def load(cls, file_path: str) -> Optional['SceneIndex']:
+        """加载索引"""
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception as e:
+            logger.error(f"Failed to load scene index: {e}")
+            return None
+
+        index = cls(data.get('hash_size', 8))
+        index._tree.nodes = [[value, label, {int(d): c for d, c in children.items()}]
+                             for value, label, children in data.get('nodes', [])]
+        logger.info(f"Scene index loaded from {file_path} ({len(index)} entries)")
+        return index
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build scene index from reference screenshots")
+    parser.add_argument("directory", help="reference screenshot directory")
+    parser.add_argument("output", help="output index file")
+    parser.add_argument("--hash-size", type=int, default=8)
+    args = parser.parse_args()
+
+    scene_index = SceneIndex(args.hash_size)
+    scene_index.add_directory(args.directory)
+    scene_index.save(args.output)
@@ -0,0 +1,408 @@
+"""
+模板管理 - 分辨率无关的模板加载与匹配
+"""
+
+from __future__ import annotations
+
+import math
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from loguru import logger
+
+from core.utils import LRUCache, normalize_coordinate, uniform_scale, lazy_import, scratch_buffer
+from .pack import TemplatePack, split_alpha
+
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
+yaml = lazy_import("yaml")
+
+
+# 粗匹配阶段的阈值放宽量，避免缩小后分数下降导致漏检
+COARSE_MARGIN = 0.15
+# 缩小后模板的最小边长，过小时粗匹配不可靠，直接全分辨率匹配
+MIN_COARSE_SIZE = 8
+
+
+class TemplateLibrary:
+    """
+    模板库
+
+    每个模板目录可以放一个 templates.yaml 声明该组模板的制作分辨率：
+
+        reference_resolution: [1280, 720]
+
+    还可以为模板声明搜索区域（参考分辨率下的 [x, y, width, height]）：
+
+        regions:
+          start_button.png: [800, 900, 320, 120]
+
+    没有声明的目录使用库的默认参考分辨率。模板按设备分辨率缩放一次后缓存，
+    相同分辨率的设备共享缓存。指定模板包时优先从包中读取（见 core.vision.pack）。
+    带透明通道的PNG模板同时得到掩码（mask()），匹配时透明像素不参与计算。
+    """
+
+    SET_FILE = "templates.yaml"
+
+    def __init__(self, root: str = ".",
+                 reference_resolution: Optional[Tuple[int, int]] = None,
+                 cache_bytes: int = 256 * 1024 * 1024,
+                 pack: Optional[TemplatePack] = None):
+        """
+        初始化
+
+        Args:
+            root: 模板根目录，相对路径基于此目录解析
+            reference_resolution: 默认参考分辨率(width, height)，None表示不缩放
+            cache_bytes: 模板缓存容量（字节）
+            pack: 预编译的模板包，包内模板不再读取图片文件
+        """
+        self.root = Path(root)
+        self.reference_resolution = tuple(reference_resolution) if reference_resolution else None
+        self.cache = LRUCache(max_size=4096, max_bytes=cache_bytes)
+        self.pack = pack
+        self._sets: Dict[Path, Dict[str, Any]] = {}
+        self._pack_names: Dict[str, Optional[str]] = {}
+        self._regions: Dict[Tuple, Optional[Tuple[int, int, int, int]]] = {}
+        self._masks: Dict[str, Optional[np.ndarray]] = {}  # 图片文件模板的原始掩码
+
+    def resolve(self, template_path: str) -> Path:
+        """解析模板路径"""
+        path = Path(template_path)
+        if not path.is_absolute() and not path.exists():
+            path = self.root / path
+        return path
+
+    def pack_name(self, template_path: str) -> Optional[str]:
+        """模板在模板包中的名称，不在包中时返回None"""
+        if self.pack is None:
+            return None
+        if template_path in self._pack_names:
+            return self._pack_names[template_path]
+
+        name = Path(template_path).as_posix()
+        if name not in self.pack:
+            try:
+                name = self.resolve(template_path).resolve().relative_to(self.root.resolve()).as_posix()
+            except ValueError:
+                name = None
+            if name not in self.pack:
+                name = None
+        self._pack_names[template_path] = name
+        return name
+
+    def _set_settings(self, directory: Path) -> Dict[str, Any]:
+        """读取模板组的templates.yaml"""
+        if directory not in self._sets:
+            settings = {"reference": self.reference_resolution, "regions": {}}
+            set_file = directory / self.SET_FILE
+            if set_file.exists():
+                try:
+                    with open(set_file, 'r', encoding='utf-8') as f:
+                        data = yaml.safe_load(f) or {}
+                    if data.get('reference_resolution'):
+                        settings["reference"] = tuple(data['reference_resolution'])
+                    settings["regions"] = data.get('regions') or {}
+                except Exception as e:
+                    logger.error(f"Failed to load template set {set_file}: {e}")
+            self._sets[directory] = settings
+        return self._sets[directory]
+
+    def reference_for(self, path: Path) -> Optional[Tuple[int, int]]:
+        """
+        获取模板所属模板组的参考分辨率
+
+        Args:
+            path: 模板文件路径
+
+        Returns:
+            (width, height) 或 None
+        """
+        return self._set_settings(path.parent)["reference"]
+
+    def region_for(self, template_path: str,
+                   screen_size: Tuple[int, int]) -> Optional[Tuple[int, int, int, int]]:
+        """
+        获取模板声明的搜索区域并换算到设备分辨率
+
+        Args:
+            template_path: 模板路径
+            screen_size: 设备分辨率(width, height)
+
+        Returns:
+            (x, y, width, height) 或 None
+        """
+        key = (template_path, tuple(screen_size))
+        if key in self._regions:
+            return self._regions[key]
+
+        name = self.pack_name(template_path)
+        if name:
+            region, reference = self.pack.region(name), self._pack_reference(name)
+        else:
+            path = self.resolve(template_path)
+            settings = self._set_settings(path.parent)
+            region, reference = settings["regions"].get(path.name), settings["reference"]
+        if region and reference:
+            x, y = normalize_coordinate(region[0], region[1], reference[0], reference[1], *screen_size)
+            w, h = normalize_coordinate(region[2], region[3], reference[0], reference[1], *screen_size)
+            region = (x, y, w, h)
+        region = tuple(region) if region else None
+        self._regions[key] = region
+        return region
+
+    def load(self, template_path: str) -> Optional[np.ndarray]:
+        """
+        加载原始模板（不缩放）
+
+        Args:
+            template_path: 模板路径
+
+        Returns:
+            BGR图像或None
+        """
+        name = self.pack_name(template_path)
+        if name:
+            # 包内数组是映射视图，不占用缓存
+            return self.pack.image(name)
+
+        path = self.resolve(template_path)
+        key = str(path)
+        image = self.cache.get(key)
+        if image is None:
+            image = cv2.imread(key, cv2.IMREAD_UNCHANGED)
+            if image is None:
+                return None
+            image, self._masks[key] = split_alpha(image)
+            self.cache.set(key, image)
+        return image
+
+    def mask(self, template_path: str,
+             screen_size: Tuple[int, int]) -> Optional[np.ndarray]:
+        """
+        获取与get()同尺寸的透明度掩码
+
+        Args:
+            template_path: 模板路径
+            screen_size: 设备分辨率(width, height)
+
+        Returns:
+            单通道掩码（255为参与匹配），模板不透明时返回None
+        """
+        name = self.pack_name(template_path)
+        if name:
+            original = self.pack.mask(name)
+        else:
+            key = str(self.resolve(template_path))
+            if key not in self._masks and self.load(template_path) is None:
+                return None
+            original = self._masks.get(key)
+        if original is None:
+            return None
+
+        template = self.get(template_path, screen_size)
+        size = (template.shape[1], template.shape[0])
+        if (original.shape[1], original.shape[0]) == size:
+            return original
+        key = (str(self.resolve(template_path)), size[0], size[1], "mask")
+        scaled = self.cache.get(key)
+        if scaled is None:
+            scaled = cv2.resize(original, size, interpolation=cv2.INTER_NEAREST)
+            self.cache.set(key, scaled)
+        return scaled
+
+    def get(self, template_path: str,
+            screen_size: Tuple[int, int]) -> Optional[np.ndarray]:
+        """
+        获取适配目标分辨率的模板（按参考分辨率等比缩放，宽高比不同时取较小比例）
+
+        Args:
+            template_path: 模板路径
+            screen_size: 设备分辨率(width, height)
+
+        Returns:
+            缩放后的BGR图像或None
+        """
+        original = self.load(template_path)
+        if original is None:
+            return None
+
+        path = self.resolve(template_path)
+        name = self.pack_name(template_path)
+        scale = self._scale(name, path, screen_size)
+        if scale == 1:
+            return original
+
+        key = (str(path), screen_size[0], screen_size[1])
+        scaled = self.cache.get(key)
+        if scaled is None:
+            h, w = original.shape[:2]
+            new_w, new_h = max(1, round(w * scale)), max(1, round(h * scale))
+            interpolation = cv2.INTER_AREA if new_w < w else cv2.INTER_LINEAR
+            scaled = cv2.resize(original, (new_w, new_h), interpolation=interpolation)
+            self.cache.set(key, scaled)
+            logger.debug(f"Template {path.name} scaled {w}x{h} -> {new_w}x{new_h}")
+        return scaled
+
+    def coarse(self, template_path: str, screen_size: Tuple[int, int],
+               scale: float) -> Optional[np.ndarray]:
+        """
+        获取预先缩小的粗匹配模板
+
+        只有模板包中有该比例且模板不需要按分辨率缩放时可用。
+
+        Returns:
+            缩小的BGR图像或None（由match_template自行缩放）
+        """
+        name = self.pack_name(template_path)
+        if not name:
+            return None
+        if self._scale(name, self.resolve(template_path), screen_size) != 1:
+            return None
+        return self.pack.pyramid(name, scale)
+
+    def _scale(self, name: Optional[str], path: Path, screen_size: Tuple[int, int]) -> float:
+        """模板的等比缩放系数（宽高比不同时不拉伸模板，区域仍按各轴换算）"""
+        reference = self._pack_reference(name) if name else self.reference_for(path)
+        if reference is None or tuple(reference) == tuple(screen_size):
+            return 1.0
+        return uniform_scale(reference[0], reference[1], screen_size[0], screen_size[1])
+
+    def _pack_reference(self, name: str) -> Optional[Tuple[int, int]]:
+        """模板包中模板的参考分辨率，打包时未记录的使用库的默认值"""
+        reference = self.pack.reference(name)
+        return reference or self.reference_resolution
+
+    def clear(self) -> None:
+        """清空缓存"""
+        self.cache.clear()
+        self._sets.clear()
+        self._pack_names.clear()
+        self._regions.clear()
+        self._masks.clear()
+
+
+def _correlate(screen: np.ndarray, template: np.ndarray,
+               mask: Optional[np.ndarray]) -> np.ndarray:
+    """归一化相关系数匹配，有掩码时只比较掩码内的像素"""
+    if mask is None:
+        return cv2.matchTemplate(screen, template, cv2.TM_CCOEFF_NORMED)
+    result = cv2.matchTemplate(screen, template, cv2.TM_CCOEFF_NORMED, mask=mask)
+    # 掩码内画面为纯色时分母为0，得到NaN/inf
+    result[~np.isfinite(result)] = 0
+    return result
+
+
+def match_template(screen: np.ndarray, template: np.ndarray,
+                   threshold: float = 0.8,
+                   coarse_scale: Optional[float] = None,
+                   coarse_template: Optional[np.ndarray] = None,
+                   mask: Optional[np.ndarray] = None) -> Optional[Tuple[int, int, float]]:
+    """
+    模板匹配
+
+    指定coarse_scale时先在缩小的图像上粗匹配，再在候选位置附近做全分辨率验证。
+
+    Args:
+        screen: 截图
+        template: 模板
+        threshold: 匹配阈值
+        coarse_scale: 粗匹配缩放比例（如0.5），None表示直接全分辨率匹配
+        coarse_template: 预先按coarse_scale缩小的模板（来自模板包），None时现场缩放
+        mask: 与模板同尺寸的单通道掩码，透明像素不参与匹配
+
+    Returns:
+        (左上角x, 左上角y, 分数) 或 None
+    """
+    sh, sw = screen.shape[:2]
+    th, tw = template.shape[:2]
+    if th > sh or tw > sw:
+        return None
+
+    if coarse_scale and 0 < coarse_scale < 1 and min(th, tw) * coarse_scale >= MIN_COARSE_SIZE:
+        # 缩小后的截图只在本次匹配中使用，写入线程内复用的缓冲
+        small_shape = (round(sh * coarse_scale), round(sw * coarse_scale)) + screen.shape[2:]
+        small_screen = cv2.resize(screen, None, dst=scratch_buffer("coarse_screen", small_shape, screen.dtype),
+                                  fx=coarse_scale, fy=coarse_scale, interpolation=cv2.INTER_AREA)
+        if coarse_template is not None:
+            small_template = coarse_template
+        else:
+            small_template = cv2.resize(template, None, fx=coarse_scale, fy=coarse_scale,
+                                        interpolation=cv2.INTER_AREA)
+        small_mask = None
+        if mask is not None:
+            small_mask = cv2.resize(mask, small_template.shape[1::-1], interpolation=cv2.INTER_NEAREST)
+        result = _correlate(small_screen, small_template, small_mask)
+        _, coarse_val, _, coarse_loc = cv2.minMaxLoc(result)
+        if coarse_val < threshold - COARSE_MARGIN:
+            return None
+
+        # 在候选位置附近全分辨率验证
+        pad = math.ceil(1 / coarse_scale) + 2
+        x0 = max(0, min(int(coarse_loc[0] / coarse_scale) - pad, sw - tw))
+        y0 = max(0, min(int(coarse_loc[1] / coarse_scale) - pad, sh - th))
+        x1 = min(sw, x0 + tw + 2 * pad)
+        y1 = min(sh, y0 + th + 2 * pad)
+        screen = screen[y0:y1, x0:x1]
+    else:
+        x0, y0 = 0, 0
+
+    result = _correlate(screen, template, mask)
+    _, max_val, _, max_loc = cv2.minMaxLoc(result)
+    if max_val < threshold:
+        return None
+    return x0 + max_loc[0], y0 + max_loc[1], float(max_val)
+
+
+def match_all(screen: np.ndarray, template: np.ndarray,
+              threshold: float = 0.8,
+              max_results: Optional[int] = None,
+              overlap: float = 0.3,
+              mask: Optional[np.ndarray] = None) -> List[Tuple[int, int, float]]:
+    """
+    查找模板的所有出现位置
+
+    只做一次matchTemplate，阈值筛选和非极大值抑制都在NumPy数组上完成。
+
+    Args:
+        screen: 截图
+        template: 模板
+        threshold: 匹配阈值
+        max_results: 最多返回的数量，None为不限
+        overlap: 两个匹配框的IoU超过该值时只保留分数高的
+        mask: 与模板同尺寸的单通道掩码，透明像素不参与匹配
+
+    Returns:
+        [(左上角x, 左上角y, 分数), ...]，按分数从高到低
+    """
+    sh, sw = screen.shape[:2]
+    th, tw = template.shape[:2]
+    if th > sh or tw > sw:
+        return []
+
+    result = _correlate(screen, template, mask)
+    # 只保留3x3邻域内的局部最大值，大幅减少进入NMS的候选数
+    peaks = (result >= threshold) & (result >= cv2.dilate(result, np.ones((3, 3), np.uint8)))
+    ys, xs = np.nonzero(peaks)
+    if xs.size == 0:
+        return []
+
+    scores = result[ys, xs]
+    order = np.argsort(-scores, kind="stable")
+    xs, ys, scores = xs[order], ys[order], scores[order]
+
+    # 所有框大小相同，交集只取决于坐标差
+    area = float(tw * th)
+    keep = []
+    alive = np.ones(xs.size, bool)
+    for i in range(xs.size):
+        if not alive[i]:
+            continue
+        keep.append(i)
+        if max_results and len(keep) >= max_results:
+            break
+        rest = slice(i + 1, None)
+        inter = (np.clip(tw - np.abs(xs[rest] - xs[i]), 0, None) *
+                 np.clip(th - np.abs(ys[rest] - ys[i]), 0, None))
+        alive[rest] &= inter / (2 * area - inter) <= overlap
+
+    return [(int(xs[i]), int(ys[i]), float(scores[i])) for i in keep]
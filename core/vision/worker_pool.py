@@ -0,0 +1,459 @@
+"""
+视觉进程池 - 通过共享内存传帧的多进程模板匹配
+"""
+
+from __future__ import annotations
+
+import itertools
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+from typing import Any, Dict, List, Optional, Set, Tuple
+from loguru import logger
+
+from core.utils import lazy_import
+
+np = lazy_import("numpy")
+
+
+class FrameSlot:
+    """
+    共享内存中的一个帧槽位
+
+    array是直接映射到共享内存的视图，解码器可以把帧直接写进来。
+    所有匹配任务完成且调用release()后槽位归还给池；lend()借出的槽位由帧的持有者
+    通过VisionPool.retain_frame()/release_frame()管理，release()不起作用。
+    """
+
+    def __init__(self, pool: 'VisionPool', index: int, array: np.ndarray):
+        self.pool = pool
+        self.index = index
+        self.array = array
+        self.shape: Tuple[int, int, int] = array.shape
+        self._pending = 0
+        self._released = False
+        self._lent = False
+        self._holders = 0  # lend()借出的帧的持有者数
+
+    def view(self, shape: Tuple[int, ...]) -> np.ndarray:
+        """按指定形状获取槽位视图（帧小于槽位时使用）"""
+        size = int(np.prod(shape))
+        self.shape = tuple(shape)
+        return self.array.reshape(-1)[:size].reshape(shape)
+
+    def release(self) -> None:
+        """释放槽位"""
+        self.pool._release(self)
+
+    def __enter__(self) -> 'FrameSlot':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.release()
+
+
+class VisionPool:
+    """
+    视觉进程池
+
+    帧放在共享内存环形槽位中，任务只传递槽位号和模板路径，不序列化图像。
+    每个工作进程有自己的任务队列和模板缓存，任务分给未完成任务最少的进程，
+    结果按任务ID返回到Future。工作进程意外退出时分给它的任务以异常结束、
+    槽位归还，并换上新的队列和进程（共享队列的读锁可能随进程一起丢失）。
+    """
+
+    def __init__(self, workers: Optional[int] = None,
+                 slots: int = 8,
+                 max_frame_shape: Tuple[int, int, int] = (1080, 1920, 3),
+                 template_root: str = ".",
+                 reference_resolution: Optional[Tuple[int, int]] = None,
+                 template_pack: Optional[str] = None,
+                 acquire_timeout: float = 1.0,
+                 check_interval: float = 1.0):
+        """
+        初始化
+
+        Args:
+            workers: 工作进程数，默认为CPU核数
+            slots: 帧槽位数
+            max_frame_shape: 单帧最大形状
+            template_root: 模板根目录
+            reference_resolution: 模板参考分辨率
+            template_pack: 模板包路径，各工作进程映射同一文件，共享页缓存
+            acquire_timeout: 等待空闲槽位的默认超时（秒）
+            check_interval: 检查工作进程存活的间隔（秒）
+        """
+        self.workers = workers or os.cpu_count() or 2
+        self.max_frame_shape = tuple(max_frame_shape)
+        self.acquire_timeout = acquire_timeout
+        self.check_interval = check_interval
+        self._slot_bytes = int(np.prod(max_frame_shape))
+
+        self._shm = shared_memory.SharedMemory(create=True, size=self._slot_bytes * slots)
+        buffer = np.ndarray((slots, self._slot_bytes), np.uint8, buffer=self._shm.buf)
+        self._slots = [FrameSlot(self, i, buffer[i].reshape(max_frame_shape)) for i in range(slots)]
+        self._free: queue.Queue = queue.Queue()
+        for slot in self._slots:
+            self._free.put(slot)
+        # 借出的帧及其槽位（下标对应），持有者全部释放后归还
+        self._lent_frames: List[np.ndarray] = []
+        self._lent_slots: List[FrameSlot] = []
+
+        self._ctx = mp.get_context("spawn")
+        self._results = self._ctx.Queue()
+        self._futures: Dict[int, Tuple[Future, FrameSlot, int]] = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count()
+        self._closing = False
+        self._worker_args = (template_root, reference_resolution, template_pack)
+
+        self._jobs: List[Any] = []
+        self._processes: List[Any] = []
+        self._assigned: List[Set[int]] = []  # 各工作进程未完成的任务ID
+        for index in range(self.workers):
+            jobs, process = self._spawn(index)
+            self._jobs.append(jobs)
+            self._processes.append(process)
+            self._assigned.append(set())
+
+        self._collector = threading.Thread(target=self._collect, name="vision-results", daemon=True)
+        self._collector.start()
+        logger.info(f"Vision pool started: {self.workers} workers, {slots} slots")
+
+    def _spawn(self, index: int) -> Tuple[Any, Any]:
+        """启动一个工作进程，返回(任务队列, 进程)"""
+        jobs = self._ctx.Queue()
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(self._shm.name, len(self._slots), self.max_frame_shape, jobs, self._results,
+                  *self._worker_args),
+            name=f"vision-worker-{index}",
+            daemon=True
+        )
+        process.start()
+        return jobs, process
+
+    def fits(self, shape: Tuple[int, ...]) -> bool:
+        """帧是否放得进槽位"""
+        return int(np.prod(shape)) <= self._slot_bytes
+
+    def acquire(self, shape: Optional[Tuple[int, int, int]] = None,
+                timeout: Optional[float] = None) -> FrameSlot:
+        """
+        获取空闲槽位（池满时等待）
+
+        Args:
+            shape: 帧形状，None为最大形状
+            timeout: 等待超时，None为acquire_timeout
+
+        Returns:
+            FrameSlot
+
+        Raises:
+            ValueError: 帧超过槽位大小
+            queue.Empty: 超时仍没有空闲槽位
+        """
+        if shape is not None and not self.fits(shape):
+            raise ValueError(f"Frame {shape} exceeds slot size {self.max_frame_shape}")
+
+        deadline = time.monotonic() + (self.acquire_timeout if timeout is None else timeout)
+        while True:
+            try:
+                slot = self._free.get(timeout=min(0.05, max(0.0, deadline - time.monotonic())))
+                break
+            except queue.Empty:
+                if time.monotonic() >= deadline:
+                    raise
+        slot._pending = 0
+        slot._released = False
+        slot._lent = False
+        if shape is not None:
+            slot.view(shape)
+        else:
+            slot.shape = self.max_frame_shape
+        return slot
+
+    def put_frame(self, frame: np.ndarray, timeout: Optional[float] = None) -> FrameSlot:
+        """
+        把帧复制到空闲槽位
+
+        Args:
+            frame: BGR图像
+            timeout: 等待槽位超时，None为acquire_timeout
+
+        Returns:
+            FrameSlot
+
+        Raises:
+            ValueError: 帧超过槽位大小
+            queue.Empty: 超时仍没有空闲槽位
+        """
+        slot = self.acquire(frame.shape, timeout)
+        np.copyto(slot.view(frame.shape), frame)
+        return slot
+
+    def lend(self, shape: Tuple[int, int, int]) -> Optional[np.ndarray]:
+        """
+        借出一个槽位作为截图解码的目标，帧直接写在共享内存里，匹配时不再复制
+
+        调用方持有返回的数组，交给其他持有者时retain_frame()，各自用完后release_frame()；
+        全部释放且没有进行中的匹配时槽位归还。帧过大或空闲槽位不足一半时返回None
+        （留给put_frame）。
+
+        Args:
+            shape: 帧形状
+
+        Returns:
+            映射到槽位的数组（内容未初始化）或None
+        """
+        if not self.fits(shape):
+            return None
+        if self._free.qsize() <= len(self._slots) // 2:
+            return None
+        try:
+            slot = self._free.get_nowait()
+        except queue.Empty:
+            return None
+
+        slot._pending = 0
+        slot._released = True
+        slot._lent = True
+        slot._holders = 1
+        slot.shape = tuple(shape)
+        # 按帧形状直接映射槽位所在的共享内存
+        frame = np.ndarray(shape, np.uint8, buffer=self._shm.buf, offset=slot.index * self._slot_bytes)
+        with self._lock:
+            self._lent_frames.append(frame)
+            self._lent_slots.append(slot)
+        return frame
+
+    def slot_of(self, frame: np.ndarray) -> Optional[FrameSlot]:
+        """
+        查找lend()借出的帧所在槽位
+
+        Returns:
+            FrameSlot，帧不是借出的数组时返回None
+        """
+        with self._lock:
+            index = self._lent_index(frame)
+            return self._lent_slots[index] if index is not None else None
+
+    def retain_frame(self, frame: np.ndarray) -> bool:
+        """
+        为lend()借出的帧增加一个持有者
+
+        Returns:
+            帧是否为借出的数组
+        """
+        with self._lock:
+            index = self._lent_index(frame)
+            if index is None:
+                return False
+            self._lent_slots[index]._holders += 1
+            return True
+
+    def release_frame(self, frame: np.ndarray) -> bool:
+        """
+        释放lend()借出的帧的一个持有者，全部释放后槽位在匹配完成时归还
+
+        Returns:
+            帧是否为借出的数组
+        """
+        with self._lock:
+            index = self._lent_index(frame)
+            if index is None:
+                return False
+            slot = self._lent_slots[index]
+            slot._holders -= 1
+            if slot._holders > 0:
+                return True
+            del self._lent_frames[index]
+            del self._lent_slots[index]
+            slot._lent = False
+            slot._released = True
+            if slot._pending == 0:
+                self._free.put(slot)
+            return True
+
+    def _lent_index(self, frame: np.ndarray) -> Optional[int]:
+        for index, lent in enumerate(self._lent_frames):
+            if lent is frame:
+                return index
+        return None
+
+    def match(self, slot: FrameSlot, template_path: str,
+              threshold: float = 0.8,
+              screen_size: Optional[Tuple[int, int]] = None,
+              coarse_scale: Optional[float] = None,
+              region: Optional[Tuple[int, int, int, int]] = None) -> Future:
+        """
+        提交匹配任务
+
+        Args:
+            slot: 帧槽位
+            template_path: 模板路径
+            threshold: 匹配阈值
+            screen_size: 设备分辨率，用于模板缩放
+            coarse_scale: 粗匹配缩放比例
+            region: 搜索区域(x, y, width, height)
+
+        Returns:
+            Future，结果为匹配框及分数(x, y, width, height, score)或None
+        """
+        future: Future = Future()
+        job_id = next(self._ids)
+        with self._lock:
+            worker = min(range(len(self._assigned)), key=lambda i: len(self._assigned[i]))
+            slot._pending += 1
+            self._futures[job_id] = (future, slot, worker)
+            self._assigned[worker].add(job_id)
+            jobs = self._jobs[worker]
+
+        jobs.put((job_id, slot.index, slot.shape, template_path, threshold,
+                  screen_size, coarse_scale, region))
+        return future
+
+    def _release(self, slot: FrameSlot) -> None:
+        with self._lock:
+            if slot._lent:
+                return
+            slot._released = True
+            if slot._pending == 0:
+                self._free.put(slot)
+
+    def _collect(self) -> None:
+        """结果收集线程，同时定期检查工作进程是否存活"""
+        next_check = time.monotonic() + self.check_interval
+        while True:
+            try:
+                item = self._results.get(timeout=self.check_interval)
+            except queue.Empty:
+                item = ()
+            except (EOFError, OSError):
+                return
+            if item is None:
+                return
+
+            if item:
+                job_id, result, error = item
+                self._finish(job_id, result, RuntimeError(error) if error else None)
+
+            if time.monotonic() >= next_check:
+                next_check = time.monotonic() + self.check_interval
+                self._check_workers()
+
+    def _finish(self, job_id: int, result: Any, error: Optional[Exception]) -> None:
+        with self._lock:
+            future, slot, worker = self._futures.pop(job_id, (None, None, None))
+            if slot is not None:
+                self._assigned[worker].discard(job_id)
+                slot._pending -= 1
+                if slot._released and not slot._lent and slot._pending == 0:
+                    self._free.put(slot)
+
+        if future is None:
+            return
+        if error:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def _check_workers(self) -> None:
+        """工作进程意外退出时让分给它的任务失败、归还槽位，并换上新的队列和进程"""
+        for index, process in enumerate(self._processes):
+            if self._closing:
+                return
+            if process.is_alive():
+                continue
+            logger.warning(f"Vision worker {process.name} died (exit code {process.exitcode}), restarting")
+            jobs, replacement = self._spawn(index)
+            with self._lock:
+                self._jobs[index], old_jobs = jobs, self._jobs[index]
+                self._processes[index] = replacement
+                lost = list(self._assigned[index])
+            old_jobs.close()
+            error = RuntimeError(f"Vision worker died (exit code {process.exitcode})")
+            for job_id in lost:
+                self._finish(job_id, None, error)
+
+    def close(self) -> None:
+        """关闭进程池并释放共享内存"""
+        self._closing = True
+        for jobs in self._jobs:
+            jobs.put(None)
+        for process in self._processes:
+            process.join(5)
+            if process.is_alive():
+                process.terminate()
+
+        self._results.put(None)
+        self._collector.join(5)
+
+        with self._lock:
+            for future, _, _ in self._futures.values():
+                future.cancel()
+            self._futures.clear()
+            self._lent_frames.clear()
+            self._lent_slots.clear()
+
+        self._slots.clear()
+        try:
+            self._shm.close()
+        except BufferError:
+            # 仍有外部持有的槽位视图，等其回收后由系统释放映射
+            logger.warning("Vision pool closed with live frame slots")
+        self._shm.unlink()
+        logger.info("Vision pool closed")
+
+
+def _worker_main(shm_name: str, slots: int, max_shape: Tuple[int, int, int],
+                 jobs, results, template_root: str,
+                 reference_resolution: Optional[Tuple[int, int]],
+                 template_pack: Optional[str]) -> None:
+    """工作进程入口"""
+    from core.vision.template import TemplateLibrary, match_template
+    from core.vision.pack import TemplatePack
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    slot_bytes = int(np.prod(max_shape))
+    buffer = np.ndarray((slots, slot_bytes), np.uint8, buffer=shm.buf)
+    pack = TemplatePack(template_pack) if template_pack else None
+    templates = TemplateLibrary(template_root, reference_resolution, pack=pack)
+
+    try:
+        while True:
+            job = jobs.get()
+            if job is None:
+                break
+
+            job_id, index, shape, template_path, threshold, screen_size, coarse_scale, region = job
+            try:
+                frame = buffer[index][:int(np.prod(shape))].reshape(shape)
+                if screen_size is None:
+                    screen_size = (shape[1], shape[0])
+                template = templates.get(template_path, screen_size)
+                if template is None:
+                    results.put((job_id, None, f"Template not found: {template_path}"))
+                    continue
+
+                offset_x, offset_y = 0, 0
+                if region:
+                    offset_x, offset_y = max(0, region[0]), max(0, region[1])
+                    frame = frame[offset_y:region[1] + region[3], offset_x:region[0] + region[2]]
+
+                coarse = templates.coarse(template_path, screen_size, coarse_scale) if coarse_scale else None
+                mask = templates.mask(template_path, screen_size)
+                match = match_template(frame, template, threshold, coarse_scale, coarse, mask)
+                if match:
+                    h, w = template.shape[:2]
+                    match = (match[0] + offset_x, match[1] + offset_y, w, h, match[2])
+                results.put((job_id, match, None))
+            except Exception as e:
+                results.put((job_id, None, str(e)))
+    finally:
+        del buffer
+        shm.close()
@@ -2,24 +2,108 @@
 主程序入口 - 极简启动
 """
 
+import argparse
 import sys
 from loguru import logger
 
 from core.game import Game
 from core.config import config
+from core.monitoring import setup_logging, RunHistory
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="Game automation")
+    parser.add_argument("--config", default="config.yaml", help="config file")
+    parser.add_argument("--profile", nargs="*", metavar="TASK",
+                        help="sample task stacks to profiles/ (all tasks, or only the given ones)")
+    
+    commands = parser.add_subparsers(dest="command")
+    commands.add_parser("run", help="run automation (default)")
+    bench = commands.add_parser("bench-device",
+                                help="benchmark capture/input backends and save the fastest for this device")
+    bench.add_argument("-n", "--iterations", type=int, default=20, help="calls per backend")
+    bench.add_argument("--no-save", action="store_true", help="report only, do not update the session")
+    history = commands.add_parser("history",
+                                  help="compare recent task timings with a baseline window and flag regressions")
+    history.add_argument("--recent", type=float, default=1.0, help="recent window in days")
+    history.add_argument("--baseline", type=float, default=7.0, help="baseline window in days before the recent one")
+    history.add_argument("--threshold", type=float, default=0.2, help="slowdown ratio flagged as a regression")
+    history.add_argument("--min-runs", type=int, default=3, help="minimum runs in each window")
+    history.add_argument("--task", help="only this task")
+    history.add_argument("--device", help="only this device")
+    history.add_argument("--by-device", action="store_true", help="compare each device separately")
+    history.add_argument("--operations", action="store_true", help="also compare per-operation timings")
+    return parser.parse_args(argv)
+
+
+def bench_device(game: Game, iterations: int, save: bool) -> int:
+    """测试并打印各后端延迟"""
+    results = game.tune_backends(iterations, save)
+    if not results:
+        return 1
+    
+    print(f"{'kind':<8} {'backend':<10} {'mean':>8} {'p50':>8} {'p90':>8} {'p99':>8} {'per sec':>8}  failures")
+    for r in results:
+        if not r.durations:
+            print(f"{r.kind:<8} {r.backend:<10} {'-':>8} {'-':>8} {'-':>8} {'-':>8} {'-':>8}  "
+                  f"{r.failures} {r.error or ''}")
+            continue
+        stats = r.summary()
+        print(f"{r.kind:<8} {r.backend:<10} {stats['mean_ms']:>8.1f} {stats['p50_ms']:>8.1f} "
+              f"{stats['p90_ms']:>8.1f} {stats['p99_ms']:>8.1f} {stats['per_second']:>8.1f}  {r.failures}")
+    return 0
+
+
+def history_report(args: argparse.Namespace) -> int:
+    """打印近期与基线的对比，有回退时返回1"""
+    history = RunHistory(config.get("history.path", "data/history.db"))
+    results = history.compare(args.recent, args.baseline, args.threshold,
+                              min_runs=args.min_runs, task=args.task, device=args.device,
+                              by_device=args.by_device, operations=args.operations)
+    if not results:
+        print("No task has enough runs in both windows")
+        return 0
+    
+    print(f"{'':<2}{'name':<40} {'device':<16} {'base ms':>9} {'recent ms':>9} {'change':>7} "
+          f"{'base ok':>7} {'recent ok':>9} {'runs':>9}")
+    for r in results:
+        mark = "!!" if r.regressed else ""
+        print(f"{mark:<2}{r.name:<40} {r.device or '*':<16} {r.baseline_ms:>9.0f} {r.recent_ms:>9.0f} "
+              f"{r.change:>+7.0%} {r.baseline_success:>7.0%} {r.recent_success:>9.0%} "
+              f"{r.baseline_runs:>4}/{r.recent_runs:<4}")
+    
+    regressions = sum(r.regressed for r in results)
+    print(f"{regressions} regression(s)")
+    return 1 if regressions else 0
 
 
 def main():
     """主函数"""
-    # 配置日志
-    logger.remove()
-    logger.add(sys.stderr, level="INFO")
-    logger.add("logs/game.log", rotation="1 day", level="DEBUG")
+    args = parse_args()
     
     # 加载配置
-    if not config.load("config.yaml"):
+    if not config.load(args.config):
         logger.warning("Using default config")
     
+    # 配置日志（文件异步写入）
+    setup_logging(
+        config.get("logging.level", "INFO"),
+        config.get("logging.file", "logs/game.log"),
+        config.get("logging.file_level", "INFO")
+    )
+    
+    # 离线报告，不需要连接设备
+    if args.command == "history":
+        return history_report(args)
+    
+    # 命令行开启采样分析
+    if args.profile is not None:
+        if args.profile:
+            config.set("profiling.tasks", args.profile)
+        else:
+            config.set("profiling.enabled", True)
+    
     # 连接设备
     device_id = config.get("device.id", "emulator-5554")
     game = Game(device_id)
@@ -28,6 +112,12 @@ def main():
         logger.error("Failed to connect to device")
         return 1
     
+    if args.command == "bench-device":
+        try:
+            return bench_device(game, args.iterations, not args.no_save)
+        finally:
+            game.disconnect()
+    
     try:
         # 这里可以运行任务
         logger.info("Game automation started")